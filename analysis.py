@@ -0,0 +1,101 @@
+import threading
+from typing import Union
+import fltk
+from game import Connect4, Geometry
+from solver import STANDARD, Solver
+
+# Type of the fltk events posted with the results of the analysis
+ANALYSIS_EVENT = "Analyse"
+
+
+class Analyzer:
+    """Evaluate positions on a worker thread and post the results to the
+    window with fltk.poste_ev, so that the event loop never waits for a
+    search. A new position cancels the search of the previous one."""
+
+    def __init__(
+        self,
+        max_time: Union[None, float] = None,
+        table_mb: int = 16,
+        book: object = None,
+        event: str = ANALYSIS_EVENT,
+        geometry: Geometry = STANDARD,
+    ):
+        """Initialisation
+
+        :param max_time: the time allowed to analyse a position, in seconds,
+                         defaults to None means until the scores are exact
+        :type max_time: Union[None, float], optional
+        :param table_mb: the size of the transposition table, in megabytes
+        :type table_mb: int
+        :param book: the opening book, defaults to None
+        :type book: Union[None, OpeningBook], optional
+        :param event: the type of the posted events
+        :type event: str
+        :param geometry: the grid of the positions, defaults to STANDARD
+        :type geometry: Geometry, optional
+        """
+        self.solver = Solver(
+            max_time=max_time, table_mb=table_mb, book=book, geometry=geometry
+        )
+        self.event = event
+        self.condition = threading.Condition()
+        self.position = None
+        self.generation = 0
+        self.running = True
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def analyse(self, game: Connect4):
+        """Start the analysis of a position, and cancel the running one
+
+        :param game: the position, it is copied so the game can be played
+                     during the analysis
+        :type game: Connect4
+        :return: the number of the analysis, given back with its results
+        :rtype: int
+        """
+        position = game.copy()
+        with self.condition:
+            self.generation += 1
+            self.position = position
+            self.solver.cancel()
+            self.condition.notify()
+            return self.generation
+
+    def cancel(self):
+        """Stop the running analysis, its next results are not posted"""
+        with self.condition:
+            self.generation += 1
+            self.position = None
+            self.solver.cancel()
+
+    def run(self):
+        """Analyse the positions given by analyse, until close is called.
+        After each depth, an event is posted with the number of the
+        analysis, the depth, the score of each column and whether the scores
+        are exact."""
+        while True:
+            with self.condition:
+                while self.running and self.position is None:
+                    self.condition.wait()
+                if not self.running:
+                    return
+                position = self.position
+                generation = self.generation
+                self.position = None
+                # a position given from now on cancels this search again
+                self.solver.cancelled = False
+
+            def report(depth, scores, exact):
+                fltk.poste_ev(self.event, (generation, depth, dict(scores), exact))
+
+            self.solver.analyse(position, report)
+
+    def close(self):
+        """Stop the analysis and the worker thread"""
+        with self.condition:
+            self.running = False
+            self.solver.cancel()
+            self.condition.notify()
+        self.thread.join()
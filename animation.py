@@ -0,0 +1,148 @@
+from time import perf_counter
+from typing import Callable, Union
+import fltk
+
+
+class Animation:
+    """Straight move of a canvas item during a given time"""
+
+    def __init__(
+        self,
+        item: int,
+        dx: float,
+        dy: float,
+        duration: float,
+        on_end: Union[None, Callable] = None,
+    ):
+        """Initialisation
+
+        :param item: the canvas item to move
+        :type item: int
+        :param dx: the horizontal distance to move
+        :type dx: float
+        :param dy: the vertical distance to move
+        :type dy: float
+        :param duration: the time of the move, in seconds
+        :type duration: float
+        :param on_end: the function called once the move is over, defaults
+                       to None
+        :type on_end: Union[None, Callable], optional
+        """
+        self.item = item
+        self.dx = dx
+        self.dy = dy
+        self.duration = duration
+        self.on_end = on_end
+        self.start = perf_counter()
+        self.done = 0.0
+
+    def step(self, now: float):
+        """Move the item to where it should be at a given time
+
+        :param now: the time, from perf_counter
+        :type now: float
+        :return: True if the move is over, else False
+        :rtype: bool
+        """
+        if self.duration <= 0:
+            progress = 1.0
+        else:
+            progress = min(1.0, (now - self.start) / self.duration)
+        delta = progress - self.done
+        fltk.deplace(self.item, self.dx * delta, self.dy * delta)
+        self.done = progress
+        return progress >= 1.0
+
+
+class Animator:
+    """Run several animations at once on fltk timers, without blocking the
+    event loop. The timer only runs while there are animations."""
+
+    def __init__(self, frame_rate: int = 60):
+        """Initialisation
+
+        :param frame_rate: the number of frames per second
+        :type frame_rate: int
+        """
+        self.interval = 1 / frame_rate
+        self.animations = []
+        self.timer = None
+
+    def move(
+        self,
+        item: int,
+        dx: float,
+        dy: float,
+        duration: float,
+        on_end: Union[None, Callable] = None,
+    ):
+        """Start moving a canvas item
+
+        :param item: the canvas item to move
+        :type item: int
+        :param dx: the horizontal distance to move
+        :type dx: float
+        :param dy: the vertical distance to move
+        :type dy: float
+        :param duration: the time of the move, in seconds
+        :type duration: float
+        :param on_end: the function called once the move is over, defaults
+                       to None
+        :type on_end: Union[None, Callable], optional
+        :return: the animation
+        :rtype: Animation
+        """
+        animation = Animation(item, dx, dy, duration, on_end)
+        self.animations.append(animation)
+        if self.timer is None:
+            self.timer = fltk.planifie(self.interval, self.tick)
+        return animation
+
+    def is_running(self):
+        """Tells if some animations are not over
+
+        :return: True if an animation is running, else False
+        :rtype: bool
+        """
+        return bool(self.animations)
+
+    def tick(self):
+        """Draw a frame of every animation"""
+        now = perf_counter()
+        running = []
+        finished = []
+        for animation in self.animations:
+            if animation.step(now):
+                finished.append(animation)
+            else:
+                running.append(animation)
+        self.animations = running
+        self.timer = None
+        if running:
+            # the next frame is planned from the time this one took, so that
+            # slow frames do not slow the animations down
+            delay = self.interval - (perf_counter() - now)
+            self.timer = fltk.planifie(max(0.0, delay), self.tick)
+        for animation in finished:
+            if animation.on_end is not None:
+                animation.on_end()
+
+    def finish(self):
+        """Move every animation to its end at once"""
+        if self.timer is not None:
+            fltk.annule(self.timer)
+            self.timer = None
+        finished = self.animations
+        self.animations = []
+        for animation in finished:
+            animation.duration = 0
+            animation.step(0)
+            if animation.on_end is not None:
+                animation.on_end()
+
+    def stop(self):
+        """Stop all animations, at their current position"""
+        if self.timer is not None:
+            fltk.annule(self.timer)
+            self.timer = None
+        self.animations = []
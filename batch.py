@@ -0,0 +1,125 @@
+import numpy as np
+from bitboard import WIDTH, HEIGHT, COLUMN_BITS
+
+# Batches of positions are (N, HEIGHT, WIDTH) int8 grids, with 0 for an empty
+# cell, 1 or 2 for a token of a player. As in Connect4, the row 0 is the top
+# of the grid, so grid[n, y, column] is the position 10 * y + column.
+
+
+def get_windows():
+    """Get every set of four aligned cells of the grid
+
+    :return: the indexes of the cells in the flattened grid, one row per
+             alignment
+    :rtype: np.ndarray
+    """
+    windows = []
+    for y in range(HEIGHT):
+        for column in range(WIDTH):
+            for dy, dx in ((0, 1), (1, 0), (1, 1), (1, -1)):
+                end_y, end_x = y + 3 * dy, column + 3 * dx
+                if 0 <= end_y < HEIGHT and 0 <= end_x < WIDTH:
+                    windows.append(
+                        [(y + i * dy) * WIDTH + column + i * dx for i in range(4)]
+                    )
+    return np.array(windows, dtype=np.intp)
+
+
+WINDOWS = get_windows()
+
+# Bit of each cell of the flattened grid in a bitboard
+CELL_BITS = np.array(
+    [
+        column * COLUMN_BITS + (HEIGHT - 1 - y)
+        for y in range(HEIGHT)
+        for column in range(WIDTH)
+    ],
+    dtype=np.uint64,
+)
+
+
+def grids_from_bitboards(bitboards: np.ndarray):
+    """Convert bitboards to grids
+
+    :param bitboards: the bitboards of both players, of shape (N, 2)
+    :type bitboards: np.ndarray
+    :return: the grids, of shape (N, HEIGHT, WIDTH)
+    :rtype: np.ndarray
+    """
+    bitboards = np.asarray(bitboards, dtype=np.uint64)
+    player1 = (bitboards[:, 0, None] >> CELL_BITS) & np.uint64(1)
+    player2 = (bitboards[:, 1, None] >> CELL_BITS) & np.uint64(1)
+    grids = player1.astype(np.int8) + 2 * player2.astype(np.int8)
+    return grids.reshape(-1, HEIGHT, WIDTH)
+
+
+def to_grids(positions: np.ndarray):
+    """Get grids from grids or bitboards
+
+    :param positions: grids of shape (N, HEIGHT, WIDTH) or bitboards of shape
+                      (N, 2)
+    :type positions: np.ndarray
+    :return: the grids, of shape (N, HEIGHT, WIDTH)
+    :rtype: np.ndarray
+    """
+    positions = np.asarray(positions)
+    if positions.ndim == 2:
+        return grids_from_bitboards(positions)
+    if positions.shape[1:] != (HEIGHT, WIDTH):
+        raise ValueError(
+            f"expected grids of shape (N, {HEIGHT}, {WIDTH}) or bitboards of "
+            f"shape (N, 2), got {positions.shape}"
+        )
+    return positions
+
+
+def count_windows(grids: np.ndarray, player: int):
+    """Count the tokens of a player in every alignment of every grid
+
+    :param grids: the grids, of shape (N, HEIGHT, WIDTH)
+    :type grids: np.ndarray
+    :param player: the player
+    :type player: int
+    :return: the counts, of shape (N, number of alignments)
+    :rtype: np.ndarray
+    """
+    tokens = (grids.reshape(len(grids), -1) == player).astype(np.int8)
+    return tokens[:, WINDOWS].sum(axis=2, dtype=np.int8)
+
+
+def get_legal_moves(positions: np.ndarray):
+    """Get the columns where a token can be added
+
+    :param positions: grids of shape (N, HEIGHT, WIDTH) or bitboards of shape
+                      (N, 2)
+    :type positions: np.ndarray
+    :return: True for each column that is not full, of shape (N, WIDTH)
+    :rtype: np.ndarray
+    """
+    return to_grids(positions)[:, 0, :] == 0
+
+
+def evaluate(positions: np.ndarray):
+    """Evaluate many positions at once
+
+    A threat is an alignment with three tokens of a player and an empty cell.
+
+    :param positions: grids of shape (N, HEIGHT, WIDTH) or bitboards of shape
+                      (N, 2)
+    :type positions: np.ndarray
+    :return: the wins of each player of shape (N, 2), the legal moves of
+             shape (N, WIDTH) and the threats of each player of shape (N, 2)
+    :rtype: tuple[np.ndarray, np.ndarray, np.ndarray]
+    """
+    grids = to_grids(positions)
+    counts1 = count_windows(grids, 1)
+    counts2 = count_windows(grids, 2)
+    wins = np.stack(((counts1 == 4).any(axis=1), (counts2 == 4).any(axis=1)), axis=1)
+    threats = np.stack(
+        (
+            ((counts1 == 3) & (counts2 == 0)).sum(axis=1),
+            ((counts2 == 3) & (counts1 == 0)).sum(axis=1),
+        ),
+        axis=1,
+    )
+    return wins, grids[:, 0, :] == 0, threats
@@ -0,0 +1,402 @@
+import argparse
+import builtins
+import contextlib
+import io
+import json
+import platform
+import random
+import sys
+from time import perf_counter, process_time
+from bitboard import BitboardConnect4
+from game import Connect4
+
+
+def random_games(seed: int, count: int):
+    """Generate random games, each one ends with a win or a full grid
+
+    :param seed: the seed of the random generator
+    :type seed: int
+    :param count: the number of games
+    :type count: int
+    :return: the columns played in each game
+    :rtype: list[list[int]]
+    """
+    rng = random.Random(seed)
+    games = []
+    for _ in range(count):
+        game = Connect4()
+        moves = []
+        while not game.get_winner():
+            columns = list(game.legal_moves())
+            if not columns:
+                break
+            column = rng.choice(columns)
+            game.play(column)
+            moves.append(column)
+        games.append(moves)
+    return games
+
+
+def best_time(function: object, repeat: int):
+    """Run a function several times and get its fastest run
+
+    :param function: the function to run, without arguments
+    :type function: Callable
+    :param repeat: the number of runs
+    :type repeat: int
+    :return: the time of the fastest run, in seconds
+    :rtype: float
+    """
+    best = None
+    for _ in range(repeat):
+        start = perf_counter()
+        function()
+        elapsed = perf_counter() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    return best
+
+
+def bench_add_token(games: list, repeat: int, board_class: type):
+    """Measure the number of tokens added per second
+
+    :param games: the games to replay
+    :type games: list[list[int]]
+    :param repeat: the number of runs
+    :type repeat: int
+    :param board_class: Connect4 or BitboardConnect4
+    :type board_class: type
+    :return: the number of tokens per second
+    :rtype: float
+    """
+
+    def run():
+        for moves in games:
+            board = board_class()
+            for turn, column in enumerate(moves):
+                board.add_token(column, turn % 2 + 1)
+
+    return sum(map(len, games)) / best_time(run, repeat)
+
+
+def bench_is_win(games: list, repeat: int, board_class: type):
+    """Measure the time of is_win after each move
+
+    :param games: the games to replay
+    :type games: list[list[int]]
+    :param repeat: the number of runs
+    :type repeat: int
+    :param board_class: Connect4 or BitboardConnect4
+    :type board_class: type
+    :return: the time of a call, in microseconds
+    :rtype: float
+    """
+    boards = []
+    for moves in games:
+        board = board_class()
+        for column in moves:
+            pos = board.add_token(column, board.get_player())
+            boards.append((board.copy(), pos))
+            board.add_turn()
+
+    def run():
+        for board, pos in boards:
+            board.is_win(pos)
+
+    return best_time(run, repeat) / len(boards) * 1e6
+
+
+def bench_copy(games: list, repeat: int, board_class: type):
+    """Measure the time of copy on the positions of the games
+
+    :param games: the games to replay
+    :type games: list[list[int]]
+    :param repeat: the number of runs
+    :type repeat: int
+    :param board_class: Connect4 or BitboardConnect4
+    :type board_class: type
+    :return: the time of a call, in microseconds
+    :rtype: float
+    """
+    boards = []
+    for moves in games:
+        board = board_class()
+        for column in moves:
+            board.add_token(column, board.get_player())
+            board.add_turn()
+            boards.append(board.copy())
+
+    def run():
+        for board in boards:
+            board.copy()
+
+    return best_time(run, repeat) / len(boards) * 1e6
+
+
+def bench_playouts(seed: int, count: int, repeat: int):
+    """Measure the number of random games played from the empty grid per
+    second
+
+    :param seed: the seed of the random generator
+    :type seed: int
+    :param count: the number of games of a run
+    :type count: int
+    :param repeat: the number of runs
+    :type repeat: int
+    :return: the number of games per second
+    :rtype: float
+    """
+
+    def run():
+        rng = random.Random(seed)
+        for _ in range(count):
+            game = Connect4()
+            while True:
+                columns = list(game.legal_moves())
+                if not columns:
+                    break
+                player = game.get_player()
+                pos = game.add_token(rng.choice(columns), player)
+                if game.is_win(pos):
+                    break
+                game.add_turn()
+
+    return count / best_time(run, repeat)
+
+
+def bench_main_text(games: list, repeat: int):
+    """Measure the number of whole games played per second through the text
+    interface, with scripted inputs
+
+    :param games: the games to play
+    :type games: list[list[int]]
+    :param repeat: the number of runs
+    :type repeat: int
+    :return: the number of games per second
+    :rtype: float
+    """
+    from main import Game
+
+    def run():
+        for moves in games:
+            inputs = iter(map(str, moves))
+            game = Game("text")
+            builtins_input = builtins.input
+            builtins.input = lambda prompt="": next(inputs)
+            try:
+                with contextlib.redirect_stdout(io.StringIO()):
+                    game.main_text()
+            finally:
+                builtins.input = builtins_input
+
+    return len(games) / best_time(run, repeat)
+
+
+def bench_main_graphic(games: list, repeat: int):
+    """Measure the cost of the graphic interface without a display: the
+    games are played by replaying clicks in a window of the null fltk
+    backend
+
+    :param games: the games to play
+    :type games: list[list[int]]
+    :param repeat: the number of runs
+    :type repeat: int
+    :return: the CPU time per move in milliseconds, the drawing calls per
+             move, the animation frames per second the interface can draw,
+             and the canvas items left by the games
+    :rtype: dict[str, float]
+    """
+    import fltk
+    import main
+    from animation import Animator
+
+    main.load_fltk()
+    frames = []
+    tick = Animator.tick
+
+    def timed_tick(animator):
+        start = perf_counter()
+        tick(animator)
+        frames.append(perf_counter() - start)
+
+    loop = fltk.boucle_principale
+    counts = []
+
+    def counted_loop():
+        # the items of an empty board, before the first click
+        counts.append(fltk.statistiques_dessin())
+        loop()
+        counts.append(fltk.statistiques_dessin())
+
+    best = None
+    Animator.tick = timed_tick
+    fltk.boucle_principale = counted_loop
+    try:
+        for _ in range(repeat):
+            for moves in games:
+                game = main.Game("graphic")
+                # the clicks land on the holes drawn by draw_circles, the
+                # last move is followed by the time of a whole drop
+                space = (main.WIDTH_WINDOW - 100) / max(1, game.width - 1)
+                script = [(0.02, "ClicGauche", (50 + c * space, 100)) for c in moves]
+                script.append((0.5, "Quitte", None))
+                fltk.choisit_moteur("nul", script)
+                start = process_time()
+                game.main_graphic()
+                elapsed = (process_time() - start) / len(moves)
+                if best is None or elapsed < best:
+                    best = elapsed
+    finally:
+        Animator.tick = tick
+        fltk.boucle_principale = loop
+        fltk.choisit_moteur()
+    moves = sum(map(len, games)) * repeat
+    calls = sum(sum(end["appels"].values()) for end in counts[1::2])
+    setup = sum(sum(start["appels"].values()) for start in counts[::2])
+    leaked = max(
+        end["objets"] - start["objets"] for start, end in zip(counts[::2], counts[1::2])
+    )
+    return {
+        "main.graphic.move_cost": best * 1000,
+        "main.graphic.calls": (calls - setup) / moves,
+        "main.graphic.fps": len(frames) / sum(frames),
+        "main.graphic.leaked_items": leaked,
+    }
+
+
+# name: (unit, True if higher is better)
+METRICS = {
+    "connect4.add_token": ("tokens/s", True),
+    "bitboard.add_token": ("tokens/s", True),
+    "connect4.is_win": ("us", False),
+    "bitboard.is_win": ("us", False),
+    "connect4.copy": ("us", False),
+    "bitboard.copy": ("us", False),
+    "connect4.playouts": ("games/s", True),
+    "main.main_text": ("games/s", True),
+    "main.graphic.move_cost": ("ms", False),
+    "main.graphic.calls": ("calls/move", False),
+    "main.graphic.fps": ("frames/s", True),
+    "main.graphic.leaked_items": ("items", False),
+}
+
+
+def run_benchmarks(
+    seed: int = 0, games: int = 200, repeat: int = 5, graphic: bool = True
+):
+    """Run all benchmarks
+
+    :param seed: the seed of the random games
+    :type seed: int
+    :param games: the number of random games used by each benchmark
+    :type games: int
+    :param repeat: the number of runs of each benchmark, the fastest is kept
+    :type repeat: int
+    :param graphic: runs the benchmarks of the graphic interface, which
+                    play in real time
+    :type graphic: bool
+    :return: the value of each metric
+    :rtype: dict[str, float]
+    """
+    replay = random_games(seed, games)
+    results = {
+        "connect4.add_token": bench_add_token(replay, repeat, Connect4),
+        "bitboard.add_token": bench_add_token(replay, repeat, BitboardConnect4),
+        "connect4.is_win": bench_is_win(replay, repeat, Connect4),
+        "bitboard.is_win": bench_is_win(replay, repeat, BitboardConnect4),
+        "connect4.copy": bench_copy(replay, repeat, Connect4),
+        "bitboard.copy": bench_copy(replay, repeat, BitboardConnect4),
+        "connect4.playouts": bench_playouts(seed, games, repeat),
+        "main.main_text": bench_main_text(replay[: max(1, games // 10)], repeat),
+    }
+    if graphic:
+        results.update(
+            bench_main_graphic(replay[: max(1, games // 100)], max(1, repeat // 2))
+        )
+    return results
+
+
+def compare(results: dict, baseline: dict, tolerance: float):
+    """Find the metrics worse than the baseline
+
+    :param results: the value of each metric
+    :type results: dict[str, float]
+    :param baseline: the value of each metric in the baseline
+    :type baseline: dict[str, float]
+    :param tolerance: the accepted relative slowdown, 0.1 for 10%
+    :type tolerance: float
+    :return: for each regression, its name, its value and the baseline value
+    :rtype: list[tuple[str, float, float]]
+    """
+    regressions = []
+    for name, value in results.items():
+        if name not in baseline:
+            continue
+        _, higher_is_better = METRICS[name]
+        reference = baseline[name]
+        if higher_is_better:
+            worse = value < reference * (1 - tolerance)
+        else:
+            worse = value > reference * (1 + tolerance)
+        if worse:
+            regressions.append((name, value, reference))
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Connect 4 benchmarks")
+    parser.add_argument(
+        "--output", "-o", default=None, help="Writes the results in this file"
+    )
+    parser.add_argument(
+        "--baseline",
+        "-b",
+        default=None,
+        help="Compares the results with a file written with --output",
+    )
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=0.1,
+        help="The accepted relative slowdown against the baseline",
+    )
+    parser.add_argument(
+        "--seed", type=int, default=0, help="The seed of the random games"
+    )
+    parser.add_argument(
+        "--games", type=int, default=200, help="The number of random games"
+    )
+    parser.add_argument(
+        "--repeat", type=int, default=5, help="The number of runs of each benchmark"
+    )
+    parser.add_argument(
+        "--no-graphic",
+        action="store_true",
+        help="Skips the benchmarks of the graphic interface",
+    )
+    args = vars(parser.parse_args())
+    report = {
+        "python": platform.python_version(),
+        "seed": args["seed"],
+        "games": args["games"],
+        "units": {name: unit for name, (unit, _) in METRICS.items()},
+        "results": run_benchmarks(
+            args["seed"], args["games"], args["repeat"], not args["no_graphic"]
+        ),
+    }
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args["output"] is not None:
+        with open(args["output"], "w") as file:
+            file.write(text + "\n")
+    if args["baseline"] is not None:
+        with open(args["baseline"]) as file:
+            baseline = json.load(file)["results"]
+        regressions = compare(report["results"], baseline, args["tolerance"])
+        for name, value, reference in regressions:
+            print(
+                f"regression: {name} {value:.6g} (baseline {reference:.6g})",
+                file=sys.stderr,
+            )
+        if regressions:
+            sys.exit(1)
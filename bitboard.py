@@ -0,0 +1,309 @@
+from typing import Union
+
+WIDTH = 7
+HEIGHT = 6
+
+# Each column uses HEIGHT + 1 bits, the extra bit on top of each column stays
+# empty so that shifts never link tokens of two different columns
+COLUMN_BITS = HEIGHT + 1
+
+
+def pos_to_bit(pos: int):
+    """Convert a grid position (10 * y + column) to its bit index
+
+    :param pos: the position in the grid
+    :type pos: int
+    :return: the bit index in the bitboard
+    :rtype: int
+    """
+    y, column = divmod(pos, 10)
+    return column * COLUMN_BITS + (HEIGHT - 1 - y)
+
+
+def bit_to_pos(bit: int):
+    """Convert a bit index to its grid position (10 * y + column)
+
+    :param bit: the bit index in the bitboard
+    :type bit: int
+    :return: the position in the grid
+    :rtype: int
+    """
+    column, row = divmod(bit, COLUMN_BITS)
+    return 10 * (HEIGHT - 1 - row) + column
+
+
+def bits_from_tokens(tokens: set):
+    """Build a bitboard from a set of positions
+
+    :param tokens: the positions of the tokens
+    :type tokens: set
+    :return: the bitboard
+    :rtype: int
+    """
+    bits = 0
+    for pos in tokens:
+        bits |= 1 << pos_to_bit(pos)
+    return bits
+
+
+def tokens_from_bits(bits: int):
+    """Build a set of positions from a bitboard
+
+    :param bits: the bitboard
+    :type bits: int
+    :return: the positions of the tokens
+    :rtype: set
+    """
+    tokens = set()
+    while bits:
+        low = bits & -bits
+        tokens.add(bit_to_pos(low.bit_length() - 1))
+        bits ^= low
+    return tokens
+
+
+def mirror_bits(bits: int):
+    """Get the left-right mirror image of a bitboard
+
+    :param bits: the bitboard
+    :type bits: int
+    :return: the mirrored bitboard
+    :rtype: int
+    """
+    column_mask = (1 << COLUMN_BITS) - 1
+    mirrored = 0
+    for column in range(WIDTH):
+        cells = (bits >> (column * COLUMN_BITS)) & column_mask
+        mirrored |= cells << ((WIDTH - 1 - column) * COLUMN_BITS)
+    return mirrored
+
+
+def mirror_column(column: int):
+    """Get the column of the left-right mirror image of a column
+
+    :param column: the column
+    :type column: int
+    :return: the mirrored column
+    :rtype: int
+    """
+    return WIDTH - 1 - column
+
+
+def position_key(current: int, mask: int):
+    """Get the key of a position, unique for each position
+
+    The key only depends on the bitboards, so it follows each move without
+    any extra work
+
+    :param current: the tokens of the player who has to play
+    :type current: int
+    :param mask: the tokens of both players
+    :type mask: int
+    :return: the key, lower than 2 ** 49 on the 7x6 grid
+    :rtype: int
+    """
+    return current + mask
+
+
+def canonical_key(
+    current: int,
+    mask: int,
+    mirror_current: Union[None, int] = None,
+    mirror_mask: Union[None, int] = None,
+):
+    """Get the key shared by a position and its left-right mirror image, the
+    smallest of their two keys, so that caches store one entry for both
+
+    The bitboards of the mirror image can be followed move by move along
+    with the position (playing column c in the position plays column
+    WIDTH - 1 - c in its mirror image), else they are computed here, which
+    needs the 7x6 grid
+
+    :param current: the tokens of the player who has to play
+    :type current: int
+    :param mask: the tokens of both players
+    :type mask: int
+    :param mirror_current: the mirror image of current, defaults to None
+    :type mirror_current: Union[None, int], optional
+    :param mirror_mask: the mirror image of mask, defaults to None
+    :type mirror_mask: Union[None, int], optional
+    :return: the key, and True if it is the key of the mirror image, so that
+             the columns stored with it must be mirrored back
+    :rtype: tuple[int, bool]
+    """
+    if mirror_current is None:
+        mirror_current = mirror_bits(current)
+        mirror_mask = mirror_bits(mask)
+    key = position_key(current, mask)
+    mirror_key = position_key(mirror_current, mirror_mask)
+    if mirror_key < key:
+        return mirror_key, True
+    return key, False
+
+
+def is_alignment(bits: int):
+    """Tells if a bitboard contains four aligned tokens
+
+    :param bits: the bitboard
+    :type bits: int
+    :return: True if there is an alignment, else False
+    :rtype: bool
+    """
+    # vertical, horizontal, diagonal 1 and diagonal 2
+    for shift in (1, COLUMN_BITS, COLUMN_BITS - 1, COLUMN_BITS + 1):
+        pairs = bits & (bits >> shift)
+        if pairs & (pairs >> (2 * shift)):
+            return True
+    return False
+
+
+class BitboardConnect4:
+    """Bitboard implementation of Connect4, one integer per player"""
+
+    def __init__(
+        self,
+        player1: Union[None, set] = None,
+        player2: Union[None, set] = None,
+        turn: int = 0,
+    ):
+        """Initialisation
+
+        :param player1: the position of player 1 tokens, defaults to None
+                        means that the player have no tokens yet
+        :type player1: Union[None, set], optional
+        :param player2: the position of player 2 tokens, defaults to None
+                        means that the player have no tokens yet
+        :type player2: Union[None, set], optional
+        :param turn: the number of turns
+        :type turn: int
+        """
+        self.bits1 = bits_from_tokens(player1 or ())
+        self.bits2 = bits_from_tokens(player2 or ())
+        # the bitboards of the mirror image, followed move by move
+        self.mirror1 = mirror_bits(self.bits1)
+        self.mirror2 = mirror_bits(self.bits2)
+        mask = self.bits1 | self.bits2
+        self.heights = [
+            ((mask >> (column * COLUMN_BITS)) & ((1 << HEIGHT) - 1)).bit_length()
+            for column in range(WIDTH)
+        ]
+        self.count_turn = turn
+
+    def get_player(self):
+        """Get players turn
+
+        :return: the player
+        :rtype: int
+        """
+        if self.count_turn % 2 == 0:
+            return 1
+        return 2
+
+    def get_player_bits(self, player: int):
+        """Get the bitboard of a player
+
+        :param player: the player
+        :type player: int
+        :return: the bitboard
+        :rtype: int
+        """
+        if player == 1:
+            return self.bits1
+        return self.bits2
+
+    def get_player_tokens(self, player: int):
+        """Get all tokens of a player
+
+        :param player: the player
+        :type player: int
+        :return: the tokens
+        :rtype: set
+        """
+        return tokens_from_bits(self.get_player_bits(player))
+
+    def add_token(self, column: int, player: int):
+        """add a token to player, depending on the column
+
+        :param column: the column where the player inserted the token
+        :type column: int
+        :param player: the player who played
+        :type player: int
+        :return: the position of the token, None if there is no place
+                 remaining in the column
+        :rtype: Union[int, None]
+        """
+        height = self.heights[column]
+        if height >= HEIGHT:
+            return None
+        bit = 1 << (column * COLUMN_BITS + height)
+        mirror_bit = 1 << (mirror_column(column) * COLUMN_BITS + height)
+        if player == 1:
+            self.bits1 |= bit
+            self.mirror1 |= mirror_bit
+        else:
+            self.bits2 |= bit
+            self.mirror2 |= mirror_bit
+        self.heights[column] = height + 1
+        return 10 * (HEIGHT - 1 - height) + column
+
+    def add_turn(self):
+        """Add a turn to the turn's counter
+
+        :return: the new amount of turns
+        :rtype: int
+        """
+        self.count_turn += 1
+        return self.count_turn
+
+    def canonical_key(self):
+        """Get the key shared by the position and its mirror image
+
+        :return: the key, and True if it is the key of the mirror image
+        :rtype: tuple[int, bool]
+        """
+        if self.count_turn % 2 == 0:
+            current, mirror_current = self.bits1, self.mirror1
+        else:
+            current, mirror_current = self.bits2, self.mirror2
+        return canonical_key(
+            current,
+            self.bits1 | self.bits2,
+            mirror_current,
+            self.mirror1 | self.mirror2,
+        )
+
+    def is_win(self, pos: Union[int, None]):
+        """Tells if a player wins based on his last placed token
+
+        :param pos: the positions of the last token if type is int, else the
+                    whole grid
+        :type pos: Union[int, None]
+        :return: True if he wins, else False
+        :rtype: bool
+        """
+        return is_alignment(self.get_player_bits(self.get_player()))
+
+    def copy(self):
+        """Copy the actual state of the game
+
+        :return: a new BitboardConnect4 object
+        :rtype: object
+        """
+        board = BitboardConnect4.__new__(BitboardConnect4)
+        board.bits1 = self.bits1
+        board.bits2 = self.bits2
+        board.mirror1 = self.mirror1
+        board.mirror2 = self.mirror2
+        board.heights = self.heights.copy()
+        board.count_turn = self.count_turn
+        return board
+
+    def is_pos_empty(self, pos: int):
+        """Tells if a player already placed a token at a specific position
+
+        :param pos: the position to check
+        :type pos: int
+        :return: True if no players owns a token at the position, else False
+        :rtype: bool
+        """
+        return not ((self.bits1 | self.bits2) >> pos_to_bit(pos)) & 1
@@ -0,0 +1,344 @@
+import argparse
+import mmap
+import os
+import struct
+import sys
+from array import array
+from bisect import bisect_left
+from time import perf_counter
+from typing import Union
+from bitboard import WIDTH, canonical_key
+from records import read_records
+from game import get_geometry
+from solver import Solver, BOTTOM, STANDARD, TOP, is_winning_move
+
+# File layout, little endian:
+# header (magic, version, depth, number of positions), then the sorted keys
+# on 8 bytes each, then the scores on 1 signed byte each
+MAGIC = b"C4BK"
+VERSION = 1
+HEADER = struct.Struct("<4sHHQ")
+
+
+def book_key(
+    current: int,
+    mask: int,
+    mirror_current: Union[None, int] = None,
+    mirror_mask: Union[None, int] = None,
+):
+    """Get the key of a position in a book, a position and its mirror image
+    share the same key
+
+    :param current: the tokens of the player who has to play
+    :type current: int
+    :param mask: the tokens of both players
+    :type mask: int
+    :param mirror_current: the mirror image of current, defaults to None
+                           means computed from current
+    :type mirror_current: Union[None, int], optional
+    :param mirror_mask: the mirror image of mask, defaults to None
+    :type mirror_mask: Union[None, int], optional
+    :return: the key
+    :rtype: int
+    """
+    return canonical_key(current, mask, mirror_current, mirror_mask)[0]
+
+
+class OpeningBook:
+    """Read only opening book, memory-mapped so that the file is never parsed
+    and is shared between processes through the page cache"""
+
+    def __init__(self, path: str):
+        """Initialisation
+
+        :param path: the path of the book
+        :type path: str
+        """
+        with open(path, "rb") as file:
+            self.map = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, self.depth, self.count = HEADER.unpack_from(self.map)
+        if magic != MAGIC or version != VERSION:
+            self.map.close()
+            raise ValueError(f"{path} is not an opening book")
+        view = memoryview(self.map)
+        end_keys = HEADER.size + 8 * self.count
+        self.keys = view[HEADER.size : end_keys].cast("Q")
+        self.scores = view[end_keys : end_keys + self.count].cast("b")
+
+    def get(
+        self,
+        current: int,
+        mask: int,
+        mirror_current: Union[None, int] = None,
+        mirror_mask: Union[None, int] = None,
+    ):
+        """Get the score of a position
+
+        :param current: the tokens of the player who has to play
+        :type current: int
+        :param mask: the tokens of both players
+        :type mask: int
+        :param mirror_current: the mirror image of current, defaults to None
+                               means computed from current
+        :type mirror_current: Union[None, int], optional
+        :param mirror_mask: the mirror image of mask, defaults to None
+        :type mirror_mask: Union[None, int], optional
+        :return: the score, None if the position is not in the book
+        :rtype: Union[int, None]
+        """
+        key = book_key(current, mask, mirror_current, mirror_mask)
+        index = bisect_left(self.keys, key)
+        if index < self.count and self.keys[index] == key:
+            return self.scores[index]
+        return None
+
+    def close(self):
+        """Unmap the file"""
+        self.keys.release()
+        self.scores.release()
+        self.map.close()
+
+
+class MemoryBook:
+    """Opening book kept in a dict, used while a book is built so that the
+    positions already solved cut the search of the shallower ones"""
+
+    def __init__(self, depth: int, scores: dict):
+        """Initialisation
+
+        :param depth: the maximum number of tokens of the positions
+        :type depth: int
+        :param scores: the scores by key, filled as positions are solved
+        :type scores: dict[int, int]
+        """
+        self.depth = depth
+        self.scores = scores
+
+    def get(
+        self,
+        current: int,
+        mask: int,
+        mirror_current: Union[None, int] = None,
+        mirror_mask: Union[None, int] = None,
+    ):
+        """Get the score of a position
+
+        :param current: the tokens of the player who has to play
+        :type current: int
+        :param mask: the tokens of both players
+        :type mask: int
+        :param mirror_current: the mirror image of current, defaults to None
+                               means computed from current
+        :type mirror_current: Union[None, int], optional
+        :param mirror_mask: the mirror image of mask, defaults to None
+        :type mirror_mask: Union[None, int], optional
+        :return: the score, None if the position is not solved yet
+        :rtype: Union[int, None]
+        """
+        return self.scores.get(book_key(current, mask, mirror_current, mirror_mask))
+
+
+def read_book(path: str):
+    """Read the scores of an opening book
+
+    :param path: the path of the book
+    :type path: str
+    :raises ValueError: if the file is not an opening book
+    :return: the depth of the book, and the scores by key
+    :rtype: tuple[int, dict[int, int]]
+    """
+    book = OpeningBook(path)
+    try:
+        return book.depth, dict(zip(book.keys.tolist(), book.scores.tolist()))
+    finally:
+        book.close()
+
+
+def enumerate_positions(depth: int):
+    """Get all positions with at most ``depth`` tokens and no winner, one per
+    pair of mirror images
+
+    :param depth: the maximum number of tokens
+    :type depth: int
+    :return: the positions, by key
+    :rtype: dict[int, tuple[int, int, int]]
+    """
+    positions = {}
+    stack = [(0, 0, 0)]
+    while stack:
+        current, mask, moves = stack.pop()
+        key = book_key(current, mask)
+        if key in positions:
+            continue
+        positions[key] = current, mask, moves
+        if moves == depth:
+            continue
+        for column in range(WIDTH):
+            if mask & TOP[column] or is_winning_move(current, mask, column):
+                continue
+            child_mask = mask | (mask + BOTTOM[column])
+            stack.append((current ^ mask, child_mask, moves + 1))
+    return positions
+
+
+def record_positions(paths: list, depth: int):
+    """Get the positions of the games of archives with at most ``depth``
+    tokens and no winner, one per pair of mirror images. The games of other
+    grids than the 7x6 one are skipped.
+
+    :param paths: the paths of the archives, see records.py
+    :type paths: list[str]
+    :param depth: the maximum number of tokens
+    :type depth: int
+    :return: the positions, by key
+    :rtype: dict[int, tuple[int, int, int]]
+    """
+    positions = {}
+    for path in paths:
+        for record in read_records(path):
+            geometry = get_geometry(record.width, record.height, record.connect)
+            if geometry is not STANDARD:
+                continue
+            current = mask = moves = 0
+            while True:
+                key = book_key(current, mask)
+                if key not in positions:
+                    positions[key] = current, mask, moves
+                if moves == depth or moves == len(record.moves):
+                    break
+                column = record.moves[moves]
+                if is_winning_move(current, mask, column):
+                    break
+                current, mask = current ^ mask, mask | (mask + BOTTOM[column])
+                moves += 1
+    return positions
+
+
+def write_book(path: str, depth: int, scores: dict):
+    """Write an opening book. It is written in a temporary file first, so
+    that the processes reading the book never see it half written.
+
+    :param path: the path of the book
+    :type path: str
+    :param depth: the maximum number of tokens of the positions
+    :type depth: int
+    :param scores: the scores by key
+    :type scores: dict[int, int]
+    """
+    keys = sorted(scores)
+    packed_keys = array("Q", keys)
+    if sys.byteorder != "little":
+        packed_keys.byteswap()
+    temporary = path + ".tmp"
+    with open(temporary, "wb") as file:
+        file.write(HEADER.pack(MAGIC, VERSION, depth, len(keys)))
+        file.write(packed_keys.tobytes())
+        file.write(array("b", [scores[key] for key in keys]).tobytes())
+    os.replace(temporary, path)
+
+
+def generate_book(
+    path: str,
+    depth: int,
+    max_time: float = None,
+    verbose: bool = False,
+    records: Union[None, list] = None,
+    save_time: float = 60.0,
+):
+    """Solve the positions up to a depth and write them in an opening book.
+    The positions whose search did not finish are left out.
+
+    The build can be stopped and run again: the scores of an existing book
+    are kept and only the other positions are searched, so a longer max_time
+    adds the positions left out before. The book is saved every save_time
+    seconds and when the build stops.
+
+    :param path: the path of the book
+    :type path: str
+    :param depth: the maximum number of tokens of the positions
+    :type depth: int
+    :param max_time: the maximum time to solve each position, defaults to
+                     None means no limit
+    :type max_time: float, optional
+    :param verbose: print the progress, defaults to False
+    :type verbose: bool, optional
+    :param records: takes the positions of the games of these archives
+                    instead of all positions, defaults to None
+    :type records: Union[None, list[str]], optional
+    :param save_time: the time in seconds between two saves of the book,
+                      defaults to 60
+    :type save_time: float, optional
+    :return: the number of positions in the book
+    :rtype: int
+    """
+    if records is None:
+        positions = enumerate_positions(depth)
+    else:
+        positions = record_positions(records, depth)
+    scores = {}
+    if os.path.exists(path):
+        book_depth, scores = read_book(path)
+        depth = max(depth, book_depth)
+    # the solved positions are given to the solver as a book, and the deepest
+    # positions come first, so a position is often cut by the scores of the
+    # positions that follow it
+    solver = Solver(max_time=max_time, book=MemoryBook(depth, scores))
+    ordered = [item for item in positions.items() if item[0] not in scores]
+    ordered.sort(key=lambda item: -item[1][2])
+    saved = perf_counter()
+    try:
+        for done, (key, (current, mask, moves)) in enumerate(ordered, 1):
+            score = solver.search(current, mask, moves)[0]
+            if solver.exact:
+                scores[key] = score
+            if perf_counter() - saved >= save_time:
+                write_book(path, depth, scores)
+                saved = perf_counter()
+                if verbose:
+                    print(
+                        f"{done}/{len(ordered)} positions searched, "
+                        f"{len(scores)} in the book",
+                        file=sys.stderr,
+                    )
+    finally:
+        write_book(path, depth, scores)
+    return len(scores)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Connect 4 opening book")
+    parser.add_argument("output", help="The path of the book to write")
+    parser.add_argument(
+        "--records",
+        nargs="+",
+        default=None,
+        help="Takes the positions of the games of these archives, see "
+        "records.py, instead of all positions",
+    )
+    parser.add_argument(
+        "--depth",
+        "-d",
+        type=int,
+        default=None,
+        help="The maximum number of tokens of the positions in the book, 12 "
+        "with --records and 4 without",
+    )
+    parser.add_argument(
+        "--max-time",
+        type=float,
+        default=60.0,
+        help="The maximum time in seconds to solve each position, the "
+        "positions that are not solved in time are left out until the build "
+        "is run again",
+    )
+    args = vars(parser.parse_args())
+    depth = args["depth"]
+    if depth is None:
+        depth = 4 if args["records"] is None else 12
+    try:
+        count = generate_book(
+            args["output"], depth, args["max_time"], True, args["records"]
+        )
+    except KeyboardInterrupt:
+        sys.exit(f"stopped, the solved positions are kept in {args['output']}")
+    print(f"{count} positions written in {args['output']}")
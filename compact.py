@@ -0,0 +1,226 @@
+import sys
+from array import array
+from bitboard import (
+    WIDTH,
+    COLUMN_BITS,
+    bits_from_tokens,
+    canonical_key,
+    tokens_from_bits,
+)
+from game import Connect4
+
+# A position is encoded in a single 64 bits word: for each column, the bits of
+# the tokens of player 1 and a sentinel bit just above the highest token of
+# the column, so the height of a column is the position of its highest set
+# bit. The number of turns is in the last byte.
+CODE_SIZE = 8
+TURN_SHIFT = 56
+BOTTOM = sum(1 << (column * COLUMN_BITS) for column in range(WIDTH))
+COLUMN_MASK = (1 << COLUMN_BITS) - 1
+
+
+class CompactBoard:
+    """Small representation of a position without instance dictionary, two
+    bitboards and the number of turns"""
+
+    __slots__ = ("bits1", "bits2", "count_turn")
+
+    def __init__(self, bits1: int = 0, bits2: int = 0, turn: int = 0):
+        """Initialisation
+
+        :param bits1: the bitboard of player 1 tokens
+        :type bits1: int
+        :param bits2: the bitboard of player 2 tokens
+        :type bits2: int
+        :param turn: the number of turns
+        :type turn: int
+        """
+        self.bits1 = bits1
+        self.bits2 = bits2
+        self.count_turn = turn
+
+    def __eq__(self, other: object):
+        """Tells if two boards hold the same position
+
+        :param other: the other board
+        :type other: object
+        :return: True if the positions are the same, else False
+        :rtype: bool
+        """
+        if not isinstance(other, CompactBoard):
+            return NotImplemented
+        return (
+            self.bits1 == other.bits1
+            and self.bits2 == other.bits2
+            and self.count_turn == other.count_turn
+        )
+
+    def __hash__(self):
+        """Hash the board by its code
+
+        :return: the hash
+        :rtype: int
+        """
+        return hash(self.encode())
+
+    @classmethod
+    def from_connect4(cls, game: Connect4):
+        """Build a compact board from a game
+
+        :param game: the game
+        :type game: Connect4
+        :raises ValueError: if the game is not on the 7x6 grid, the only one
+                            whose positions fit in a code
+        :return: the compact board
+        :rtype: CompactBoard
+        """
+        if isinstance(game, Connect4) and not game.geometry.is_standard():
+            raise ValueError(
+                f"a compact board only holds the 7x6 grid, not {game.width}x"
+                f"{game.height} with {game.connect} to align"
+            )
+        return cls(
+            bits_from_tokens(game.get_player_tokens(1)),
+            bits_from_tokens(game.get_player_tokens(2)),
+            game.count_turn,
+        )
+
+    def to_connect4(self):
+        """Build a game from the compact board
+
+        :return: the game
+        :rtype: Connect4
+        """
+        return Connect4(
+            self.get_player_tokens(1), self.get_player_tokens(2), self.count_turn
+        )
+
+    def get_player_tokens(self, player: int):
+        """Get all tokens of a player
+
+        :param player: the player
+        :type player: int
+        :return: the tokens
+        :rtype: set
+        """
+        if player == 1:
+            return tokens_from_bits(self.bits1)
+        return tokens_from_bits(self.bits2)
+
+    def encode(self):
+        """Encode the board in a 64 bits integer
+
+        :return: the code
+        :rtype: int
+        """
+        mask = self.bits1 | self.bits2
+        return self.bits1 | (mask + BOTTOM) | (self.count_turn << TURN_SHIFT)
+
+    @classmethod
+    def decode(cls, code: int):
+        """Build a compact board from its code
+
+        :param code: the code given by encode
+        :type code: int
+        :return: the compact board
+        :rtype: CompactBoard
+        """
+        bits1 = 0
+        mask = 0
+        for column in range(WIDTH):
+            shift = column * COLUMN_BITS
+            cells = (code >> shift) & COLUMN_MASK
+            height = cells.bit_length() - 1
+            column_mask = (1 << height) - 1
+            bits1 |= (cells & column_mask) << shift
+            mask |= column_mask << shift
+        return cls(bits1, mask ^ bits1, code >> TURN_SHIFT)
+
+    def canonical_key(self):
+        """Get the key shared by the position and its mirror image
+
+        :return: the key, and True if it is the key of the mirror image
+        :rtype: tuple[int, bool]
+        """
+        current = self.bits1 if self.count_turn % 2 == 0 else self.bits2
+        return canonical_key(current, self.bits1 | self.bits2)
+
+    def to_bytes(self):
+        """Encode the board in 8 bytes
+
+        :return: the bytes
+        :rtype: bytes
+        """
+        return self.encode().to_bytes(CODE_SIZE, "little")
+
+    @classmethod
+    def from_bytes(cls, data: bytes):
+        """Build a compact board from the bytes given by to_bytes
+
+        :param data: the bytes
+        :type data: bytes
+        :return: the compact board
+        :rtype: CompactBoard
+        """
+        return cls.decode(int.from_bytes(data, "little"))
+
+
+def encode_boards(boards: list):
+    """Encode many boards in an array, 8 bytes per board
+
+    :param boards: the boards
+    :type boards: list[CompactBoard]
+    :return: the codes
+    :rtype: array
+    """
+    return array("Q", (board.encode() for board in boards))
+
+
+def unique_boards(boards: list):
+    """Remove the boards whose position, or its mirror image, was already
+    seen, keeping the order of the others
+
+    :param boards: the boards
+    :type boards: list[CompactBoard]
+    :return: the first board of each position
+    :rtype: list[CompactBoard]
+    """
+    seen = set()
+    unique = []
+    for board in boards:
+        key = board.canonical_key()[0]
+        if key not in seen:
+            seen.add(key)
+            unique.append(board)
+    return unique
+
+
+def save_boards(path: str, codes: array):
+    """Write encoded boards in a file
+
+    :param path: the path of the file
+    :type path: str
+    :param codes: the codes given by encode_boards
+    :type codes: array
+    """
+    if sys.byteorder != "little":
+        codes = array("Q", codes)
+        codes.byteswap()
+    with open(path, "wb") as file:
+        codes.tofile(file)
+
+
+def load_boards(path: str):
+    """Read encoded boards from a file
+
+    :param path: the path of the file
+    :type path: str
+    :return: the codes, decode them with CompactBoard.decode
+    :rtype: array
+    """
+    codes = array("Q")
+    with open(path, "rb") as file:
+        codes.frombytes(file.read())
+    if sys.byteorder != "little":
+        codes.byteswap()
+    return codes
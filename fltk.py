@@ -1,25 +1,27 @@
-import subprocess
+import struct
 import sys
 import tkinter as tk
-from collections import deque
+import zlib
+from collections import Counter, OrderedDict, deque
 from os import system
-from time import time, sleep
+from heapq import heappop, heappush
+from itertools import count
+from time import perf_counter, time, sleep
 from tkinter.font import Font
-import pygame
 
-try:
-    from PIL import Image, ImageTk
-
-    print("Bibliothèque PIL chargée.", file=sys.stderr)
-    PIL_AVAILABLE = True
-except ImportError as e:
-    PIL_AVAILABLE = False
+# PIL et pygame ne sont chargés qu'à leur première utilisation (voir
+# charge_pil et SoundManager), PIL_AVAILABLE vaut None tant que PIL n'a pas été
+# cherchée
+PIL_AVAILABLE = None
+Image = None
+ImageTk = None
 
 __all__ = [
     # gestion de fenêtre
     "cree_fenetre",
     "ferme_fenetre",
     "mise_a_jour",
+    "choisit_moteur",
     # dessin
     "ligne",
     "fleche",
@@ -28,14 +30,27 @@ __all__ = [
     "cercle",
     "point",
     "image",
+    "cercle_sprite",
     "texte",
     "taille_texte",
     # effacer
     "efface_tout",
     "efface",
+    # modifier
+    "deplace",
+    "coordonnees",
+    "modifie",
     # utilitaires
     "attente",
     "capture_ecran",
+    "charge_son",
+    "joue_son",
+    "son_disponible",
+    "demarre_film",
+    "image_film",
+    "arrete_film",
+    "cache_images",
+    "statistiques_images",
     "touche_pressee",
     "abscisse_souris",
     "ordonnee_souris",
@@ -45,9 +60,23 @@ __all__ = [
     "attend_clic_gauche",
     "attend_fermeture",
     "type_ev",
+    "statistiques_ev",
+    "statistiques_dessin",
+    "rejoue_ev",
+    "demarre_enregistrement",
+    "arrete_enregistrement",
     "abscisse",
     "ordonnee",
     "touche",
+    # boucle d'événements
+    "lie_ev",
+    "delie_ev",
+    "poste_ev",
+    "donnee",
+    "planifie",
+    "annule",
+    "boucle_principale",
+    "quitte_boucle",
 ]
 
 
@@ -69,27 +98,74 @@ class CustomCanvas:
 
     _default_ev = ["ClicGauche", "ClicDroit", "Touche"]
 
-    def __init__(self, width, height, title, refresh_rate=100, events=None):
+    # consecutive events of these types are merged, only the latest is kept
+    _coalesced_ev = {"Deplacement"}
+
+    # time between two checks of the events posted by other threads, in ms
+    _poll_interval = 50
+
+    def __init__(
+        self,
+        width,
+        height,
+        title,
+        refresh_rate=100,
+        events=None,
+        queue_size=None,
+        drop_policy="ancien",
+        backend="tk",
+    ):
         # width and height of the canvas
         self.width = width
         self.height = height
         self.interval = 1 / refresh_rate
 
-        # root Tk object
-        self.root = tk.Tk()
+        # maximum length of the event queue (None for no limit), and which
+        # event is lost when it is full: the oldest one ("ancien") or the new
+        # one ("nouveau")
+        if drop_policy not in ("ancien", "nouveau"):
+            raise ValueError(f"unknown drop policy {drop_policy!r}")
+        self.queue_size = queue_size
+        self.drop_policy = drop_policy
+        self.dropped = 0
+        self.coalesced = 0
+        self.pending = dict()
+
+        # events posted by other threads, given to the main thread by a timer
+        # that only runs while a function is bound to a posted event type
+        self.posted = deque()
+        self.posted_names = set()
+        self.poll_timer = None
+
+        # root and canvas objects, from tkinter or the null backend that
+        # only records the drawing calls
+        if backend == "tk":
+            self.root = tk.Tk()
+            self.canvas = tk.Canvas(
+                self.root, width=width, height=height, highlightthickness=0
+            )
+        elif backend == "nul":
+            self.root = NullRoot()
+            self.canvas = NullCanvas(self.root, width=width, height=height)
+        else:
+            raise ValueError(f"unknown backend {backend!r}")
+        self.backend = backend
         self.root.title(title)
 
-        # canvas attached to the root object
-        self.canvas = tk.Canvas(
-            self.root, width=width, height=height, highlightthickness=0
-        )
+        # input events given to the handlers are recorded in this list, see
+        # demarre_enregistrement
+        self.recording = None
+        self.last_record = None
+        self.script_timer = None
 
         # adding the canvas to the root window and giving it focus
         self.canvas.pack()
         self.canvas.focus_set()
 
-        # binding events
+        # binding events, events with a handler are given to it instead of
+        # being queued
         self.ev_queue = deque()
+        self.handlers = dict()
         self.pressed_keys = set()
         self.events = CustomCanvas._default_ev if events is None else events
         self.bind_events()
@@ -101,7 +177,7 @@ class CustomCanvas:
         self.last_update = time()
         self.root.update()
 
-        if CustomCanvas._on_osx:
+        if CustomCanvas._on_osx and backend == "tk":
             system(
                 """/usr/bin/osascript -e 'tell app "Finder" \
                    to set frontmost of process "Python" to true' """
@@ -110,6 +186,7 @@ class CustomCanvas:
     def update(self):
         t = time()
         self.root.update()
+        self.flush_posted()
         sleep(max(0.0, self.interval - (t - self.last_update)))
         self.last_update = time()
 
@@ -128,13 +205,113 @@ class CustomCanvas:
             self.pressed_keys.remove(ev.keysym)
 
     def event_quit(self):
-        self.ev_queue.append(("Quitte", ""))
+        self.record("Quitte", None)
+        self.dispatch(("Quitte", ""))
+
+    def record(self, name, data):
+        if self.recording is None:
+            return
+        now = perf_counter()
+        self.recording.append((now - self.last_record, name, data))
+        self.last_record = now
+
+    def replay(self, script, index=0):
+        # the events of the script are given one by one by timers, as if
+        # they came from the user
+        self.script_timer = None
+        if index >= len(script):
+            return
+        _, name, data = script[index]
+        if name == "Quitte":
+            self.event_quit()
+        elif name in self.events or name in self.handlers:
+            if name == "Touche":
+                event = NullEvent(keysym=data)
+                self.pressed_keys.add(data)
+            else:
+                event = NullEvent(*data)
+            self.record(name, data)
+            self.dispatch((name, event))
+            self.pressed_keys.discard(event.keysym)
+        if index + 1 < len(script):
+            delay = int(script[index + 1][0] * 1000)
+            self.script_timer = self.root.after(delay, self.replay, script, index + 1)
+
+    def dispatch(self, ev):
+        name = ev[0]
+        handler = self.handlers.get(name)
+        if handler is not None:
+            if name not in CustomCanvas._coalesced_ev:
+                handler(ev)
+            elif name in self.pending:
+                self.pending[name] = ev
+                self.coalesced += 1
+            else:
+                # the handler is called once Tk is idle, with the latest event
+                self.pending[name] = ev
+                self.root.after_idle(self.dispatch_pending, name)
+        elif (
+            name in CustomCanvas._coalesced_ev
+            and self.ev_queue
+            and self.ev_queue[-1][0] == name
+        ):
+            self.ev_queue[-1] = ev
+            self.coalesced += 1
+        elif self.queue_size is not None and len(self.ev_queue) >= self.queue_size:
+            self.dropped += 1
+            if self.drop_policy == "ancien":
+                self.ev_queue.popleft()
+                self.ev_queue.append(ev)
+        else:
+            self.ev_queue.append(ev)
+
+    def post(self, ev):
+        # deque.append is thread safe, tkinter is not: the event is only
+        # dispatched by the main thread
+        self.posted.append(ev)
+
+    def flush_posted(self):
+        while self.posted:
+            self.dispatch(self.posted.popleft())
+
+    def poll_posted(self):
+        self.flush_posted()
+        if not self.posted_names:
+            self.poll_timer = None
+            return
+        # the null backend does not wait for this timer to end its loop
+        after = getattr(self.root, "after_background", self.root.after)
+        self.poll_timer = after(CustomCanvas._poll_interval, self.poll_posted)
+
+    def start_polling(self):
+        if self.poll_timer is None and self.posted_names:
+            self.poll_posted()
+
+    def stop_polling(self):
+        if self.poll_timer is not None:
+            self.root.after_cancel(self.poll_timer)
+            self.poll_timer = None
+
+    def dispatch_pending(self, name):
+        ev = self.pending.pop(name, None)
+        handler = self.handlers.get(name)
+        if ev is None:
+            return
+        if handler is None:
+            self.dispatch(ev)
+        else:
+            handler(ev)
 
     def bind_event(self, name):
         e_type = CustomCanvas._ev_mapping.get(name, name)
 
         def handler(event, _name=name):
-            self.ev_queue.append((_name, event))
+            if self.recording is not None:
+                if _name == "Touche":
+                    self.record(_name, event.keysym)
+                else:
+                    self.record(_name, (event.x, event.y))
+            self.dispatch((_name, event))
 
         self.canvas.bind(e_type, handler, "+")
 
@@ -143,8 +320,640 @@ class CustomCanvas:
         self.canvas.unbind(e_type)
 
 
+class NullEvent:
+    """
+    Événement créé par le moteur sans affichage ou par ``rejoue_ev``, avec
+    les attributs utilisés des événements de tkinter.
+    """
+
+    def __init__(self, x=0, y=0, keysym=""):
+        self.x = x
+        self.y = y
+        self.keysym = keysym
+        self.char = keysym if len(keysym) == 1 else ""
+
+
+class NullRoot:
+    """
+    Remplace ``tk.Tk`` sans ouvrir de fenêtre : les minuteurs sont gérés par
+    une file de priorité et ``mainloop`` s'arrête quand plus rien ne peut se
+    produire.
+    """
+
+    def __init__(self):
+        self.timers = []
+        self.cancelled = set()
+        # timers that do not keep mainloop running by themselves
+        self.background = set()
+        self.ids = count()
+        self.running = False
+        self.protocols = dict()
+        self.name = ""
+
+    def title(self, name):
+        self.name = name
+
+    def protocol(self, name, function):
+        self.protocols[name] = function
+
+    def after(self, ms, function, *args):
+        identifier = f"after#{next(self.ids)}"
+        due = perf_counter() + ms / 1000
+        heappush(self.timers, (due, identifier, function, args))
+        return identifier
+
+    def after_idle(self, function, *args):
+        return self.after(0, function, *args)
+
+    def after_background(self, ms, function, *args):
+        identifier = self.after(ms, function, *args)
+        self.background.add(identifier)
+        return identifier
+
+    def after_cancel(self, identifier):
+        self.cancelled.add(identifier)
+
+    def run_timers(self):
+        # only the timers due when the call starts are run, so a timer that
+        # plans itself again cannot block the loop
+        now = perf_counter()
+        while self.timers and self.timers[0][0] <= now:
+            _, identifier, function, args = heappop(self.timers)
+            self.background.discard(identifier)
+            if identifier in self.cancelled:
+                self.cancelled.discard(identifier)
+            else:
+                function(*args)
+
+    def update(self):
+        self.run_timers()
+
+    def mainloop(self):
+        self.running = True
+        while self.running:
+            self.run_timers()
+            while self.timers and self.timers[0][1] in self.cancelled:
+                identifier = heappop(self.timers)[1]
+                self.cancelled.discard(identifier)
+                self.background.discard(identifier)
+            if all(timer[1] in self.background for timer in self.timers):
+                break
+            sleep(max(0.0, self.timers[0][0] - perf_counter()))
+        self.running = False
+
+    def quit(self):
+        self.running = False
+
+    def destroy(self):
+        self.timers.clear()
+        self.cancelled.clear()
+        self.background.clear()
+
+
+class NullCanvas:
+    """
+    Remplace ``tk.Canvas`` sans rien dessiner : les objets sont gardés avec
+    leurs coordonnées et leurs options, et les appels sont comptés.
+    """
+
+    def __init__(self, root, width, height, **options):
+        self.root = root
+        self.width = width
+        self.height = height
+        self.items = dict()
+        self.ids = count(1)
+        self.bindings = dict()
+        self.calls = Counter()
+        self.created = 0
+        self.deleted = 0
+
+    def pack(self):
+        pass
+
+    def focus_set(self):
+        pass
+
+    def bind(self, sequence, function, add=None):
+        self.bindings.setdefault(sequence, []).append(function)
+
+    def unbind(self, sequence):
+        self.bindings.pop(sequence, None)
+
+    def find(self, item):
+        if item == "all":
+            return list(self.items)
+        if item in self.items:
+            return [item]
+        return [key for key, value in self.items.items() if item in value[3]]
+
+    def create(self, kind, coords, options):
+        self.calls["create_" + kind] += 1
+        self.created += 1
+        identifier = next(self.ids)
+        if len(coords) == 1 and isinstance(coords[0], (tuple, list)):
+            coords = coords[0]
+        tags = options.pop("tag", options.pop("tags", ""))
+        tags = {tags} if isinstance(tags, str) and tags else set(tags or ())
+        self.items[identifier] = [kind, list(coords), options, tags]
+        return identifier
+
+    def create_line(self, *coords, **options):
+        return self.create("line", coords, options)
+
+    def create_polygon(self, *coords, **options):
+        return self.create("polygon", coords, options)
+
+    def create_rectangle(self, *coords, **options):
+        return self.create("rectangle", coords, options)
+
+    def create_oval(self, *coords, **options):
+        return self.create("oval", coords, options)
+
+    def create_arc(self, *coords, **options):
+        return self.create("arc", coords, options)
+
+    def create_text(self, *coords, **options):
+        return self.create("text", coords, options)
+
+    def create_image(self, *coords, **options):
+        return self.create("image", coords, options)
+
+    def delete(self, item):
+        self.calls["delete"] += 1
+        for identifier in self.find(item):
+            del self.items[identifier]
+            self.deleted += 1
+
+    def move(self, item, dx, dy):
+        self.calls["move"] += 1
+        for identifier in self.find(item):
+            coords = self.items[identifier][1]
+            for i in range(len(coords)):
+                coords[i] += dy if i % 2 else dx
+
+    def coords(self, item, *coords):
+        self.calls["coords"] += 1
+        identifiers = self.find(item)
+        if not identifiers:
+            return []
+        if coords:
+            if len(coords) == 1 and isinstance(coords[0], (tuple, list)):
+                coords = coords[0]
+            for identifier in identifiers:
+                self.items[identifier][1] = list(coords)
+        return list(self.items[identifiers[0]][1])
+
+    def itemconfigure(self, item, **options):
+        self.calls["itemconfigure"] += 1
+        for identifier in self.find(item):
+            self.items[identifier][2].update(options)
+
+    itemconfig = itemconfigure
+
+    def find_withtag(self, item):
+        return tuple(self.find(item))
+
+    def postscript(self, **options):
+        self.calls["postscript"] += 1
+
+    def winfo_pointerx(self):
+        return 0
+
+    def winfo_pointery(self):
+        return 0
+
+    def winfo_rootx(self):
+        return 0
+
+    def winfo_rooty(self):
+        return 0
+
+
+class NullPhoto:
+    """
+    Remplace ``tk.PhotoImage`` avec le moteur sans affichage, qui ne garde
+    que la taille de l'image.
+    """
+
+    def __init__(self, width=0, height=0):
+        self.size = (width, height)
+
+    def width(self):
+        return self.size[0]
+
+    def height(self):
+        return self.size[1]
+
+    def put(self, data, to=None):
+        pass
+
+
+class ImageCache:
+    """
+    Images décodées, indexées par fichier et taille, gardées dans la limite
+    d'un nombre d'octets. Les images affichées par un objet du canevas ne
+    sont jamais retirées ; les autres le sont de la moins récemment utilisée
+    à la plus récente quand la limite est dépassée.
+    """
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        # key: [image, size in bytes, number of canvas items showing it]
+        self.entries = OrderedDict()
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def acquire(self, key, load):
+        entry = self.entries.get(key)
+        if entry is None:
+            self.misses += 1
+            photo = load()
+            entry = [photo, photo.width() * photo.height() * 4, 0]
+            self.entries[key] = entry
+            self.size += entry[1]
+        else:
+            self.hits += 1
+            self.entries.move_to_end(key)
+        entry[2] += 1
+        self.evict()
+        return entry[0]
+
+    def release(self, key):
+        entry = self.entries.get(key)
+        if entry is not None and entry[2] > 0:
+            entry[2] -= 1
+            self.evict()
+
+    def release_all(self):
+        for entry in self.entries.values():
+            entry[2] = 0
+        self.evict()
+
+    def evict(self):
+        if self.size <= self.max_bytes:
+            return
+        for key in [key for key, entry in self.entries.items() if entry[2] == 0]:
+            self.size -= self.entries.pop(key)[1]
+            self.evictions += 1
+            if self.size <= self.max_bytes:
+                return
+
+    def clear(self):
+        self.entries.clear()
+        self.size = 0
+
+
+# couleurs reconnues sans tkinter, avec les codes '#rgb' et '#rrggbb'
+COULEURS = {
+    "white": (255, 255, 255),
+    "black": (0, 0, 0),
+    "red": (255, 0, 0),
+    "green": (0, 255, 0),
+    "blue": (0, 0, 255),
+    "yellow": (255, 255, 0),
+    "cyan": (0, 255, 255),
+    "magenta": (255, 0, 255),
+    "orange": (255, 165, 0),
+    "purple": (160, 32, 240),
+    "pink": (255, 192, 203),
+    "brown": (165, 42, 42),
+    "grey": (190, 190, 190),
+    "gray": (190, 190, 190),
+}
+
+
+class SoundManager:
+    """
+    Sons décodés une seule fois et joués sur un nombre fixe de voies. Le
+    mélangeur de pygame n'est démarré qu'une fois ; sans pygame ou sans
+    sortie audio, les sons ne sont pas joués.
+    """
+
+    def __init__(self, channels=8):
+        self.channels = channels
+        # pygame.mixer once started, False if it cannot be
+        self.mixer = None
+        self.sounds = dict()
+
+    def start(self):
+        if self.mixer is None:
+            try:
+                import pygame
+
+                # a small buffer so the sounds start at once
+                pygame.mixer.pre_init(buffer=512)
+                pygame.mixer.init()
+                pygame.mixer.set_num_channels(self.channels)
+                self.mixer = pygame.mixer
+            except (ImportError, RuntimeError):
+                self.mixer = False
+        return self.mixer is not False
+
+    def load(self, name, file):
+        if name in self.sounds:
+            return self.sounds[name]
+        if not self.start():
+            return None
+        sound = self.mixer.Sound(file)
+        self.sounds[name] = sound
+        return sound
+
+    def play(self, name, volume):
+        sound = self.load(name, name)
+        if sound is None:
+            return
+        channel = self.mixer.find_channel(True)
+        channel.set_volume(volume)
+        channel.play(sound)
+
+
+class Raster:
+    """
+    Image du canevas avec un octet par pixel, indice d'une couleur dans une
+    palette d'au plus 256 couleurs. Les formes sont remplies ligne par ligne.
+    """
+
+    def __init__(self, width, height, rgb):
+        self.width = width
+        self.height = height
+        # rgb gives the red, green and blue values of a colour name
+        self.rgb = rgb
+        self.palette = [(255, 255, 255)]
+        self.colors = {(255, 255, 255): 0}
+        self.names = dict()
+        self.pixels = bytearray(width * height)
+
+    def clear(self):
+        self.pixels = bytearray(self.width * self.height)
+
+    def index(self, name):
+        if name in self.names:
+            return self.names[name]
+        color = self.rgb(name)
+        if color not in self.colors:
+            if len(self.palette) == 256:
+                raise ValueError("plus de 256 couleurs dans la capture")
+            self.colors[color] = len(self.palette)
+            self.palette.append(color)
+        self.names[name] = self.colors[color]
+        return self.names[name]
+
+    def span(self, y, x1, x2, color):
+        if not 0 <= y < self.height:
+            return
+        x1 = max(0, int(round(x1)))
+        x2 = min(self.width, int(round(x2)))
+        if x1 < x2:
+            start = y * self.width
+            self.pixels[start + x1 : start + x2] = bytes((color,)) * (x2 - x1)
+
+    def rows(self, y1, y2):
+        return range(max(0, int(round(y1))), min(self.height, int(round(y2))))
+
+    def rectangle(self, x1, y1, x2, y2, outline, fill, width):
+        x1, x2 = min(x1, x2), max(x1, x2)
+        y1, y2 = min(y1, y2), max(y1, y2)
+        for y in self.rows(y1, y2):
+            if outline is not None and (y < y1 + width or y >= y2 - width):
+                self.span(y, x1, x2, outline)
+                continue
+            if outline is not None:
+                self.span(y, x1, x1 + width, outline)
+                self.span(y, x2 - width, x2, outline)
+            if fill is not None:
+                inner = width if outline is not None else 0
+                self.span(y, x1 + inner, x2 - inner, fill)
+
+    def oval(self, x1, y1, x2, y2, outline, fill, width):
+        cx, cy = (x1 + x2) / 2, (y1 + y2) / 2
+        rx, ry = abs(x2 - x1) / 2, abs(y2 - y1) / 2
+        if rx == 0 or ry == 0:
+            return
+        inner_x = rx - width if outline is not None else rx
+        inner_y = ry - width if outline is not None else ry
+        for y in self.rows(cy - ry, cy + ry):
+            dy = y + 0.5 - cy
+            t = 1 - (dy / ry) ** 2
+            if t <= 0:
+                continue
+            half = rx * t**0.5
+            inner = 0
+            if inner_x > 0 and inner_y > 0 and abs(dy) < inner_y:
+                inner = inner_x * (1 - (dy / inner_y) ** 2) ** 0.5
+            if outline is not None:
+                if inner == 0:
+                    self.span(y, cx - half, cx + half, outline)
+                    continue
+                self.span(y, cx - half, cx - inner, outline)
+                self.span(y, cx + inner, cx + half, outline)
+            if fill is not None:
+                self.span(y, cx - inner, cx + inner, fill)
+
+    def polygon(self, points, fill):
+        edges = list(zip(points, points[1:] + points[:1]))
+        ys = [y for _, y in points]
+        for y in self.rows(min(ys), max(ys)):
+            yc = y + 0.5
+            xs = sorted(
+                xa + (yc - ya) * (xb - xa) / (yb - ya)
+                for (xa, ya), (xb, yb) in edges
+                if (ya <= yc < yb) or (yb <= yc < ya)
+            )
+            for i in range(0, len(xs) - 1, 2):
+                self.span(y, xs[i], xs[i + 1], fill)
+
+    def line(self, points, color, width):
+        half = max(width, 1) / 2
+        for (xa, ya), (xb, yb) in zip(points, points[1:]):
+            length = ((xb - xa) ** 2 + (yb - ya) ** 2) ** 0.5 or 1
+            nx, ny = -(yb - ya) / length * half, (xb - xa) / length * half
+            corners = [
+                (xa + nx, ya + ny),
+                (xb + nx, yb + ny),
+                (xb - nx, yb - ny),
+                (xa - nx, ya - ny),
+            ]
+            self.polygon(corners, color)
+
+
+def png(raster):
+    """
+    Encode une image ``Raster`` au format PNG, avec sa palette.
+    """
+
+    def chunk(kind, data):
+        crc = zlib.crc32(kind + data) & 0xFFFFFFFF
+        return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", crc)
+
+    width = raster.width
+    lines = b"".join(
+        b"\x00" + raster.pixels[y * width : (y + 1) * width]
+        for y in range(raster.height)
+    )
+    header = struct.pack(">IIBBBBB", width, raster.height, 8, 3, 0, 0, 0)
+    palette = bytes(value for color in raster.palette for value in color)
+    return (
+        b"\x89PNG\r\n\x1a\n"
+        + chunk(b"IHDR", header)
+        + chunk(b"PLTE", palette)
+        + chunk(b"IDAT", zlib.compress(lines, 6))
+        + chunk(b"IEND", b"")
+    )
+
+
+def lzw(data, min_size):
+    """
+    Compresse des indices de couleurs avec l'algorithme LZW du format GIF.
+    """
+    clear = 1 << min_size
+    size = min_size + 1
+    table = dict()
+    next_code = clear + 2
+    out = bytearray()
+    buffer = clear
+    bits = size
+    code = data[0]
+    for value in data[1:]:
+        key = code << 8 | value
+        found = table.get(key)
+        if found is not None:
+            code = found
+            continue
+        buffer |= code << bits
+        bits += size
+        if next_code == 1 << size and size < 12:
+            size += 1
+        if next_code < 4096:
+            table[key] = next_code
+            next_code += 1
+        else:
+            # table pleine : elle est vidée et le décodeur est prévenu
+            buffer |= clear << bits
+            bits += size
+            table.clear()
+            size = min_size + 1
+            next_code = clear + 2
+        while bits >= 8:
+            out.append(buffer & 0xFF)
+            buffer >>= 8
+            bits -= 8
+        code = value
+    buffer |= code << bits
+    bits += size
+    if next_code == 1 << size and size < 12:
+        size += 1
+    buffer |= (clear + 1) << bits
+    bits += size
+    while bits > 0:
+        out.append(buffer & 0xFF)
+        buffer >>= 8
+        bits -= 8
+    return bytes(out)
+
+
+class GifWriter:
+    """
+    Écrit un GIF animé image par image dans un fichier : seule la partie
+    modifiée depuis l'image précédente est écrite, et une image identique à
+    la précédente allonge sa durée. Seules la dernière image et celle en
+    attente d'écriture sont gardées en mémoire.
+    """
+
+    def __init__(self, path, width, height, delay):
+        self.file = open(path, "wb")
+        self.width = width
+        self.height = height
+        # duration of a frame, in hundredths of a second
+        self.delay = delay
+        self.previous = None
+        self.pending = None
+        self.frames = 0
+        self.file.write(b"GIF89a" + struct.pack("<HHBBB", width, height, 0, 0, 0))
+        # the animation loops forever
+        self.file.write(b"\x21\xff\x0bNETSCAPE2.0\x03\x01\x00\x00\x00")
+
+    def add(self, raster, elapsed=None):
+        # elapsed is the time since the previous frame, in seconds, the
+        # frames are evenly spaced without it
+        if self.pending is not None:
+            self.pending[1] += self.delay if elapsed is None else elapsed * 100
+        pixels = bytes(raster.pixels)
+        box = self.changed_box(pixels)
+        if box is None:
+            return
+        self.flush()
+        x1, y1, x2, y2 = box
+        crop = b"".join(
+            pixels[y * self.width + x1 : y * self.width + x2] for y in range(y1, y2)
+        )
+        self.pending = [(box, crop, list(raster.palette)), 0]
+        self.previous = pixels
+        self.frames += 1
+
+    def changed_box(self, pixels):
+        width = self.width
+        if self.previous is None:
+            return 0, 0, width, self.height
+        rows = [
+            y
+            for y in range(self.height)
+            if pixels[y * width : (y + 1) * width]
+            != self.previous[y * width : (y + 1) * width]
+        ]
+        if not rows:
+            return None
+        # the bytes that differ between the rows are the non zero bytes of
+        # the xor of the rows read as integers
+        x1, x2 = width, 0
+        for y in rows:
+            start = y * width
+            diff = int.from_bytes(
+                pixels[start : start + width], "big"
+            ) ^ int.from_bytes(self.previous[start : start + width], "big")
+            left = width - 1 - (diff.bit_length() - 1) // 8
+            right = width - ((diff & -diff).bit_length() - 1) // 8
+            x1, x2 = min(x1, left), max(x2, right)
+        return x1, rows[0], x2, rows[-1] + 1
+
+    def flush(self):
+        if self.pending is None:
+            return
+        ((x1, y1, x2, y2), crop, palette), delay = self.pending
+        self.pending = None
+        delay = max(2, round(delay))
+        bits = max(1, (len(palette) - 1).bit_length())
+        palette = palette + [(0, 0, 0)] * ((1 << bits) - len(palette))
+        write = self.file.write
+        # durée de l'image, sans effacer la précédente
+        write(struct.pack("<BBBBHBB", 0x21, 0xF9, 4, 0x04, delay, 0, 0))
+        write(struct.pack("<BHHHHB", 0x2C, x1, y1, x2 - x1, y2 - y1, 0x80 | bits - 1))
+        write(bytes(value for color in palette for value in color))
+        min_size = max(2, bits)
+        data = lzw(crop, min_size)
+        write(bytes((min_size,)))
+        for i in range(0, len(data), 255):
+            block = data[i : i + 255]
+            write(bytes((len(block),)) + block)
+        write(b"\x00")
+
+    def close(self):
+        if self.pending is not None:
+            self.pending[1] += self.delay
+        self.flush()
+        self.file.write(b"\x3b")
+        self.file.close()
+
+
 __canevas = None
+__film = None
+__sons = SoundManager()
+# objet du canevas : (clé dans __images ou None, image affichée)
 __img = dict()
+__images = ImageCache(32 * 1024 * 1024)
+__moteur = "tk"
+__script = None
 
 
 #############################################################################
@@ -169,17 +978,60 @@ class FenetreDejaCree(Exception):
 #############################################################################
 
 
-def cree_fenetre(largeur, hauteur, nom_fenetre, frequence=100):
+def cree_fenetre(
+    largeur,
+    hauteur,
+    nom_fenetre,
+    frequence=100,
+    taille_file=None,
+    politique_file="ancien",
+):
     """
     Crée une fenêtre de dimensions ``largeur`` x ``hauteur`` pixels.
-    :rtype:
+
+    Les événements 'Deplacement' consécutifs sont fusionnés, seul le dernier
+    est gardé. Si ``taille_file`` est donnée, la file d'attente des
+    événements est limitée à ``taille_file`` événements : quand elle est
+    pleine, le plus ancien est perdu si ``politique_file`` vaut 'ancien', le
+    nouveau s'il vaut 'nouveau'.
     """
     global __canevas
     if __canevas is not None:
         raise FenetreDejaCree(
             'La fenêtre a déjà été crée avec la fonction "cree_fenetre".'
         )
-    __canevas = CustomCanvas(largeur, hauteur, nom_fenetre, frequence)
+    __canevas = CustomCanvas(
+        largeur,
+        hauteur,
+        nom_fenetre,
+        frequence,
+        queue_size=taille_file,
+        drop_policy=politique_file,
+        backend=__moteur,
+    )
+    if __script is not None:
+        rejoue_ev(__script)
+
+
+def choisit_moteur(moteur="tk", script=None):
+    """
+    Choisit le moteur des fenêtres créées ensuite par ``cree_fenetre`` :
+    'tk' pour tkinter, ou 'nul' pour un moteur sans affichage qui garde les
+    objets dessinés sans les afficher, voir ``statistiques_dessin``. Avec le
+    moteur 'nul', ``boucle_principale`` s'arrête quand plus aucun minuteur
+    n'est prévu.
+
+    Si ``script`` est donné, il est rejoué dans chaque fenêtre créée, voir
+    ``rejoue_ev``.
+
+    :param str moteur: 'tk' ou 'nul'
+    :param list script: événements à rejouer (défaut : aucun)
+    """
+    global __moteur, __script
+    if moteur not in ("tk", "nul"):
+        raise ValueError(f"moteur inconnu {moteur!r}")
+    __moteur = moteur
+    __script = script
 
 
 def ferme_fenetre():
@@ -191,8 +1043,13 @@ def ferme_fenetre():
         raise FenetreNonCree(
             'La fenêtre n\'a pas été crée avec la fonction "cree_fenetre".'
         )
+    arrete_film()
+    __canevas.stop_polling()
     __canevas.root.destroy()
     __canevas = None
+    # les images appartiennent à la fenêtre détruite
+    __img.clear()
+    __images.clear()
 
 
 def mise_a_jour():
@@ -390,28 +1247,138 @@ def point(x, y, couleur="black", epaisseur=1, tag=""):
 # Image
 
 
-def image(x, y, fichier, ancrage="center", tag=""):
+def charge_pil():
+    """
+    Charge PIL si elle est installée, lors du premier appel seulement.
+
+    :return: `True` si PIL est disponible, `False` sinon
+    """
+    global PIL_AVAILABLE, Image, ImageTk
+    if PIL_AVAILABLE is None:
+        try:
+            from PIL import Image, ImageTk
+
+            print("Bibliothèque PIL chargée.", file=sys.stderr)
+            PIL_AVAILABLE = True
+        except ImportError:
+            PIL_AVAILABLE = False
+    return PIL_AVAILABLE
+
+
+def charge_image(fichier, largeur=None, hauteur=None):
+    if __canevas.backend == "nul":
+        # le moteur sans affichage ne décode pas les images
+        return NullPhoto(largeur or 0, hauteur or 0)
+    if charge_pil():
+        img = Image.open(fichier)
+        if largeur is not None or hauteur is not None:
+            img = img.resize((largeur or img.width, hauteur or img.height))
+        return ImageTk.PhotoImage(img)
+    tkimage = tk.PhotoImage(file=fichier)
+    if largeur is not None or hauteur is not None:
+        # sans PIL, l'image ne peut être agrandie ou réduite que d'un
+        # facteur entier
+        x = (largeur or tkimage.width()) / tkimage.width()
+        y = (hauteur or tkimage.height()) / tkimage.height()
+        if x >= 1 and y >= 1:
+            tkimage = tkimage.zoom(round(x), round(y))
+        else:
+            tkimage = tkimage.subsample(max(1, round(1 / x)), max(1, round(1 / y)))
+    return tkimage
+
+
+def affiche_image(x, y, cle, charge, ancrage, tag):
+    tkimage = __images.acquire(cle, charge)
+    img_object = __canevas.canvas.create_image(
+        x, y, anchor=ancrage, image=tkimage, tag=tag
+    )
+    __img[img_object] = (cle, tkimage)
+    return img_object
+
+
+def image(x, y, fichier, ancrage="center", tag="", largeur=None, hauteur=None):
     """
     Affiche l'image contenue dans ``fichier`` avec ``(x, y)`` comme centre. Les
     valeurs possibles du point d'ancrage sont ``'center'``, ``'nw'``, etc.
 
+    Le fichier n'est décodé qu'une fois : l'image est ensuite gardée en
+    mémoire, voir ``cache_images``.
+
     :param float x: abscisse du point d'ancrage
     :param float y: ordonnée du point d'ancrage
     :param str fichier: nom du fichier contenant l'image
     :param ancrage: position du point d'ancrage par rapport à l'image
     :param str tag: étiquette d'objet (défaut : pas d'étiquette)
+    :param int largeur: largeur de l'image affichée (défaut : celle du
+        fichier)
+    :param int hauteur: hauteur de l'image affichée (défaut : celle du
+        fichier)
     :return: identificateur d'objet
     """
-    if PIL_AVAILABLE:
-        img = Image.open(fichier)
-        tkimage = ImageTk.PhotoImage(img)
-    else:
-        tkimage = tk.PhotoImage(file=fichier)
-    img_object = __canevas.canvas.create_image(
-        x, y, anchor=ancrage, image=tkimage, tag=tag
+    return affiche_image(
+        x,
+        y,
+        ("fichier", fichier, largeur, hauteur),
+        lambda: charge_image(fichier, largeur, hauteur),
+        ancrage,
+        tag,
+    )
+
+
+def dessine_disque(r, couleur, remplissage, epaisseur):
+    taille = 2 * r
+    if __canevas.backend == "nul":
+        return NullPhoto(taille, taille)
+    tkimage = tk.PhotoImage(width=taille, height=taille)
+    interieur = r - epaisseur
+    # chaque ligne du disque est tracée en une fois : le bord à gauche et à
+    # droite, et le fond entre les deux
+    for ligne in range(taille):
+        dy = ligne + 0.5 - r
+        if abs(dy) >= r:
+            continue
+        dx = int((r * r - dy * dy) ** 0.5 + 0.5)
+        if abs(dy) < interieur:
+            di = int((interieur * interieur - dy * dy) ** 0.5 + 0.5)
+        else:
+            di = 0
+        if di == 0:
+            if couleur:
+                tkimage.put(couleur, to=(r - dx, ligne, r + dx, ligne + 1))
+            continue
+        if couleur and epaisseur > 0:
+            tkimage.put(couleur, to=(r - dx, ligne, r - di, ligne + 1))
+            tkimage.put(couleur, to=(r + di, ligne, r + dx, ligne + 1))
+        if remplissage:
+            tkimage.put(remplissage, to=(r - di, ligne, r + di, ligne + 1))
+    return tkimage
+
+
+def cercle_sprite(x, y, r, couleur="black", remplissage="", epaisseur=1, tag=""):
+    """
+    Affiche un cercle de centre ``(x, y)`` et de rayon ``r`` comme
+    ``cercle``, à partir d'une image dessinée une seule fois pour chaque
+    rayon et chaque couleur. Afficher beaucoup de cercles identiques est
+    ainsi plus rapide. ``modifie`` peut en changer les couleurs.
+
+    :param float x: abscisse du centre
+    :param float y: ordonnée du centre
+    :param int r: rayon
+    :param str couleur: couleur de trait (défaut 'black')
+    :param str remplissage: couleur de fond (défaut transparent)
+    :param int epaisseur: épaisseur de trait en pixels (défaut 1)
+    :param str tag: étiquette d'objet (défaut : pas d'étiquette)
+    :return: identificateur d'objet
+    """
+    r = int(r)
+    return affiche_image(
+        x,
+        y,
+        ("cercle", r, couleur, remplissage, epaisseur),
+        lambda: dessine_disque(r, couleur, remplissage, epaisseur),
+        "center",
+        tag,
     )
-    __img[img_object] = tkimage
-    return img_object
 
 
 def draw_custom_image(x, y, width, height, img, ancrage="center", tag=""):
@@ -431,7 +1398,7 @@ def draw_custom_image(x, y, width, height, img, ancrage="center", tag=""):
         (x, y), anchor=ancrage, image=tkimage, state="normal", tag=tag
     )
     tkimage.put(img)
-    __img[img_object] = tkimage
+    __img[img_object] = (None, tkimage)
     return img_object
 
 
@@ -485,6 +1452,10 @@ def taille_texte(chaine, police="Helvetica", taille="24"):
     :return: couple (w, h) constitué de la largeur et la hauteur de la chaîne
         en pixels (int), dans la police et la taille données.
     """
+    if __canevas is not None and __canevas.backend == "nul":
+        # sans fenêtre, la taille est estimée à partir de celle de la police
+        taille = int(taille)
+        return len(chaine) * taille * 3 // 5, taille * 4 // 3
     font = Font(family=police, size=taille)
     return font.measure(chaine), font.metrics("linespace")
 
@@ -499,6 +1470,7 @@ def efface_tout():
     Efface la fenêtre.
     """
     __img.clear()
+    __images.release_all()
     __canevas.canvas.delete("all")
 
 
@@ -509,11 +1481,89 @@ def efface(objet):
     :param: objet ou étiquette d'objet à supprimer
     :type: ``int`` ou ``str``
     """
-    if objet in __img:
-        del __img[objet]
+    if __img:
+        # les images des objets effacés peuvent être retirées de la mémoire
+        for identifiant in __canevas.canvas.find_withtag(objet):
+            if identifiant in __img:
+                cle, _ = __img.pop(identifiant)
+                if cle is not None:
+                    __images.release(cle)
     __canevas.canvas.delete(objet)
 
 
+#############################################################################
+# Modifier
+#############################################################################
+
+
+def deplace(objet, dx, dy):
+    """
+    Déplace ``objet`` de ``dx`` pixels horizontalement et ``dy`` pixels
+    verticalement, sans le redessiner.
+
+    :param objet: objet ou étiquette d'objet à déplacer
+    :param float dx: déplacement horizontal
+    :param float dy: déplacement vertical
+    """
+    __canevas.canvas.move(objet, dx, dy)
+
+
+def coordonnees(objet, *points):
+    """
+    Renvoie les coordonnées de ``objet``, ou les remplace par ``points`` si
+    ils sont donnés.
+
+    :param objet: objet ou étiquette d'objet
+    :param float points: nouvelles coordonnées (optionnel)
+    :return: liste des coordonnées
+    """
+    return __canevas.canvas.coords(objet, *points)
+
+
+def modifie(objet, couleur=None, remplissage=None, epaisseur=None, chaine=None):
+    """
+    Change les couleurs, l'épaisseur ou le texte de ``objet`` sans le
+    recréer. Les paramètres valant ``None`` ne sont pas modifiés.
+
+    :param objet: objet ou étiquette d'objet à modifier
+    :param str couleur: couleur de trait
+    :param str remplissage: couleur de fond (couleur d'un texte)
+    :param float epaisseur: épaisseur de trait en pixels
+    :param str chaine: texte affiché, pour un objet créé par ``texte``
+    """
+    cle = __img[objet][0] if objet in __img else None
+    if cle is not None and cle[0] == "cercle":
+        modifie_sprite(objet, couleur, remplissage, epaisseur)
+        return
+    options = dict()
+    if chaine is not None:
+        options["text"] = chaine
+    if couleur is not None:
+        options["outline"] = couleur
+    if remplissage is not None:
+        options["fill"] = remplissage
+    if epaisseur is not None:
+        options["width"] = epaisseur
+    __canevas.canvas.itemconfigure(objet, **options)
+
+
+def modifie_sprite(objet, couleur, remplissage, epaisseur):
+    cle, _ = __img[objet]
+    _, r, ancienne_couleur, ancien_remplissage, ancienne_epaisseur = cle
+    couleur = ancienne_couleur if couleur is None else couleur
+    remplissage = ancien_remplissage if remplissage is None else remplissage
+    epaisseur = ancienne_epaisseur if epaisseur is None else epaisseur
+    nouvelle_cle = ("cercle", r, couleur, remplissage, epaisseur)
+    if nouvelle_cle == cle:
+        return
+    tkimage = __images.acquire(
+        nouvelle_cle, lambda: dessine_disque(r, couleur, remplissage, epaisseur)
+    )
+    __img[objet] = (nouvelle_cle, tkimage)
+    __images.release(cle)
+    __canevas.canvas.itemconfigure(objet, image=tkimage)
+
+
 #############################################################################
 # Utilitaires
 #############################################################################
@@ -525,23 +1575,191 @@ def attente(temps):
         mise_a_jour()
 
 
+def couleur_rgb(nom):
+    if __canevas.backend == "tk":
+        return tuple(valeur >> 8 for valeur in __canevas.root.winfo_rgb(nom))
+    if nom.startswith("#"):
+        chiffres = (len(nom) - 1) // 3
+        return tuple(
+            int(nom[1 + i * chiffres : 1 + (i + 1) * chiffres], 16)
+            * 255
+            // (16**chiffres - 1)
+            for i in range(3)
+        )
+    return COULEURS[nom]
+
+
+def objets_canevas():
+    # type, coordonnées et options de chaque objet, du plus bas au plus haut
+    canvas = __canevas.canvas
+    if __canevas.backend == "nul":
+        for identifiant, (kind, coords, options, _) in canvas.items.items():
+            yield identifiant, kind, coords, options
+        return
+    for identifiant in canvas.find_all():
+        options = {
+            nom: valeurs[-1]
+            for nom, valeurs in canvas.itemconfigure(identifiant).items()
+        }
+        yield identifiant, canvas.type(identifiant), canvas.coords(identifiant), options
+
+
+def dessine_canevas(raster):
+    raster.clear()
+    for identifiant, kind, coords, options in objets_canevas():
+        if options.get("state") == "hidden":
+            continue
+        points = [
+            (float(coords[i]), float(coords[i + 1]))
+            for i in range(0, len(coords) - 1, 2)
+        ]
+        if kind == "image" and identifiant in __img and points:
+            # seuls les cercles de cercle_sprite sont dessinés
+            cle = __img[identifiant][0]
+            if cle is None or cle[0] != "cercle":
+                continue
+            _, r, couleur, remplissage, epaisseur = cle
+            ((x, y),) = points
+            points = [(x - r, y - r), (x + r, y + r)]
+            options = {"outline": couleur, "fill": remplissage, "width": epaisseur}
+            kind = "oval"
+        couleur = options.get("outline", "black")
+        remplissage = options.get("fill", "")
+        epaisseur = float(options.get("width", 1))
+        contour = raster.index(couleur) if couleur and epaisseur > 0 else None
+        fond = raster.index(remplissage) if remplissage else None
+        if kind in ("rectangle", "oval"):
+            (x1, y1), (x2, y2) = points
+            if kind == "rectangle":
+                raster.rectangle(x1, y1, x2, y2, contour, fond, epaisseur)
+            else:
+                raster.oval(x1, y1, x2, y2, contour, fond, epaisseur)
+        elif kind == "polygon":
+            if fond is not None:
+                raster.polygon(points, fond)
+            if contour is not None:
+                raster.line(points + points[:1], contour, epaisseur)
+        elif kind == "line" and fond is not None:
+            raster.line(points, fond, epaisseur)
+
+
 def capture_ecran(file):
     """
-    Fait une capture d'écran sauvegardée dans ``file.png``.
+    Fait une capture d'écran sauvegardée dans ``file.png``. L'image est
+    dessinée à partir des objets du canevas, sans programme externe : les
+    lignes, polygones, rectangles, cercles et cercles de ``cercle_sprite``
+    sont dessinés, mais pas les textes, les arcs et les images de fichiers.
     """
-    __canevas.canvas.postscript(
-        file=file + ".ps",
-        height=__canevas.height,
-        width=__canevas.width,
-        colormode="color",
-    )
+    raster = Raster(__canevas.width, __canevas.height, couleur_rgb)
+    dessine_canevas(raster)
+    with open(file + ".png", "wb") as fichier:
+        fichier.write(png(raster))
 
-    subprocess.call(
-        "convert -density 150 -geometry 100% -background white -flatten"
-        " " + file + ".ps " + file + ".png",
-        shell=True,
-    )
-    subprocess.call("rm " + file + ".ps", shell=True)
+
+def demarre_film(fichier, images_par_seconde=25):
+    """
+    Enregistre le contenu de la fenêtre ``images_par_seconde`` fois par
+    seconde, pendant la boucle d'événements, jusqu'à l'appel de
+    ``arrete_film``. Si ``fichier`` se termine par '.gif', les images
+    forment un GIF animé, sinon elles sont écrites dans les fichiers
+    ``fichier00000.png``, ``fichier00001.png``, etc. Les images sont écrites
+    au fur et à mesure et ne sont pas gardées en mémoire. Les images sont
+    dessinées comme par ``capture_ecran``.
+
+    :param str fichier: nom du GIF ou début du nom des images PNG
+    :param int images_par_seconde: nombre d'images par seconde (défaut 25)
+    """
+    global __film
+    if __film is not None:
+        arrete_film()
+    raster = Raster(__canevas.width, __canevas.height, couleur_rgb)
+    gif = None
+    if fichier.endswith(".gif"):
+        gif = GifWriter(
+            fichier, __canevas.width, __canevas.height, round(100 / images_par_seconde)
+        )
+    __film = {
+        "raster": raster,
+        "gif": gif,
+        "nom": fichier,
+        "images": 0,
+        "intervalle": 1 / images_par_seconde,
+        "minuteur": None,
+        "derniere": perf_counter(),
+    }
+    image_film()
+
+
+def image_film():
+    """
+    Ajoute une image au film commencé par ``demarre_film``. Elle est appelée
+    par un minuteur pendant la boucle d'événements, mais peut aussi l'être
+    directement par un programme qui dessine sans boucle d'événements.
+    """
+    if __film is None:
+        return
+    debut = perf_counter()
+    raster = __film["raster"]
+    dessine_canevas(raster)
+    if __film["gif"] is not None:
+        __film["gif"].add(raster, debut - __film["derniere"])
+    else:
+        with open(f"{__film['nom']}{__film['images']:05d}.png", "wb") as fichier:
+            fichier.write(png(raster))
+    __film["images"] += 1
+    __film["derniere"] = debut
+    if __film["minuteur"] is not None:
+        __canevas.root.after_cancel(__film["minuteur"])
+    # l'image suivante est prévue en tenant compte du temps de celle-ci
+    delai = max(0.0, __film["intervalle"] - (perf_counter() - debut))
+    __film["minuteur"] = __canevas.root.after(int(delai * 1000), image_film)
+
+
+def arrete_film():
+    """
+    Arrête le film commencé par ``demarre_film`` et renvoie son nombre
+    d'images.
+
+    :return: nombre d'images enregistrées
+    """
+    global __film
+    if __film is None:
+        return 0
+    film, __film = __film, None
+    if film["minuteur"] is not None:
+        __canevas.root.after_cancel(film["minuteur"])
+    if film["gif"] is not None:
+        film["gif"].close()
+    return film["images"]
+
+
+def cache_images(taille_max):
+    """
+    Change le nombre d'octets des images gardées en mémoire par ``image`` et
+    ``cercle_sprite``. Les images affichées sont toujours gardées, les
+    autres sont retirées de la moins récemment utilisée à la plus récente
+    quand la limite est dépassée.
+
+    :param int taille_max: nombre maximal d'octets, 4 par pixel
+    """
+    __images.max_bytes = taille_max
+    __images.evict()
+
+
+def statistiques_images():
+    """
+    Renvoie un dictionnaire donnant le nombre d'images gardées en mémoire
+    ('images'), leur taille en octets ('octets'), le nombre d'images trouvées
+    en mémoire ('succes') ou décodées ('echecs'), et le nombre d'images
+    retirées pour respecter la limite ('retirees').
+    """
+    return {
+        "images": len(__images.entries),
+        "octets": __images.size,
+        "succes": __images.hits,
+        "echecs": __images.misses,
+        "retirees": __images.evictions,
+    }
 
 
 def touche_pressee(keysym):
@@ -553,11 +1771,43 @@ def touche_pressee(keysym):
     return keysym in __canevas.pressed_keys
 
 
+def charge_son(fichier, nom=None):
+    """
+    Charge et décode un son pour que ``joue_son`` puisse le jouer sans
+    attendre. Le son est gardé en mémoire sous le nom ``nom``, ou sous le
+    nom du fichier.
+
+    :param fichier: nom du fichier, ou fichier ouvert en binaire
+    :param str nom: nom du son (défaut : le nom du fichier)
+    :return: `True` si le son est chargé, `False` s'il n'y a pas de sortie
+        audio
+    """
+    return __sons.load(fichier if nom is None else nom, fichier) is not None
+
+
+def joue_son(nom, volume=1.0):
+    """
+    Joue un son sans attendre sa fin, sur une des voies libres (la plus
+    ancienne est interrompue si toutes sont occupées). Le son est chargé
+    s'il ne l'a pas été par ``charge_son``. Ne fait rien s'il n'y a pas de
+    sortie audio.
+
+    :param nom: nom donné à ``charge_son``, ou nom du fichier
+    :param float volume: volume entre 0 et 1 (défaut 1)
+    """
+    __sons.play(nom, volume)
+
+
+def son_disponible():
+    """
+    Renvoie `True` si les sons peuvent être joués, `False` si pygame ou une
+    sortie audio manque.
+    """
+    return __sons.start()
+
+
 def jouer_music(file, volume=0.5):
-    pygame.mixer.init()
-    sound = pygame.mixer.Sound(file)
-    sound.set_volume(volume)
-    sound.play()
+    joue_son(file, volume)
 
 
 #############################################################################
@@ -580,6 +1830,92 @@ def donne_ev():
         return __canevas.ev_queue.popleft()
 
 
+def statistiques_ev():
+    """
+    Renvoie un dictionnaire donnant le nombre d'événements perdus car la file
+    d'attente était pleine ('perdus'), fusionnés avec l'événement suivant
+    ('fusionnes') et en attente ('en_attente').
+    """
+    if __canevas is None:
+        raise FenetreNonCree(
+            'La fenêtre n\'a pas été créée avec la fonction "cree_fenetre".'
+        )
+    return {
+        "perdus": __canevas.dropped,
+        "fusionnes": __canevas.coalesced,
+        "en_attente": len(__canevas.ev_queue),
+    }
+
+
+def statistiques_dessin():
+    """
+    Renvoie un dictionnaire donnant, pour le moteur 'nul', le nombre d'objets
+    présents dans la fenêtre ('objets'), créés ('crees') et effacés
+    ('effaces') depuis sa création, et le nombre d'appels de chaque fonction
+    de dessin de tkinter ('appels').
+    """
+    if __canevas is None:
+        raise FenetreNonCree(
+            'La fenêtre n\'a pas été créée avec la fonction "cree_fenetre".'
+        )
+    if __canevas.backend != "nul":
+        raise ValueError("les dessins ne sont comptés qu'avec le moteur 'nul'")
+    canvas = __canevas.canvas
+    return {
+        "objets": len(canvas.items),
+        "crees": canvas.created,
+        "effaces": canvas.deleted,
+        "appels": dict(canvas.calls),
+    }
+
+
+def rejoue_ev(script):
+    """
+    Rejoue une liste d'événements, enregistrée par ``arrete_enregistrement``
+    ou écrite à la main. Chaque événement est un triplet ``(delai, type,
+    donnees)`` : il est donné ``delai`` secondes après le précédent, comme
+    s'il venait de l'utilisateur. Les données sont les coordonnées ``(x,
+    y)`` pour les clics et les déplacements, le nom de la touche pour
+    'Touche' et ``None`` pour 'Quitte'.
+
+    :param list script: événements à rejouer
+    """
+    if __canevas is None:
+        raise FenetreNonCree(
+            'La fenêtre n\'a pas été créée avec la fonction "cree_fenetre".'
+        )
+    if __canevas.script_timer is not None:
+        __canevas.root.after_cancel(__canevas.script_timer)
+        __canevas.script_timer = None
+    if script:
+        __canevas.script_timer = __canevas.root.after(
+            int(script[0][0] * 1000), __canevas.replay, list(script)
+        )
+
+
+def demarre_enregistrement():
+    """
+    Commence à enregistrer les événements de l'utilisateur, pour les
+    rejouer avec ``rejoue_ev``.
+    """
+    if __canevas is None:
+        raise FenetreNonCree(
+            'La fenêtre n\'a pas été créée avec la fonction "cree_fenetre".'
+        )
+    __canevas.recording = []
+    __canevas.last_record = perf_counter()
+
+
+def arrete_enregistrement():
+    """
+    Arrête l'enregistrement commencé par ``demarre_enregistrement`` et
+    renvoie la liste des événements enregistrés.
+    """
+    script = __canevas.recording or []
+    __canevas.recording = None
+    return script
+
+
 def attend_ev():
     """mongolise en attendant qu'un événement ait lieu et renvoie le premier événement qui
     se produit."""
@@ -666,3 +2002,109 @@ def abscisse_souris():
 
 def ordonnee_souris():
     return __canevas.canvas.winfo_pointery() - __canevas.canvas.winfo_rooty()
+
+
+#############################################################################
+# Boucle d'événements
+#############################################################################
+
+
+def lie_ev(nom, fonction):
+    """
+    Appelle ``fonction(ev)`` à chaque événement de type ``nom`` au lieu de
+    l'ajouter à la file d'attente de ``donne_ev``. Les événements ne sont
+    traités que pendant ``boucle_principale`` ou ``mise_a_jour``.
+
+    :param str nom: type d'événement ('ClicGauche', 'Touche', 'Quitte', etc.)
+    :param fonction: fonction prenant l'événement en paramètre
+    """
+    if __canevas is None:
+        raise FenetreNonCree(
+            'La fenêtre n\'a pas été créée avec la fonction "cree_fenetre".'
+        )
+    if nom not in CustomCanvas._ev_mapping and not nom.startswith("<"):
+        # événement posté par poste_ev
+        if nom != "Quitte":
+            __canevas.posted_names.add(nom)
+            __canevas.start_polling()
+    elif nom not in __canevas.events:
+        __canevas.events = list(__canevas.events) + [nom]
+        __canevas.bind_event(nom)
+    __canevas.handlers[nom] = fonction
+
+
+def delie_ev(nom):
+    """
+    Les événements de type ``nom`` sont de nouveau ajoutés à la file
+    d'attente de ``donne_ev``.
+
+    :param str nom: type d'événement
+    """
+    __canevas.handlers.pop(nom, None)
+    __canevas.posted_names.discard(nom)
+    if not __canevas.posted_names:
+        __canevas.stop_polling()
+    __canevas.dispatch_pending(nom)
+
+
+def poste_ev(nom, donnees=None):
+    """
+    Ajoute un événement de type ``nom`` portant ``donnees``. Cette fonction
+    peut être appelée depuis un autre thread : l'événement est ensuite donné
+    par ``donne_ev`` ou à la fonction liée avec ``lie_ev``, dans le thread
+    de la fenêtre.
+
+    :param str nom: type d'événement, différent des types de tkinter
+    :param donnees: données de l'événement, voir ``donnee``
+    """
+    __canevas.post((nom, donnees))
+
+
+def donnee(ev):
+    """
+    Renvoie les données d'un événement ajouté par ``poste_ev``.
+    """
+    return ev[1]
+
+
+def planifie(delai, fonction, *args):
+    """
+    Appelle ``fonction(*args)`` dans ``delai`` secondes, pendant
+    ``boucle_principale``.
+
+    :param float delai: délai en secondes
+    :param fonction: fonction à appeler
+    :return: identificateur à donner à ``annule``
+    """
+    return __canevas.root.after(int(delai * 1000), fonction, *args)
+
+
+def annule(identifiant):
+    """
+    Annule un appel planifié avec ``planifie``.
+
+    :param identifiant: identificateur renvoyé par ``planifie``
+    """
+    __canevas.root.after_cancel(identifiant)
+
+
+def boucle_principale():
+    """
+    Donne la main à tkinter, qui appelle les fonctions liées aux événements
+    et les fonctions planifiées, jusqu'à l'appel de ``quitte_boucle``. Rien
+    n'est exécuté tant qu'aucun événement n'a lieu.
+    """
+    if __canevas is None:
+        raise FenetreNonCree(
+            'La fenêtre n\'a pas été créée avec la fonction "cree_fenetre".'
+        )
+    __canevas.start_polling()
+    __canevas.root.mainloop()
+
+
+def quitte_boucle():
+    """
+    Termine ``boucle_principale``.
+    """
+    __canevas.stop_polling()
+    __canevas.root.quit()
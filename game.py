@@ -1,4 +1,209 @@
 from typing import Union
+from bitboard import canonical_key
+
+# Size of the standard grid, and number of aligned tokens needed to win
+WIDTH = 7
+HEIGHT = 6
+CONNECT = 4
+
+
+def get_stride(width: int):
+    """Get the difference between the positions of two cells one above the
+    other. Positions are stride * y + column, the stride is at least 10 so
+    that the standard grid keeps the positions 10 * y + column, and greater
+    than the width so that a line never goes on with the next row.
+
+    :param width: the number of columns
+    :type width: int
+    :return: the stride
+    :rtype: int
+    """
+    return max(10, width + 1)
+
+
+def get_windows(width: int = WIDTH, height: int = HEIGHT, connect: int = CONNECT):
+    """Get every set of ``connect`` aligned positions of the grid
+
+    :param width: the number of columns
+    :type width: int
+    :param height: the number of rows
+    :type height: int
+    :param connect: the number of aligned tokens needed to win
+    :type connect: int
+    :return: the positions of each alignment
+    :rtype: list[tuple[int, ...]]
+    """
+    stride = get_stride(width)
+    last = connect - 1
+    windows = []
+    for y in range(height):
+        for column in range(width):
+            for dy, dx in ((0, 1), (1, 0), (1, 1), (1, -1)):
+                if 0 <= y + last * dy < height and 0 <= column + last * dx < width:
+                    windows.append(
+                        tuple(
+                            stride * (y + i * dy) + column + i * dx
+                            for i in range(connect)
+                        )
+                    )
+    return windows
+
+
+class Geometry:
+    """Size of a grid and its precomputed tables, shared by all the games
+    played on grids of this size"""
+
+    __slots__ = (
+        "width",
+        "height",
+        "connect",
+        "stride",
+        "windows",
+        "cell_windows",
+        "cell_bits",
+        "size",
+        "column_bits",
+        "bottom",
+        "top",
+        "column_mask",
+        "move_order",
+        "alignment_shifts",
+        "bottom_row",
+        "board_mask",
+        "line_shifts",
+    )
+
+    def __init__(self, width: int, height: int, connect: int):
+        """Initialisation
+
+        :param width: the number of columns
+        :type width: int
+        :param height: the number of rows
+        :type height: int
+        :param connect: the number of aligned tokens needed to win
+        :type connect: int
+        """
+        self.width = width
+        self.height = height
+        self.connect = connect
+        self.stride = get_stride(width)
+        # the alignments of the grid, and for each position the indexes of
+        # the alignments it belongs to
+        self.windows = get_windows(width, height, connect)
+        self.cell_windows = {
+            self.stride * y + column: ()
+            for y in range(height)
+            for column in range(width)
+        }
+        for index, window in enumerate(self.windows):
+            for pos in window:
+                self.cell_windows[pos] += (index,)
+        # for each position, its bit in a bitboard of height + 1 bits per
+        # column, and the bit of its mirror image
+        self.cell_bits = {}
+        for pos in self.cell_windows:
+            y, column = divmod(pos, self.stride)
+            row = height - 1 - y
+            self.cell_bits[pos] = (
+                1 << (column * (height + 1) + row),
+                1 << ((width - 1 - column) * (height + 1) + row),
+            )
+        # the tables of the bitboard engines, by column: the bottom cell, the
+        # top cell and every cell of the column
+        self.size = width * height
+        self.column_bits = height + 1
+        self.bottom = [1 << (column * self.column_bits) for column in range(width)]
+        self.top = [bottom << (height - 1) for bottom in self.bottom]
+        self.column_mask = [((1 << height) - 1) * bottom for bottom in self.bottom]
+        # the bottom cells and every cell of the grid
+        self.bottom_row = sum(self.bottom)
+        self.board_mask = sum(self.column_mask)
+        # columns sorted from the center to the edges, central tokens belong
+        # to more alignments so they are more likely to produce cutoffs
+        self.move_order = sorted(
+            range(width), key=lambda column: abs(width // 2 - column)
+        )
+        # the shift of a bitboard by one cell in each direction: vertical,
+        # horizontal and both diagonals
+        directions = (
+            1,
+            self.column_bits,
+            self.column_bits - 1,
+            self.column_bits + 1,
+        )
+        # for each direction, the shifts that reduce a bitboard to the first
+        # cells of its alignments: each shift doubles the length of the
+        # aligned runs, the last one completes them to connect
+        self.alignment_shifts = []
+        for direction in directions:
+            shifts = []
+            length = 1
+            while length < connect:
+                step = min(length, connect - length)
+                shifts.append(step * direction)
+                length += step
+            self.alignment_shifts.append(tuple(shifts))
+        # for each direction, the shifts from a cell to the next connect - 1
+        # cells of a line
+        self.line_shifts = [
+            tuple(direction * step for step in range(1, connect))
+            for direction in directions
+        ]
+
+    def mirror_bits(self, bits: int):
+        """Get the left-right mirror image of a bitboard of the grid
+
+        :param bits: the bitboard
+        :type bits: int
+        :return: the mirrored bitboard
+        :rtype: int
+        """
+        column_mask = (1 << self.column_bits) - 1
+        mirrored = 0
+        for column in range(self.width):
+            cells = (bits >> (column * self.column_bits)) & column_mask
+            mirrored |= cells << ((self.width - 1 - column) * self.column_bits)
+        return mirrored
+
+    def is_standard(self):
+        """Tells if the grid is the standard one, the only one known by the
+        opening book and the compact boards
+
+        :return: True if the grid has 7 columns, 6 rows and 4 tokens to align
+        :rtype: bool
+        """
+        return (self.width, self.height, self.connect) == (WIDTH, HEIGHT, CONNECT)
+
+
+GEOMETRIES = {}
+
+
+def get_geometry(width: int = WIDTH, height: int = HEIGHT, connect: int = CONNECT):
+    """Get the geometry of a grid, its tables are only computed once
+
+    :param width: the number of columns
+    :type width: int
+    :param height: the number of rows
+    :type height: int
+    :param connect: the number of aligned tokens needed to win
+    :type connect: int
+    :raises ValueError: if no alignment fits in the grid
+    :return: the geometry
+    :rtype: Geometry
+    """
+    key = width, height, connect
+    geometry = GEOMETRIES.get(key)
+    if geometry is None:
+        if min(width, height) < 1 or not 2 <= connect <= max(width, height):
+            raise ValueError(f"no alignment of {connect} in a {width}x{height} grid")
+        geometry = GEOMETRIES[key] = Geometry(width, height, connect)
+    return geometry
+
+
+# The 69 alignments of the standard grid, and for each position the indexes
+# of the alignments it belongs to
+WINDOWS = get_geometry().windows
+CELL_WINDOWS = get_geometry().cell_windows
 
 
 class Connect4:
@@ -9,6 +214,9 @@ class Connect4:
         player1: Union[None, set] = None,
         player2: Union[None, set] = None,
         turn: int = 0,
+        width: int = WIDTH,
+        height: int = HEIGHT,
+        connect: int = CONNECT,
     ):
         """Initialisation
 
@@ -20,7 +228,20 @@ class Connect4:
         :type player2: Union[None, set], optional
         :param turn: the number of turns
         :type turn: int
+        :param width: the number of columns
+        :type width: int
+        :param height: the number of rows
+        :type height: int
+        :param connect: the number of aligned tokens needed to win
+        :type connect: int
         """
+        self.geometry = geometry = get_geometry(width, height, connect)
+        self.width = width
+        self.height = height
+        self.connect = connect
+        self.stride = geometry.stride
+        self.cell_windows = geometry.cell_windows
+        self.cell_bits = geometry.cell_bits
         if player1 is None:
             player1 = set()
         self.player1 = player1
@@ -28,6 +249,27 @@ class Connect4:
             player2 = set()
         self.player2 = player2
         self.count_turn = turn
+        # number of tokens of each player in each alignment, number of
+        # alignments completed by each player, and number of alignments with
+        # all but one tokens of a player and none of his opponent
+        windows = len(geometry.windows)
+        self.window_counts = {1: [0] * windows, 2: [0] * windows}
+        self.nb_wins = {1: 0, 2: 0}
+        self.nb_threats = {1: 0, 2: 0}
+        # bitboards of each player and of their mirror image, for
+        # canonical_key
+        self.bits = {1: 0, 2: 0}
+        self.mirror_bits = {1: 0, 2: 0}
+        # number of tokens in each column, and positions of the tokens added
+        # by play, for undo
+        self.heights = [0] * width
+        self.moves = []
+        if player1 or player2:
+            for player in (1, 2):
+                for pos in self.get_player_tokens(player):
+                    self.update_windows(pos, player)
+                    self.update_bits(pos, player)
+                    self.heights[pos % self.stride] += 1
 
     def get_player(self):
         """Get players turn
@@ -62,13 +304,123 @@ class Connect4:
                  remaining in the column
         :rtype: Union[int, None]
         """
-        for y in range(6 - 1, -1, -1):
-            pos = (10 * y) + column
-            if self.is_pos_empty(pos):
-                tokens = self.get_player_tokens(player)
-                tokens.add(pos)
-                return pos
-        return None
+        pos = self.get_free_pos(column)
+        if pos is None:
+            return None
+        tokens = self.get_player_tokens(player)
+        tokens.add(pos)
+        self.heights[column] += 1
+        self.update_windows(pos, player)
+        self.update_bits(pos, player)
+        return pos
+
+    def play(self, column: int):
+        """Add a token of the player who has to play and pass the turn
+
+        :param column: the column where the player inserted the token
+        :type column: int
+        :return: the position of the token, None if there is no place
+                 remaining in the column
+        :rtype: Union[int, None]
+        """
+        pos = self.add_token(column, self.get_player())
+        if pos is not None:
+            self.moves.append(pos)
+            self.add_turn()
+        return pos
+
+    def undo(self):
+        """Cancel the last move made with play
+
+        :return: the position of the removed token
+        :rtype: int
+        """
+        pos = self.moves.pop()
+        self.count_turn -= 1
+        self.remove_token(pos, self.get_player())
+        return pos
+
+    def legal_moves(self):
+        """Iterate over the columns that are not full
+
+        :return: the columns
+        :rtype: Iterator[int]
+        """
+        for column in range(self.width):
+            if self.heights[column] < self.height:
+                yield column
+
+    def remove_token(self, pos: int, player: int):
+        """Remove a token of a player, undoing add_token
+
+        :param pos: the position of the token
+        :type pos: int
+        :param player: the player who owns the token
+        :type player: int
+        """
+        self.get_player_tokens(player).remove(pos)
+        self.heights[pos % self.stride] -= 1
+        self.update_windows(pos, player, -1)
+        self.update_bits(pos, player)
+
+    def update_bits(self, pos: int, player: int):
+        """Add or remove a token in the bitboards of a player
+
+        :param pos: the position of the token
+        :type pos: int
+        :param player: the player who owns the token
+        :type player: int
+        """
+        bit, mirror_bit = self.cell_bits[pos]
+        self.bits[player] ^= bit
+        self.mirror_bits[player] ^= mirror_bit
+
+    def canonical_key(self):
+        """Get the key shared by the position and its left-right mirror
+        image, followed as the tokens are added and removed
+
+        :return: the key, and True if it is the key of the mirror image
+        :rtype: tuple[int, bool]
+        """
+        player = self.get_player()
+        return canonical_key(
+            self.bits[player],
+            self.bits[1] | self.bits[2],
+            self.mirror_bits[player],
+            self.mirror_bits[1] | self.mirror_bits[2],
+        )
+
+    def update_windows(self, pos: int, player: int, delta: int = 1):
+        """Update the alignments counters after a token was added or removed
+
+        :param pos: the position of the token
+        :type pos: int
+        :param player: the player who owns the token
+        :type player: int
+        :param delta: 1 if the token was added, -1 if it was removed
+        :type delta: int
+        """
+        opponent = 3 - player
+        counts = self.window_counts[player]
+        opponent_counts = self.window_counts[opponent]
+        connect = self.connect
+        threat = connect - 1
+        for index in self.cell_windows[pos]:
+            before = counts[index]
+            after = before + delta
+            counts[index] = after
+            if opponent_counts[index] == 0:
+                if before == connect or after == connect:
+                    self.nb_wins[player] += delta
+                if before == threat:
+                    self.nb_threats[player] -= 1
+                if after == threat:
+                    self.nb_threats[player] += 1
+            elif opponent_counts[index] == threat:
+                if before == 0:
+                    self.nb_threats[opponent] -= 1
+                if after == 0:
+                    self.nb_threats[opponent] += 1
 
     def add_turn(self):
         """Add a turn to the turn's counter
@@ -116,11 +468,13 @@ class Connect4:
         :return: the maximum number of "linked" tokens in alls directions
         :rtype: tuple[int, int, int, int]
         """
-        res_line = self.count(player, pos - 3, pos + 4, 1)
-        res_column = self.count(player, pos - 10 * 3, pos + 10 * 4, 10)
-        res_diag_1 = self.count(player, pos - 11 * 3, pos + 11 * 4, 11)
-        res_diag_2 = self.count(player, pos - 9 * 3, pos + 9 * 4, 9)
-        return res_line, res_column, res_diag_1, res_diag_2
+        results = []
+        last = self.connect - 1
+        for step in (1, self.stride, self.stride + 1, self.stride - 1):
+            results.append(
+                self.count(player, pos - step * last, pos + step * (last + 1), step)
+            )
+        return tuple(results)
 
     def is_win(self, pos: Union[int, None]):
         """Tells if a player wins based on his last placed token
@@ -133,14 +487,85 @@ class Connect4:
         """
         player = self.get_player()
         if pos is not None:
-            if max(*self.get_nb_arround(player, pos)) >= 4:
-                return True
-            return False
-        for column in range(7):
-            for pos in {10 * y + column for y in range(6)}:
-                if max(*self.get_nb_arround(player, pos)) >= 4:
+            counts = self.window_counts[player]
+            for index in self.cell_windows[pos]:
+                if counts[index] == self.connect:
                     return True
             return False
+        return self.nb_wins[player] > 0
+
+    def get_winner(self):
+        """Get the player who aligned ``connect`` tokens
+
+        :return: the player, 0 if nobody won
+        :rtype: int
+        """
+        if self.nb_wins[1]:
+            return 1
+        if self.nb_wins[2]:
+            return 2
+        return 0
+
+    def get_threats(self, player: int):
+        """Get the number of alignments where a player has all the tokens but
+        one and his opponent none
+
+        :param player: the player
+        :type player: int
+        :return: the number of threats
+        :rtype: int
+        """
+        return self.nb_threats[player]
+
+    def is_winning_move(self, column: int, player: int):
+        """Tells if a player wins by adding a token in a column
+
+        :param column: the column
+        :type column: int
+        :param player: the player
+        :type player: int
+        :return: True if the move wins, else False
+        :rtype: bool
+        """
+        pos = self.get_free_pos(column)
+        if pos is None:
+            return False
+        counts = self.window_counts[player]
+        opponent_counts = self.window_counts[3 - player]
+        threat = self.connect - 1
+        for index in self.cell_windows[pos]:
+            if counts[index] == threat and opponent_counts[index] == 0:
+                return True
+        return False
+
+    def is_blocking_move(self, column: int, player: int):
+        """Tells if a player prevents his opponent from winning by adding a
+        token in a column
+
+        :param column: the column
+        :type column: int
+        :param player: the player
+        :type player: int
+        :return: True if the move blocks a win, else False
+        :rtype: bool
+        """
+        return self.is_winning_move(column, 3 - player)
+
+    def get_free_pos(self, column: int):
+        """Get the position where a token added in a column would land
+
+        :param column: the column
+        :type column: int
+        :return: the position, None if the column is full or is not a column
+                 of the grid
+        :rtype: Union[int, None]
+        """
+        if not 0 <= column < self.width:
+            return None
+        height = self.heights[column]
+        if height >= self.height:
+            return None
+        return self.stride * (self.height - 1 - height) + column
 
     def copy(self):
         """Copy the actual state of the game
@@ -148,9 +573,27 @@ class Connect4:
         :return: a new Connect4 object
         :rtype: object
         """
-        player_1_copy = self.player1.copy()
-        player_2_copy = self.player2.copy()
-        return Connect4(player_1_copy, player_2_copy, self.count_turn)
+        # the counters are cloned instead of replaying every token
+        game = Connect4.__new__(Connect4)
+        game.geometry = self.geometry
+        game.width = self.width
+        game.height = self.height
+        game.connect = self.connect
+        game.stride = self.stride
+        game.cell_windows = self.cell_windows
+        game.cell_bits = self.cell_bits
+        game.player1 = self.player1.copy()
+        game.player2 = self.player2.copy()
+        game.count_turn = self.count_turn
+        counts = self.window_counts
+        game.window_counts = {1: counts[1].copy(), 2: counts[2].copy()}
+        game.nb_wins = self.nb_wins.copy()
+        game.nb_threats = self.nb_threats.copy()
+        game.bits = self.bits.copy()
+        game.mirror_bits = self.mirror_bits.copy()
+        game.heights = self.heights.copy()
+        game.moves = self.moves.copy()
+        return game
 
     def is_pos_empty(self, pos: int):
         """Tells if a player already placed a token at a specific position
@@ -1,12 +1,46 @@
-from time import sleep
+from time import perf_counter, process_time, time
 import argparse
-from typing import Union
-import fltk
+import sys
+import threading
+from typing import Callable, Union
 from game import Connect4
+from solver import Solver
+from book import OpeningBook
 
 HEIGHT_WINDOW = 800
 WIDTH_WINDOW = 800
 
+# Speed of the dropped tokens, in pixels per second
+DROP_SPEED = 2000
+
+# Time between two checks of the end of the computer search, in seconds
+AI_POLL_INTERVAL = 0.02
+
+# Time allowed to analyse a position in the graphic display, in seconds
+ANALYSIS_TIME = 10.0
+
+# Width of the evaluation bar, in pixels
+EVAL_BAR_WIDTH = 12
+
+# Time allowed to get ready to play, in seconds, reported by --startup-profile
+STARTUP_BUDGET = {"text": 0.1, "graphic": 0.5}
+
+# The graphic library is only imported with the graphic display, see
+# load_fltk, as it loads tkinter
+fltk = None
+
+
+def load_fltk():
+    """Import the graphic library if it is not imported yet
+
+    :return: the fltk module
+    :rtype: module
+    """
+    global fltk
+    if fltk is None:
+        import fltk
+    return fltk
+
 
 class Token:
     """Class representing visual tokens, when the display mode isn't text"""
@@ -18,6 +52,7 @@ class Token:
         radius: int,
         color: str,
         board_id: Union[int, str],
+        sprite: bool = False,
     ):
         """Initialisation
 
@@ -31,12 +66,16 @@ class Token:
         :type color: str
         :param board_id: the token number, position
         :type board_id: Union[int, str]
+        :param sprite: draws the token from a cached image instead of a
+                       circle, defaults to False
+        :type sprite: bool, optional
         """
         self.x = x
         self.y = y
         self.radius = radius
         self.color = color
         self.board_id = board_id
+        self.sprite = sprite
         self.visual_id = None
 
     def get_board_id(self):
@@ -65,9 +104,25 @@ class Token:
         :return: the token tag
         :rtype: int
         """
-        self.visual_id = fltk.cercle(self.x, self.y, 30, remplissage=self.color)
+        if self.sprite:
+            self.visual_id = fltk.cercle_sprite(
+                self.x, self.y, self.radius, remplissage=self.color
+            )
+        else:
+            self.visual_id = fltk.cercle(
+                self.x, self.y, self.radius, remplissage=self.color
+            )
         return self.visual_id
 
+    def recolor(self, color: str):
+        """Change the color of the displayed token without drawing it again
+
+        :param color: the new color
+        :type color: str
+        """
+        self.set_color(color)
+        fltk.modifie(self.visual_id, remplissage=color)
+
     def erase(self):
         """Erase the token"""
         fltk.efface(self.visual_id)
@@ -92,34 +147,191 @@ class Token:
         self.erase()
         self.draw()
 
-    def animate(self):
-        """Move the token"""
-        step = 20
+    def animate(self, animator: object, on_end: Callable = None):
+        """Drop a copy of the token from the top of the board to its place,
+        without blocking
+
+        :param animator: the animator running the move
+        :type animator: Animator
+        :param on_end: the function called once the token is in place,
+                       defaults to None
+        :type on_end: Callable, optional
+        """
         y_init = 50
-        y_final = self.y
-        t = Token(self.x, y_init, 30, self.color, None)
-        t.draw()
-        while y_init < y_final:
-            sleep(0.01)
-            t.set_coords(self.x, y_init)
-            y_init += step
-            t.refresh()
-            fltk.mise_a_jour()
-        t.erase()
+        item = fltk.cercle(self.x, y_init, self.radius, remplissage=self.color)
+
+        def end():
+            fltk.efface(item)
+            if on_end is not None:
+                on_end()
+
+        distance = self.y - y_init
+        animator.move(item, 0, distance, distance / DROP_SPEED, end)
+
+
+class BoardView:
+    """The tokens of the board indexed by position, only the cells whose
+    color changed are updated"""
+
+    def __init__(self, visual_tokens: dict, colors: dict):
+        """Initialisation
+
+        :param visual_tokens: the drawn tokens, by position
+        :type visual_tokens: dict[int, Token]
+        :param colors: the color of the tokens of each player, and of the
+                       empty holes for the player 0
+        :type colors: dict[int, str]
+        """
+        self.tokens = visual_tokens
+        self.colors = colors
+        self.shown = {1: set(), 2: set()}
+
+    def get_token(self, pos: int):
+        """Get the visual token of a position
+
+        :param pos: the position
+        :type pos: int
+        :return: the token
+        :rtype: Token
+        """
+        return self.tokens[pos]
+
+    def show_token(self, pos: int, player: int):
+        """Display the token of a player at a position
+
+        :param pos: the position
+        :type pos: int
+        :param player: the player, 0 to display an empty hole
+        :type player: int
+        """
+        for owner in (1, 2):
+            if owner == player:
+                self.shown[owner].add(pos)
+            else:
+                self.shown[owner].discard(pos)
+        self.tokens[pos].recolor(self.colors[player])
+
+    def apply(self, game: Connect4):
+        """Display the position of a game, whatever happened since the last
+        display (moves, undo, new position)
+
+        :param game: the game
+        :type game: Connect4
+        :return: the positions whose color changed
+        :rtype: set[int]
+        """
+        player1 = game.get_player_tokens(1)
+        player2 = game.get_player_tokens(2)
+        changed = (player1 ^ self.shown[1]) | (player2 ^ self.shown[2])
+        for pos in changed:
+            if pos in player1:
+                self.show_token(pos, 1)
+            elif pos in player2:
+                self.show_token(pos, 2)
+            else:
+                self.show_token(pos, 0)
+        return changed
 
 
 class Game(Connect4):
     """Class allowing the player to play a game, managing all the inputs"""
 
-    def __init__(self, display_type: str):
+    def __init__(
+        self,
+        display_type: str,
+        ai_player: Union[None, int] = None,
+        ai_time: float = 1.0,
+        book_path: Union[None, str] = None,
+        analysis: bool = False,
+        sprites: bool = False,
+        capture_path: Union[None, str] = None,
+        sounds: bool = False,
+        engine: str = "solver",
+        width: int = 7,
+        height: int = 6,
+        connect: int = 4,
+        record_path: Union[None, str] = None,
+    ):
         """Initialisation
 
         :param display_type: the type of display. Must be 'graphic' or 'text'
         :type display_type: str
+        :param ai_player: the player played by the computer, defaults to None
+                          means that both players are humans
+        :type ai_player: Union[None, int], optional
+        :param ai_time: the time the computer can think for each move, in
+                        seconds
+        :type ai_time: float
+        :param book_path: the path of the opening book used by the computer,
+                          defaults to None means no opening book
+        :type book_path: Union[None, str], optional
+        :param analysis: shows the evaluation of the position in the graphic
+                         display, defaults to False
+        :type analysis: bool, optional
+        :param sprites: draws the tokens from cached images, defaults to
+                        False
+        :type sprites: bool, optional
+        :param capture_path: records the graphic game in this file, an
+                             animated GIF if it ends with '.gif', else the
+                             start of the names of PNG images, defaults to
+                             None
+        :type capture_path: Union[None, str], optional
+        :param sounds: plays a sound when a token lands and when a player
+                       wins, defaults to False
+        :type sounds: bool, optional
+        :param engine: the engine of the computer, 'solver' for the exact
+                       search or 'mcts' for the Monte Carlo search, whose
+                       strength grows with ai_time, defaults to 'solver'
+        :type engine: str, optional
+        :param width: the number of columns, defaults to 7
+        :type width: int, optional
+        :param height: the number of rows, defaults to 6
+        :type height: int, optional
+        :param connect: the number of aligned tokens needed to win, defaults
+                        to 4
+        :type connect: int, optional
+        :param record_path: appends the game to this archive when it ends,
+                            see records.py, defaults to None
+        :type record_path: Union[None, str], optional
+        :raises ValueError: if an opening book is given for another grid than
+                            the standard one
         """
-        super().__init__()
+        super().__init__(width=width, height=height, connect=connect)
+        if book_path is not None and not self.geometry.is_standard():
+            raise ValueError("the opening book only knows the 7x6 grid")
         self.display_type = display_type
-        self.radius = 30
+        self.radius = min(
+            30, int(0.3 * min(WIDTH_WINDOW / width, HEIGHT_WINDOW / height))
+        )
+        self.ai_player = ai_player
+        self.visual_board = None
+        self.space = None
+        self.is_fin = False
+        self.animator = None
+        self.view = None
+        self.thinking = False
+        self.ghost = None
+        self.hover_column = None
+        self.analysis = analysis
+        self.sprites = sprites
+        self.capture_path = capture_path
+        self.sounds = sounds
+        self.engine = engine
+        self.record_path = record_path
+        self.analyzer = None
+        self.analysis_id = None
+        self.score_texts = None
+        self.eval_bar = None
+        self.book = None if book_path is None else OpeningBook(book_path)
+        self.solver = None
+        if ai_player is not None and engine == "mcts":
+            from mcts import MCTS
+
+            self.solver = MCTS(max_time=ai_time, geometry=self.geometry)
+        elif ai_player is not None:
+            self.solver = Solver(
+                max_time=ai_time, book=self.book, geometry=self.geometry
+            )
 
     # Regular functions
 
@@ -147,26 +359,45 @@ class Game(Connect4):
             return "X"
         return "O"
 
+    def is_ai_turn(self):
+        """Tells if the computer has to play
+
+        :return: True if the computer has to play, else False
+        :rtype: bool
+        """
+        return self.ai_player == self.get_player()
+
+    def ai_move(self):
+        """Get the column chosen by the computer
+
+        :return: the selected column
+        :rtype: int
+        """
+        _, column = self.solver.solve(self)
+        return column
+
     # With a window
 
     def draw_circles(self):
         """Draw circles representing empty holes on the board and tokens
 
-        :return: a tuple within the first element the set of alls tokens,
-                 and the second element the abscissa coordinates of each
-                 column
-        :rtype: tuple[set[object], tuple[int, int]]
+        :return: a tuple within the first element the tokens indexed by
+                 position, and the second element the abscissa coordinates
+                 of each column
+        :rtype: tuple[dict[int, Token], tuple[int, int]]
         """
+        # the holes go from 50 to the size of the window minus 50
         x = 50
-        dx = WIDTH_WINDOW / 7
-        dy = HEIGHT_WINDOW / 6
-        visual_tokens = set()
-        for i1 in range(7):
+        dx = (WIDTH_WINDOW - 100) / max(1, self.width - 1)
+        dy = (HEIGHT_WINDOW - 100) / max(1, self.height - 1)
+        visual_tokens = dict()
+        for i1 in range(self.width):
             y = 50
-            for i2 in range(6):
-                t = Token(x, y, self.radius, "white", i2 * 10 + i1)
+            for i2 in range(self.height):
+                pos = i2 * self.stride + i1
+                t = Token(x, y, self.radius, "white", pos, self.sprites)
                 t.draw()
-                visual_tokens.add(t)
+                visual_tokens[t.get_board_id()] = t
                 y += dy
             x += dx
         return visual_tokens, dx
@@ -182,30 +413,251 @@ class Game(Connect4):
                  else
         :rtype: Union[bool, int]
         """
-        r = self.radius
-        column = 0
-        left = 50
-        right = 50 + space
-        for _ in range(7):
-            if (left - r) <= x <= (right - r * 3):
+        for column in range(self.width):
+            if abs(x - (50 + column * space)) <= self.radius:
                 return column
-            left, right = right, right + space
-            column += 1
         return False
 
-    def find_visual_token(self, pos: int, visual_tokens: set):
+    def find_visual_token(self, pos: int, visual_tokens: dict):
         """Find the visual token according to a position
 
         :param pos: the position the token represent
         :type pos: int
-        :param visual_tokens: the set of alls tokens
-        :type visual_tokens: set
+        :param visual_tokens: the tokens indexed by position
+        :type visual_tokens: dict[int, Token]
         :return: the token
         :rtype: object
         """
-        for token in visual_tokens:
-            if token.get_board_id() == pos:
-                return token
+        return visual_tokens[pos]
+
+    def drop_token(self, column: int):
+        """Add a token of the player who has to play in a column, and start
+        its animation
+
+        :param column: the column
+        :type column: int
+        """
+        player = self.get_player()
+        pos = self.play(column)
+        if pos is None:
+            return
+        visual_token = self.view.get_token(pos)
+        color = self.get_player_color(player)
+        token = Token(
+            visual_token.x, visual_token.y, self.radius, color, None, self.sprites
+        )
+        won = self.get_winner() != 0
+
+        def landed():
+            self.view.show_token(pos, player)
+            self.play_sound("win" if won else "drop")
+
+        token.animate(self.animator, landed)
+        if won:
+            self.is_fin = True
+        self.update_ghost()
+        self.request_analysis()
+
+    def play_sound(self, name: str):
+        """Play a sound without waiting for its end, if sounds are enabled
+
+        :param name: 'drop' or 'win'
+        :type name: str
+        """
+        if self.sounds:
+            fltk.joue_son(name)
+
+    def load_sounds(self):
+        """Synthesize the sounds of the game, so that playing them does not
+        wait for their loading"""
+        from sounds import DROP_SOUND, WIN_SOUND, tone
+
+        if not fltk.son_disponible():
+            self.sounds = False
+            return
+        fltk.charge_son(tone(*DROP_SOUND), "drop")
+        fltk.charge_son(tone(*WIN_SOUND), "win")
+
+    def undo_move(self):
+        """Cancel the last move of the user, and the answer of the computer"""
+        if self.thinking or not self.moves:
+            return
+        self.animator.finish()
+        self.undo()
+        if self.is_ai_turn() and self.moves:
+            self.undo()
+        self.is_fin = self.get_winner() != 0
+        self.view.apply(self)
+        self.update_ghost()
+        self.request_analysis()
+        if self.is_ai_turn():
+            self.play_ai()
+
+    def reset(self):
+        """Cancel all moves"""
+        if self.thinking:
+            return
+        self.animator.finish()
+        while self.moves:
+            self.undo()
+        self.is_fin = False
+        self.view.apply(self)
+        self.update_ghost()
+        self.request_analysis()
+        if self.is_ai_turn():
+            self.play_ai()
+
+    def on_motion(self, ev: tuple):
+        """Show where a token would land in the column under the mouse
+
+        :param ev: the motion event
+        :type ev: tuple
+        """
+        column = self.where_is_click(fltk.abscisse(ev), self.space)
+        self.hover_column = None if isinstance(column, bool) else column
+        self.update_ghost()
+
+    def update_ghost(self):
+        """Move the ghost token to the hole where a token of the player who
+        has to play would land, or hide it"""
+        pos = None
+        if self.hover_column is not None and not self.is_fin and not self.is_ai_turn():
+            pos = self.get_free_pos(self.hover_column)
+        r = self.radius
+        if pos is None:
+            fltk.coordonnees(self.ghost, -2 * r, -2 * r, -r, -r)
+            return
+        token = self.view.get_token(pos)
+        fltk.coordonnees(self.ghost, token.x - r, token.y - r, token.x + r, token.y + r)
+        fltk.modifie(self.ghost, couleur=self.get_player_color(self.get_player()))
+
+    def draw_analysis(self):
+        """Draw the evaluation bar and the score of each column, empty until
+        the first results of the analysis"""
+        fltk.rectangle(0, 0, EVAL_BAR_WIDTH, HEIGHT_WINDOW, remplissage="red")
+        self.eval_bar = fltk.rectangle(
+            0,
+            HEIGHT_WINDOW / 2,
+            EVAL_BAR_WIDTH,
+            HEIGHT_WINDOW,
+            remplissage="yellow",
+            epaisseur=0,
+        )
+        self.score_texts = [
+            fltk.texte(
+                50 + column * self.space,
+                10,
+                "",
+                couleur="white",
+                ancrage="center",
+                taille=10,
+            )
+            for column in range(self.width)
+        ]
+
+    def request_analysis(self):
+        """Start the analysis of the current position, the results of the
+        previous one are ignored from now on"""
+        if self.analyzer is None:
+            return
+        for text in self.score_texts:
+            fltk.modifie(text, chaine="")
+        if self.is_fin or not any(True for _ in self.legal_moves()):
+            self.analyzer.cancel()
+            self.analysis_id = None
+            return
+        self.analysis_id = self.analyzer.analyse(self)
+
+    def on_analysis(self, ev: tuple):
+        """Show the results of the analysis of the current position
+
+        :param ev: the event posted by the analyzer
+        :type ev: tuple
+        """
+        analysis_id, _, scores, exact = fltk.donnee(ev)
+        if analysis_id != self.analysis_id or not scores:
+            return
+        for column, text in enumerate(self.score_texts):
+            if column not in scores:
+                label = ""
+            elif scores[column] != 0:
+                label = f"{scores[column]:+d}"
+            else:
+                label = "0" if exact else "?"
+            fltk.modifie(text, chaine=label)
+        best = max(scores.values())
+        if self.get_player() == 2:
+            best = -best
+        # share of the bar of player 1, a score is at most (size + 1) // 2
+        share = min(1.0, max(0.0, 0.5 + best / (self.geometry.size + 2)))
+        top = HEIGHT_WINDOW * (1 - share)
+        fltk.coordonnees(self.eval_bar, 0, top, EVAL_BAR_WIDTH, HEIGHT_WINDOW)
+
+    def on_quit(self, ev: tuple):
+        """Stop the analysis and leave the event loop
+
+        :param ev: the quit event
+        :type ev: tuple
+        """
+        if self.analyzer is not None:
+            self.analyzer.close()
+            self.analyzer = None
+        fltk.quitte_boucle()
+
+    def on_key(self, ev: tuple):
+        """Cancel the last move with backspace, or all moves with 'r'
+
+        :param ev: the key event
+        :type ev: tuple
+        """
+        key = fltk.touche(ev)
+        if key == "BackSpace":
+            self.undo_move()
+        elif key == "r":
+            self.reset()
+
+    def on_click(self, ev: tuple):
+        """Play in the column clicked by the user
+
+        :param ev: the click event
+        :type ev: tuple
+        """
+        if self.is_fin or self.is_ai_turn():
+            return
+        column = self.where_is_click(fltk.abscisse(ev), self.space)
+        if isinstance(column, bool):
+            return
+        self.drop_token(column)
+        if self.is_ai_turn() and not self.is_fin:
+            self.play_ai()
+
+    def play_ai(self):
+        """Start the search of the computer on another thread, so that the
+        window keeps running"""
+        self.thinking = True
+        position = self.copy()
+        result = []
+        thread = threading.Thread(
+            target=lambda: result.append(self.solver.solve(position)[1]),
+            daemon=True,
+        )
+        thread.start()
+        fltk.planifie(AI_POLL_INTERVAL, self.wait_ai, thread, result)
+
+    def wait_ai(self, thread: threading.Thread, result: list):
+        """Play the move of the computer once its search is over
+
+        :param thread: the thread of the search
+        :type thread: threading.Thread
+        :param result: the list where the thread puts the column
+        :type result: list
+        """
+        if thread.is_alive():
+            fltk.planifie(AI_POLL_INTERVAL, self.wait_ai, thread, result)
+            return
+        self.thinking = False
+        if result and result[0] is not None and not self.is_fin:
+            self.drop_token(result[0])
 
     # With text
 
@@ -216,28 +668,29 @@ class Game(Connect4):
         :rtype: str
         """
         ch = "\n\n"
-        for y in range(6):
-            for column in range(7):
-                pos = 10 * y + column
+        last = self.width - 1
+        for y in range(self.height):
+            for column in range(self.width):
+                pos = self.stride * y + column
                 if pos in self.get_player_tokens(1):
                     car = "X"
                 elif pos in self.get_player_tokens(2):
                     car = "O"
                 else:
                     car = " "
-                if column == 6:
+                if column == last:
                     ch += f"| {car} | "
                 else:
                     ch += f"| {car} "
             ch += "\n"
-        for x in range(7):
-            if x == 6:
+        for x in range(self.width):
+            if x == last:
                 ch += f"| - |"
             else:
                 ch += f"| - "
         ch += "\n"
-        for x in range(7):
-            if x == 6:
+        for x in range(self.width):
+            if x == last:
                 ch += f"| {x} |"
             else:
                 ch += f"| {x} "
@@ -251,7 +704,7 @@ class Game(Connect4):
         """
         player = self.get_player_symbol(self.get_player())
         n = input(f"\n{player} > ")
-        while not n.isdigit():
+        while not n.isdigit() or int(n) >= self.width:
             n = input(f"\n{player} > ")
         return int(n)
 
@@ -259,47 +712,82 @@ class Game(Connect4):
 
     def main(self):
         """The main function to play"""
+        start = time()
         if self.display_type == "graphic":
-            return self.main_graphic()
-        return self.main_text()
+            load_fltk()
+            self.main_graphic()
+        else:
+            self.main_text()
+        if self.record_path is not None:
+            self.save_record(start)
+
+    def save_record(self, start: float):
+        """Append the game to the archive of record_path
+
+        :param start: the start of the game, in seconds since the epoch
+        :type start: float
+        """
+        from records import append_game
+
+        engines = ["human", "human"]
+        if self.ai_player is not None:
+            engines[self.ai_player - 1] = self.engine
+        append_game(self.record_path, self, tuple(engines), start)
 
     def main_graphic(self):
         """The main function to play the game when the user choice is to use
         graphic display"""
         fltk.cree_fenetre(WIDTH_WINDOW, HEIGHT_WINDOW, "Connect 4")
         fltk.rectangle(0, 0, WIDTH_WINDOW, HEIGHT_WINDOW, remplissage="blue")
-        visual_board, space = self.draw_circles()
-        tev = None
-        is_fin = False
-        while tev != "Quitte":
-            ev = fltk.donne_ev()
-            tev = fltk.type_ev(ev)
-            if tev == "ClicGauche" and not is_fin:
-                column = self.where_is_click(fltk.abscisse_souris(), space)
-                if not isinstance(column, bool):
-                    player = self.get_player()
-                    pos = self.add_token(column, player)
-                    if pos is not None:
-                        visual_token = self.find_visual_token(pos, visual_board)
-                        visual_token.set_color(self.get_player_color(player))
-                        visual_token.animate()
-                        visual_token.refresh()
-                        if self.is_win(pos):
-                            is_fin = True
-                        self.add_turn()
-            fltk.mise_a_jour()
+        self.visual_board, self.space = self.draw_circles()
+        self.view = BoardView(
+            self.visual_board,
+            {0: "white", 1: self.get_player_color(1), 2: self.get_player_color(2)},
+        )
+        self.view.apply(self)
+        self.is_fin = self.get_winner() != 0
+        from animation import Animator
+
+        self.animator = Animator()
+        self.ghost = fltk.cercle(
+            -2 * self.radius, -2 * self.radius, self.radius, epaisseur=4
+        )
+        fltk.lie_ev("ClicGauche", self.on_click)
+        fltk.lie_ev("Deplacement", self.on_motion)
+        fltk.lie_ev("Touche", self.on_key)
+        fltk.lie_ev("Quitte", self.on_quit)
+        if self.analysis:
+            from analysis import ANALYSIS_EVENT, Analyzer
+
+            self.draw_analysis()
+            self.analyzer = Analyzer(
+                ANALYSIS_TIME, book=self.book, geometry=self.geometry
+            )
+            fltk.lie_ev(ANALYSIS_EVENT, self.on_analysis)
+            self.request_analysis()
+        if self.is_ai_turn():
+            self.play_ai()
+        if self.sounds:
+            self.load_sounds()
+        if self.capture_path is not None:
+            fltk.demarre_film(self.capture_path)
+        fltk.boucle_principale()
         fltk.ferme_fenetre()
 
     def main_text(self):
         """The main function to play the game when the user choice is to use
         graphic display"""
         g = False
-        while not g:
+        while (
+            not g and len(self.player1) + len(self.player2) < self.width * self.height
+        ):
             print(self)
-            column = self.wait_input()
-            pos = self.add_token(column, self.get_player())
-            g = self.is_win(pos)
-            self.add_turn()
+            if self.is_ai_turn():
+                column = self.ai_move()
+            else:
+                column = self.wait_input()
+            self.play(column)
+            g = self.get_winner() != 0
         print(self)
 
 
@@ -312,6 +800,101 @@ if __name__ == "__main__":
         default="graphic",
         help="Allows you to choose the display mode of the game",
     )
+    parser.add_argument(
+        "--ai",
+        type=int,
+        choices={1, 2},
+        default=None,
+        help="Lets the computer play as player 1 or 2",
+    )
+    parser.add_argument(
+        "--ai-time",
+        type=float,
+        default=1.0,
+        help="The time in seconds the computer can think for each move",
+    )
+    parser.add_argument(
+        "--engine",
+        choices={"solver", "mcts"},
+        default="solver",
+        help="The search of the computer, mcts needs numpy",
+    )
+    parser.add_argument(
+        "--book",
+        default=None,
+        help="The opening book used by the computer, see book.py",
+    )
+    parser.add_argument(
+        "--analysis",
+        action="store_true",
+        help="Shows the evaluation of the position in the graphic display",
+    )
+    parser.add_argument(
+        "--sprites",
+        action="store_true",
+        help="Draws the tokens from cached images instead of circles",
+    )
+    parser.add_argument(
+        "--capture",
+        default=None,
+        help="Records the graphic game in an animated GIF (.gif) or PNG images",
+    )
+    parser.add_argument(
+        "--sound",
+        action="store_true",
+        help="Plays sounds when a token lands and when a player wins",
+    )
+    parser.add_argument(
+        "--width", type=int, default=7, help="The number of columns of the grid"
+    )
+    parser.add_argument(
+        "--height", type=int, default=6, help="The number of rows of the grid"
+    )
+    parser.add_argument(
+        "--connect",
+        type=int,
+        default=4,
+        help="The number of aligned tokens needed to win",
+    )
+    parser.add_argument(
+        "--record",
+        default=None,
+        help="Appends the game to this archive when it ends, see records.py",
+    )
+    parser.add_argument(
+        "--startup-profile",
+        action="store_true",
+        help="Reports the time needed to get ready to play, then exits",
+    )
     args = vars(parser.parse_args())
-    game = Game(args["display"])
+    variant = (args["width"], args["height"], args["connect"]) != (7, 6, 4)
+    if variant and args["book"] is not None:
+        parser.error("--book needs the standard 7x6 grid")
+    start = perf_counter()
+    if args["display"] == "graphic":
+        load_fltk()
+    game = Game(
+        args["display"],
+        args["ai"],
+        args["ai_time"],
+        args["book"],
+        args["analysis"],
+        args["sprites"],
+        args["capture"],
+        args["sound"],
+        args["engine"],
+        args["width"],
+        args["height"],
+        args["connect"],
+        args["record"],
+    )
+    if args["startup_profile"]:
+        # process_time includes the start of the interpreter and the imports
+        cpu = process_time()
+        budget = STARTUP_BUDGET[args["display"]]
+        loaded = [name for name in ("tkinter", "pygame", "PIL") if name in sys.modules]
+        print(f"startup: {cpu * 1000:.1f} ms CPU (budget {budget * 1000:.0f} ms)")
+        print(f"game setup: {(perf_counter() - start) * 1000:.1f} ms")
+        print(f"modules loaded: {len(sys.modules)}, GUI: {', '.join(loaded) or 'none'}")
+        sys.exit(0 if cpu <= budget else 1)
     game.main()
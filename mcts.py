@@ -0,0 +1,526 @@
+import argparse
+import math
+from array import array
+from time import perf_counter
+from typing import Union
+import numpy as np
+from game import Connect4, Geometry
+from solver import STANDARD, is_winning_move, to_bitboards
+
+# The result of a node: not known yet, a draw, or a win of the player who
+# played the move of the node
+UNKNOWN = -1
+DRAW = 0
+WIN = 1
+
+# The numpy tables of each grid, see get_playout_tables
+PLAYOUT_TABLES = {}
+
+
+def get_playout_tables(geometry: Geometry):
+    """Get the numpy tables of the random games on a grid, they are only
+    computed once. The bitboards are 64 bits integers when they fit, else
+    python integers in arrays of objects, which are much slower.
+
+    :param geometry: the grid
+    :type geometry: Geometry
+    :return: the type of the arrays, the type of the integers, by column the
+             bottom cell, the top cell and every cell of the column, and the
+             shifts of each direction of the alignments
+    :rtype: tuple
+    """
+    tables = PLAYOUT_TABLES.get(geometry)
+    if tables is None:
+        if geometry.width * geometry.column_bits <= 64:
+            dtype = word = np.uint64
+        else:
+            dtype, word = object, int
+        tables = PLAYOUT_TABLES[geometry] = (
+            dtype,
+            word,
+            np.array(geometry.bottom, dtype=dtype),
+            np.array(geometry.top, dtype=dtype),
+            np.array(geometry.column_mask, dtype=dtype),
+            [
+                tuple(word(shift) for shift in shifts)
+                for shifts in geometry.alignment_shifts
+            ],
+        )
+    return tables
+
+
+def has_alignment(bits: np.ndarray, alignment_shifts: list):
+    """Tell which bitboards contain aligned tokens
+
+    :param bits: the bitboards
+    :type bits: np.ndarray
+    :param alignment_shifts: the shifts of each direction, see
+                             Geometry.alignment_shifts
+    :type alignment_shifts: list[tuple]
+    :return: True for each bitboard with an alignment
+    :rtype: np.ndarray
+    """
+    found = np.zeros(len(bits), dtype=bool)
+    for shifts in alignment_shifts:
+        runs = bits
+        for shift in shifts:
+            runs = runs & (runs >> shift)
+        found |= runs != 0
+    return found
+
+
+def random_playouts(
+    current: np.ndarray,
+    mask: np.ndarray,
+    moves: np.ndarray,
+    rng: np.random.Generator,
+    geometry: Geometry = STANDARD,
+):
+    """Play random games from many positions at once, every game advances
+    by one move at each step
+
+    :param current: the tokens of the player who has to play, for each game
+    :type current: np.ndarray
+    :param mask: the tokens of both players, for each game
+    :type mask: np.ndarray
+    :param moves: the number of tokens, for each game
+    :type moves: np.ndarray
+    :param rng: the random generator
+    :type rng: np.random.Generator
+    :param geometry: the grid, defaults to STANDARD
+    :type geometry: Geometry, optional
+    :return: for each game, 1 if the player who had to play wins, -1 if he
+             loses, 0 for a draw
+    :rtype: np.ndarray
+    """
+    dtype, word, bottom, top, column_mask, shifts = get_playout_tables(geometry)
+    size = geometry.size
+    current = current.astype(dtype)
+    mask = mask.astype(dtype)
+    moves = moves.astype(np.int64)
+    count = len(current)
+    result = np.zeros(count, dtype=np.int8)
+    sign = np.ones(count, dtype=np.int8)
+    active = moves < size
+    zero = word(0)
+    while active.any():
+        # a random legal column: the legal ones get 1 more than the others
+        legal = ((mask[:, None] & top) == zero).astype(bool)
+        column = (rng.random((count, geometry.width)) + legal).argmax(axis=1)
+        move = (mask + bottom[column]) & column_mask[column]
+        move = np.where(active, move, zero)
+        won = active & has_alignment(current | move, shifts)
+        result[won] = sign[won]
+        # the other player has to play
+        current = np.where(active, current ^ mask, current)
+        mask |= move
+        moves += active
+        sign = np.where(active, -sign, sign)
+        active &= ~won & (moves < size)
+    return result
+
+
+class MCTS:
+    """Monte Carlo tree search with UCT selection
+
+    The nodes are stored in flat arrays indexed by node number, the children
+    of a node are contiguous. The random games are played by batches: the
+    leaves of a batch are selected one after the other with a virtual loss,
+    so that they differ, then all their games are played at once on numpy
+    bitboards. The tree of the previous move is reused when the position
+    comes from it.
+    """
+
+    def __init__(
+        self,
+        max_time: Union[None, float] = None,
+        max_playouts: Union[None, int] = None,
+        batch: int = 256,
+        exploration: float = 1.4,
+        max_nodes: int = 1_000_000,
+        seed: Union[None, int] = None,
+        geometry: Geometry = STANDARD,
+    ):
+        """Initialisation
+
+        :param max_time: the time allowed for each move, in seconds, defaults
+                         to None
+        :type max_time: Union[None, float], optional
+        :param max_playouts: the number of random games for each move,
+                             defaults to None
+        :type max_playouts: Union[None, int], optional
+        :param batch: the number of random games played at once
+        :type batch: int
+        :param exploration: the exploration constant of UCT
+        :type exploration: float
+        :param max_nodes: the number of nodes of the tree, the leaves are no
+                          longer expanded once it is reached
+        :type max_nodes: int
+        :param seed: the seed of the random games, defaults to None
+        :type seed: Union[None, int], optional
+        :param geometry: the grid of the positions, defaults to STANDARD
+        :type geometry: Geometry, optional
+        """
+        if max_time is None and max_playouts is None:
+            max_playouts = 10_000
+        self.max_time = max_time
+        self.max_playouts = max_playouts
+        self.batch = batch
+        self.exploration = exploration
+        self.max_nodes = max_nodes
+        self.rng = np.random.default_rng(seed)
+        self.geometry = geometry
+        self.dtype = get_playout_tables(geometry)[0]
+        self.playouts = 0
+        self.elapsed = 0.0
+        self.reused = 0
+        self.clear()
+
+    def clear(self):
+        """Remove every node"""
+        self.parent = array("i")
+        self.first_child = array("i")
+        self.child_count = array("b")
+        self.column = array("b")
+        self.result = array("b")
+        self.moves = array("h")
+        self.visits = array("l")
+        # sum of the rewards of the player who played the move of the node
+        self.value = array("d")
+        if self.dtype is object:
+            # the bitboards do not fit in 64 bits
+            self.current = []
+            self.mask = []
+        else:
+            self.current = array("Q")
+            self.mask = array("Q")
+        self.root = None
+
+    def get_size(self):
+        """Get the number of nodes
+
+        :return: the number of nodes
+        :rtype: int
+        """
+        return len(self.parent)
+
+    def add_node(
+        self, parent: int, column: int, current: int, mask: int, moves: int, result: int
+    ):
+        """Add a node at the end of the arrays
+
+        :param parent: the parent node, -1 for the root
+        :type parent: int
+        :param column: the column played to reach the node
+        :type column: int
+        :param current: the tokens of the player who has to play
+        :type current: int
+        :param mask: the tokens of both players
+        :type mask: int
+        :param moves: the number of tokens on the board
+        :type moves: int
+        :param result: UNKNOWN, DRAW or WIN
+        :type result: int
+        :return: the number of the node
+        :rtype: int
+        """
+        self.parent.append(parent)
+        self.first_child.append(-1)
+        self.child_count.append(0)
+        self.column.append(column)
+        self.result.append(result)
+        self.moves.append(moves)
+        self.visits.append(0)
+        self.value.append(0.0)
+        self.current.append(current)
+        self.mask.append(mask)
+        return len(self.parent) - 1
+
+    def expand(self, node: int):
+        """Add the children of a node, one for each legal column
+
+        :param node: the node
+        :type node: int
+        """
+        current = self.current[node]
+        mask = self.mask[node]
+        moves = self.moves[node] + 1
+        geometry = self.geometry
+        self.first_child[node] = len(self.parent)
+        count = 0
+        for column in geometry.move_order:
+            if mask & geometry.top[column]:
+                continue
+            if is_winning_move(current, mask, column, geometry):
+                result = WIN
+            elif moves == geometry.size:
+                result = DRAW
+            else:
+                result = UNKNOWN
+            child_mask = mask | (mask + geometry.bottom[column])
+            self.add_node(node, column, current ^ mask, child_mask, moves, result)
+            count += 1
+        self.child_count[node] = count
+
+    def select(self):
+        """Go down from the root to a leaf with UCT, and count a visit on
+        each node of the path so that the next selection of the batch
+        prefers other paths
+
+        :return: the leaf
+        :rtype: int
+        """
+        node = self.root
+        visits = self.visits
+        value = self.value
+        while True:
+            visits[node] += 1
+            if self.result[node] != UNKNOWN:
+                return node
+            first = self.first_child[node]
+            if first < 0:
+                if visits[node] == 1 or len(self.parent) >= self.max_nodes:
+                    return node
+                self.expand(node)
+                first = self.first_child[node]
+            log_visits = math.log(visits[node])
+            best = None
+            best_score = -1.0
+            for child in range(first, first + self.child_count[node]):
+                child_visits = visits[child]
+                if child_visits == 0:
+                    best = child
+                    break
+                score = value[child] / child_visits + self.exploration * math.sqrt(
+                    log_visits / child_visits
+                )
+                if score > best_score:
+                    best, best_score = child, score
+            node = best
+
+    def backpropagate(self, node: int, reward: float):
+        """Add the reward of a game to the nodes of its path
+
+        :param node: the leaf of the game
+        :type node: int
+        :param reward: the reward of the player who played the move of the
+                       leaf, 1 for a win, 0.5 for a draw, 0 for a loss
+        :type reward: float
+        """
+        while node >= 0:
+            self.value[node] += reward
+            reward = 1.0 - reward
+            node = self.parent[node]
+
+    def run_batch(self):
+        """Select a batch of leaves, play their random games at once and
+        update the tree
+
+        :return: the number of random games
+        :rtype: int
+        """
+        leaves = [self.select() for _ in range(self.batch)]
+        open_leaves = []
+        for leaf in leaves:
+            result = self.result[leaf]
+            if result == WIN:
+                self.backpropagate(leaf, 1.0)
+            elif result == DRAW:
+                self.backpropagate(leaf, 0.5)
+            else:
+                open_leaves.append(leaf)
+        if open_leaves:
+            outcomes = random_playouts(
+                np.array([self.current[leaf] for leaf in open_leaves], self.dtype),
+                np.array([self.mask[leaf] for leaf in open_leaves], self.dtype),
+                np.array([self.moves[leaf] for leaf in open_leaves]),
+                self.rng,
+                self.geometry,
+            )
+            # the outcome is for the player who has to play in the leaf, the
+            # reward for the player who played its move
+            for leaf, outcome in zip(open_leaves, outcomes.tolist()):
+                self.backpropagate(leaf, (1.0 - outcome) / 2)
+        return len(leaves)
+
+    def find_root(self, current: int, mask: int):
+        """Find the node of a position among the root and the nodes of the
+        next two moves
+
+        :param current: the tokens of the player who has to play
+        :type current: int
+        :param mask: the tokens of both players
+        :type mask: int
+        :return: the node, None if it is not in the tree
+        :rtype: Union[None, int]
+        """
+        if self.root is None:
+            return None
+        nodes = [self.root]
+        for _ in range(3):
+            for node in nodes:
+                if self.mask[node] == mask and self.current[node] == current:
+                    return node
+            children = []
+            for node in nodes:
+                first = self.first_child[node]
+                if first >= 0:
+                    children.extend(range(first, first + self.child_count[node]))
+            nodes = children
+        return None
+
+    def keep_subtree(self, node: int):
+        """Keep only a node and its descendants, the node becomes the root
+
+        :param node: the new root
+        :type node: int
+        """
+        old = (
+            self.first_child,
+            self.child_count,
+            self.column,
+            self.result,
+            self.moves,
+            self.visits,
+            self.value,
+            self.current,
+            self.mask,
+        )
+        first_child, child_count = old[0], old[1]
+        self.clear()
+        # the nodes are copied breadth first, so the children of a node stay
+        # contiguous
+        queue = [(node, -1)]
+        for old_node, new_parent in queue:
+            new_node = self.add_node(
+                new_parent,
+                old[2][old_node],
+                old[7][old_node],
+                old[8][old_node],
+                old[4][old_node],
+                old[3][old_node],
+            )
+            self.visits[new_node] = old[5][old_node]
+            self.value[new_node] = old[6][old_node]
+            first = first_child[old_node]
+            if first >= 0:
+                queue.extend(
+                    (child, new_node)
+                    for child in range(first, first + child_count[old_node])
+                )
+        # the children of a node were queued together, so they are
+        # contiguous and the first one found is the first child
+        for new_node in range(1, len(self.parent)):
+            parent = self.parent[new_node]
+            if self.first_child[parent] < 0:
+                self.first_child[parent] = new_node
+                self.child_count[parent] = 0
+            self.child_count[parent] += 1
+        self.root = 0
+
+    def search(self, current: int, mask: int, moves: int):
+        """Search the best move of a position given by its bitboards
+
+        :param current: the tokens of the player who has to play
+        :type current: int
+        :param mask: the tokens of both players
+        :type mask: int
+        :param moves: the number of tokens on the board
+        :type moves: int
+        :return: the expected reward of the player who has to play, between 0
+                 and 1, and the best column, the column is None if the grid
+                 is full
+        :rtype: tuple[float, Union[int, None]]
+        """
+        start = perf_counter()
+        node = self.find_root(current, mask)
+        if node is None:
+            self.clear()
+            self.root = self.add_node(-1, -1, current, mask, moves, UNKNOWN)
+            self.reused = 0
+        else:
+            self.keep_subtree(node)
+            self.reused = self.visits[self.root]
+        geometry = self.geometry
+        if moves == geometry.size:
+            return 0.5, None
+        # a winning move does not need a search
+        for column in geometry.move_order:
+            if not mask & geometry.top[column] and is_winning_move(
+                current, mask, column, geometry
+            ):
+                return 1.0, column
+        # the children of the root are needed to choose a move, even when
+        # the budget allows no playout or no other node
+        if self.first_child[self.root] < 0:
+            self.expand(self.root)
+        deadline = None if self.max_time is None else start + self.max_time
+        self.playouts = 0
+        while True:
+            if self.max_playouts is not None and self.playouts >= self.max_playouts:
+                break
+            if deadline is not None and perf_counter() >= deadline:
+                break
+            self.playouts += self.run_batch()
+        self.elapsed = perf_counter() - start
+        first = self.first_child[self.root]
+        children = range(first, first + self.child_count[self.root])
+        best = max(children, key=lambda child: self.visits[child])
+        return self.value[best] / max(1, self.visits[best]), self.column[best]
+
+    def solve(self, game: Connect4):
+        """Search the best move of a position
+
+        :param game: the position, it is not modified
+        :type game: Connect4 or BitboardConnect4
+        :return: the expected reward of the player who has to play, between 0
+                 and 1, and the best column, the column is None if the grid
+                 is full
+        :rtype: tuple[float, Union[int, None]]
+        """
+        return self.search(*to_bitboards(game, self.geometry))
+
+    def get_stats(self):
+        """Get the statistics of the last search
+
+        :return: the number of random games, random games per second, nodes
+                 and visits reused from the previous search
+        :rtype: dict
+        """
+        return {
+            "playouts": self.playouts,
+            "playouts_per_second": (
+                self.playouts / self.elapsed if self.elapsed else 0.0
+            ),
+            "nodes": self.get_size(),
+            "reused": self.reused,
+        }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Connect 4 Monte Carlo search")
+    parser.add_argument(
+        "moves", nargs="*", type=int, help="The columns played from the empty grid"
+    )
+    parser.add_argument(
+        "--time", type=float, default=1.0, help="The time of the search in seconds"
+    )
+    parser.add_argument(
+        "--playouts", type=int, default=None, help="The number of random games"
+    )
+    parser.add_argument(
+        "--batch", type=int, default=256, help="The number of games played at once"
+    )
+    parser.add_argument("--seed", type=int, default=None, help="The random seed")
+    args = vars(parser.parse_args())
+    game = Connect4()
+    for column in args["moves"]:
+        game.play(column)
+    engine = MCTS(args["time"], args["playouts"], args["batch"], seed=args["seed"])
+    value, column = engine.solve(game)
+    stats = engine.get_stats()
+    print(f"best column: {column}, expected reward: {value:.3f}")
+    print(
+        f"{stats['playouts']} playouts, {stats['playouts_per_second']:.0f} playouts/s,"
+        f" {stats['nodes']} nodes"
+    )
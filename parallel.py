@@ -0,0 +1,260 @@
+import argparse
+import multiprocessing
+import random
+from multiprocessing import shared_memory
+from time import perf_counter
+from typing import Union
+from game import Connect4
+from solver import MOVE_ORDER, Solver, to_bitboards
+from transposition import ENTRY_SIZE, TranspositionTable
+
+# Positions used by --bench, as the columns played from the empty grid
+BENCH_POSITIONS = [
+    [2, 0, 0, 3, 5, 3, 2, 2, 4, 3, 2, 6, 5, 5],
+    [4, 0, 0, 6, 6, 2, 1, 6, 1, 5, 6, 0],
+    [2, 4, 2, 2, 6, 6, 2, 3, 3, 2, 2, 3, 4],
+    [1, 3, 5, 5, 1, 1, 1, 0, 6, 4, 2],
+]
+
+
+def worker_order(index: int):
+    """Get the column order of a worker, the helpers break the ties of the
+    center-first order in their own way so that they search different moves
+    first
+
+    :param index: the number of the worker, 0 keeps MOVE_ORDER
+    :type index: int
+    :return: the columns in the order they are tried
+    :rtype: list[int]
+    """
+    if index == 0:
+        return list(MOVE_ORDER)
+    rng = random.Random(index)
+    order = [MOVE_ORDER[0]]
+    for i in range(1, len(MOVE_ORDER), 2):
+        pair = MOVE_ORDER[i : i + 2]
+        rng.shuffle(pair)
+        order.extend(pair)
+    return order
+
+
+def run_worker(
+    name: str,
+    index: int,
+    tasks: multiprocessing.Queue,
+    results: multiprocessing.Queue,
+    stop: object,
+):
+    """Search the positions sent by the main process until None is sent,
+    with a transposition table in shared memory
+
+    :param name: the name of the shared memory of the table
+    :type name: str
+    :param index: the number of the worker
+    :type index: int
+    :param tasks: the positions to search and their time
+    :type tasks: multiprocessing.Queue
+    :param results: the queue where the results are sent
+    :type results: multiprocessing.Queue
+    :param stop: the event that stops the searches of all workers
+    :type stop: multiprocessing.Event
+    """
+    memory = shared_memory.SharedMemory(name=name)
+    table = TranspositionTable(buffer=memory.buf)
+    solver = Solver(table=table, move_order=worker_order(index), stop=stop)
+    try:
+        while True:
+            task = tasks.get()
+            if task is None:
+                break
+            current, mask, moves, max_time = task
+            solver.max_time = max_time
+            score, column = solver.search(current, mask, moves)
+            results.put(
+                (index, score, column, solver.depth, solver.exact, solver.nodes)
+            )
+    finally:
+        # the memoryview of the table must be released before the memory
+        del solver, table
+        memory.close()
+
+
+class ParallelSolver:
+    """Lazy SMP: every worker process searches the same position with the
+    negamax solver, and they share one transposition table in shared
+    memory. What a worker stores helps the others, and the first exact
+    result stops all of them.
+    """
+
+    def __init__(
+        self,
+        workers: int = 4,
+        max_time: Union[None, float] = None,
+        table_mb: float = 64,
+    ):
+        """Initialisation, the worker processes are started here and kept
+        until close is called
+
+        :param workers: the number of processes
+        :type workers: int
+        :param max_time: the maximum time of a search in seconds, defaults to
+                         None means no limit
+        :type max_time: Union[None, float], optional
+        :param table_mb: the memory of the shared transposition table, in MB
+        :type table_mb: float
+        """
+        self.max_time = max_time
+        self.nodes = 0
+        self.depth = 0
+        self.exact = False
+        size = max(2 * ENTRY_SIZE, int(table_mb * 1024 * 1024) // 16 * 16)
+        self.memory = shared_memory.SharedMemory(create=True, size=size)
+        self.memory.buf[:] = bytes(self.memory.size)
+        context = multiprocessing.get_context()
+        self.stop = context.Event()
+        self.results = context.Queue()
+        self.tasks = [context.Queue() for _ in range(workers)]
+        self.processes = [
+            context.Process(
+                target=run_worker,
+                args=(self.memory.name, index, tasks, self.results, self.stop),
+                daemon=True,
+            )
+            for index, tasks in enumerate(self.tasks)
+        ]
+        for process in self.processes:
+            process.start()
+
+    def search(self, current: int, mask: int, moves: int):
+        """Search the best move of a position given by its bitboards
+
+        :param current: the tokens of the player who has to play
+        :type current: int
+        :param mask: the tokens of both players
+        :type mask: int
+        :param moves: the number of tokens on the board
+        :type moves: int
+        :return: the score of the position and the best column, the column is
+                 None if the grid is full
+        :rtype: tuple[int, Union[int, None]]
+        """
+        self.stop.clear()
+        for tasks in self.tasks:
+            tasks.put((current, mask, moves, self.max_time))
+        results = []
+        for _ in self.tasks:
+            result = self.results.get()
+            results.append(result)
+            if result[4]:
+                # an exact result cannot be improved, the others stop
+                self.stop.set()
+        self.stop.set()
+        self.nodes = sum(result[5] for result in results)
+        # the exact result, else the deepest one, else the main worker
+        _, score, column, self.depth, self.exact, _ = max(
+            results, key=lambda result: (result[4], result[3], -result[0])
+        )
+        return score, column
+
+    def solve(self, game: Connect4):
+        """Search the best move of a position
+
+        :param game: the position, it is not modified
+        :type game: Connect4 or BitboardConnect4
+        :return: the score of the position and the best column, the column is
+                 None if the grid is full
+        :rtype: tuple[int, Union[int, None]]
+        """
+        return self.search(*to_bitboards(game))
+
+    def close(self):
+        """Stop the worker processes and free the shared memory"""
+        self.stop.set()
+        for tasks in self.tasks:
+            tasks.put(None)
+        for process in self.processes:
+            process.join()
+        self.memory.close()
+        self.memory.unlink()
+
+
+def bench(counts: list, table_mb: float):
+    """Solve the bench positions with the single process solver, then with
+    each number of workers
+
+    :param counts: the numbers of workers
+    :type counts: list[int]
+    :param table_mb: the memory of the transposition tables, in MB
+    :type table_mb: float
+    :return: the time of the single process solver, and for each number of
+             workers its time
+    :rtype: tuple[float, dict[int, float]]
+    """
+    games = []
+    for moves in BENCH_POSITIONS:
+        game = Connect4()
+        for column in moves:
+            game.play(column)
+        games.append(game)
+    start = perf_counter()
+    reference = []
+    for game in games:
+        reference.append(Solver(table_mb=table_mb).solve(game)[0])
+    single = perf_counter() - start
+    times = {}
+    for count in counts:
+        solver = ParallelSolver(count, table_mb=table_mb)
+        try:
+            start = perf_counter()
+            for game, score in zip(games, reference):
+                solver.memory.buf[:] = bytes(solver.memory.size)
+                if solver.solve(game)[0] != score:
+                    raise AssertionError("the parallel search found another score")
+            times[count] = perf_counter() - start
+        finally:
+            solver.close()
+    return single, times
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Connect 4 parallel solver")
+    parser.add_argument(
+        "moves", nargs="*", type=int, help="The columns played from the empty grid"
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        nargs="+",
+        default=[4],
+        help="The number of processes, several numbers with --bench",
+    )
+    parser.add_argument(
+        "--time", type=float, default=None, help="The time of the search in seconds"
+    )
+    parser.add_argument(
+        "--table-mb", type=float, default=64, help="The memory of the shared table"
+    )
+    parser.add_argument(
+        "--bench",
+        action="store_true",
+        help="Compares the time of the bench positions with the single process",
+    )
+    args = vars(parser.parse_args())
+    if args["bench"]:
+        single, times = bench(args["workers"], args["table_mb"])
+        print(f"cores: {multiprocessing.cpu_count()}")
+        print(f"single process: {single:.2f} s")
+        for count, elapsed in times.items():
+            print(f"{count} workers: {elapsed:.2f} s, speedup {single / elapsed:.2f}")
+    else:
+        game = Connect4()
+        for column in args["moves"]:
+            game.play(column)
+        solver = ParallelSolver(args["workers"][0], args["time"], args["table_mb"])
+        try:
+            start = perf_counter()
+            score, column = solver.solve(game)
+        finally:
+            solver.close()
+        print(f"best column: {column}, score: {score}, exact: {solver.exact}")
+        print(f"{solver.nodes} nodes, {perf_counter() - start:.2f} s")
@@ -0,0 +1,353 @@
+import argparse
+import struct
+from time import time
+from typing import Union
+from game import Connect4
+
+# File layout, little endian: a header (magic, version), then the games one
+# after the other. Each game is a header (width, height, connect, result,
+# engine of each player, number of moves, start time in seconds since the
+# epoch, duration in seconds) followed by its columns, one per nibble, the
+# first move in the low nibble.
+MAGIC = b"C4GR"
+VERSION = 1
+FILE_HEADER = struct.Struct("<4sH")
+RECORD_HEADER = struct.Struct("<6BHdf")
+
+# Engines of the players, stored by their index
+ENGINES = ("human", "solver", "mcts", "random")
+
+# Result of a game that was stopped before a win or a full grid, the other
+# results are the winner, or 0 for a draw
+UNFINISHED = 3
+
+# The columns of a nibble
+MAX_WIDTH = 16
+
+
+class GameRecord:
+    """A played game: its grid, its moves, its result and who played it"""
+
+    __slots__ = (
+        "moves",
+        "width",
+        "height",
+        "connect",
+        "result",
+        "engines",
+        "start",
+        "duration",
+    )
+
+    def __init__(
+        self,
+        moves: list,
+        width: int = 7,
+        height: int = 6,
+        connect: int = 4,
+        result: int = UNFINISHED,
+        engines: tuple = ("human", "human"),
+        start: float = 0.0,
+        duration: float = 0.0,
+    ):
+        """Initialisation
+
+        :param moves: the columns played, from the first move
+        :type moves: list[int]
+        :param width: the number of columns
+        :type width: int
+        :param height: the number of rows
+        :type height: int
+        :param connect: the number of aligned tokens needed to win
+        :type connect: int
+        :param result: the winner, 0 for a draw or UNFINISHED
+        :type result: int
+        :param engines: the engine of each player, in ENGINES
+        :type engines: tuple[str, str]
+        :param start: the start of the game, in seconds since the epoch
+        :type start: float
+        :param duration: the duration of the game, in seconds
+        :type duration: float
+        """
+        self.moves = moves
+        self.width = width
+        self.height = height
+        self.connect = connect
+        self.result = result
+        self.engines = tuple(engines)
+        self.start = start
+        self.duration = duration
+
+    @classmethod
+    def from_game(
+        cls,
+        game: Connect4,
+        engines: tuple = ("human", "human"),
+        start: float = 0.0,
+        duration: float = 0.0,
+    ):
+        """Build the record of a game whose moves were made with play
+
+        :param game: the game
+        :type game: Connect4
+        :param engines: the engine of each player, in ENGINES
+        :type engines: tuple[str, str]
+        :param start: the start of the game, in seconds since the epoch
+        :type start: float
+        :param duration: the duration of the game, in seconds
+        :type duration: float
+        :return: the record
+        :rtype: GameRecord
+        """
+        result = game.get_winner()
+        if not result and any(True for _ in game.legal_moves()):
+            result = UNFINISHED
+        return cls(
+            [pos % game.stride for pos in game.moves],
+            game.width,
+            game.height,
+            game.connect,
+            result,
+            engines,
+            start,
+            duration,
+        )
+
+    def to_game(self):
+        """Replay the moves of the record
+
+        :raises ValueError: if a move is played in a full column
+        :return: the game
+        :rtype: Connect4
+        """
+        game = Connect4(width=self.width, height=self.height, connect=self.connect)
+        for column in self.moves:
+            if game.play(column) is None:
+                raise ValueError(f"column {column} is full")
+        return game
+
+    def to_text(self):
+        """Get the moves as a string of column digits, counted from 1 as in
+        the usual Connect 4 notation, such as '4453'
+
+        :raises ValueError: if the grid has more than 9 columns
+        :return: the moves
+        :rtype: str
+        """
+        if self.width > 9:
+            raise ValueError("the text form needs at most 9 columns")
+        return "".join(str(column + 1) for column in self.moves)
+
+    @classmethod
+    def from_text(cls, text: str, width: int = 7, height: int = 6, connect: int = 4):
+        """Build a record from the string given by to_text, its result is
+        found by replaying the moves
+
+        :param text: the moves
+        :type text: str
+        :param width: the number of columns
+        :type width: int
+        :param height: the number of rows
+        :type height: int
+        :param connect: the number of aligned tokens needed to win
+        :type connect: int
+        :raises ValueError: if a move is not a column of the grid or is
+                            played in a full column
+        :return: the record
+        :rtype: GameRecord
+        """
+        moves = []
+        for digit in text.strip():
+            if not digit.isdigit() or not 1 <= int(digit) <= width:
+                raise ValueError(f"{digit!r} is not a column")
+            moves.append(int(digit) - 1)
+        record = cls(moves, width, height, connect)
+        record.result = cls.from_game(record.to_game()).result
+        return record
+
+    def to_bytes(self):
+        """Encode the record, the header and then two moves per byte
+
+        :raises ValueError: if the grid is too large for the format
+        :return: the bytes
+        :rtype: bytes
+        """
+        if self.width > MAX_WIDTH or self.height > 255 or self.connect > 255:
+            raise ValueError(f"the format needs at most {MAX_WIDTH} columns")
+        header = RECORD_HEADER.pack(
+            self.width,
+            self.height,
+            self.connect,
+            self.result,
+            ENGINES.index(self.engines[0]),
+            ENGINES.index(self.engines[1]),
+            len(self.moves),
+            self.start,
+            self.duration,
+        )
+        moves = bytearray((len(self.moves) + 1) // 2)
+        for index, column in enumerate(self.moves):
+            moves[index >> 1] |= column << (4 * (index & 1))
+        return header + moves
+
+
+def unpack_moves(data: bytes, count: int):
+    """Decode the moves of a record
+
+    :param data: the moves, two per byte
+    :type data: bytes
+    :param count: the number of moves
+    :type count: int
+    :return: the columns
+    :rtype: list[int]
+    """
+    moves = []
+    for byte in data:
+        moves.append(byte & 0x0F)
+        moves.append(byte >> 4)
+    del moves[count:]
+    return moves
+
+
+class RecordWriter:
+    """Append games to an archive, one at a time, so that the archive is
+    never loaded"""
+
+    def __init__(self, path: str):
+        """Initialisation, the archive is created if it does not exist
+
+        :param path: the path of the archive
+        :type path: str
+        """
+        self.file = open(path, "ab")
+        if self.file.tell() == 0:
+            self.file.write(FILE_HEADER.pack(MAGIC, VERSION))
+
+    def write(self, record: GameRecord):
+        """Append a game
+
+        :param record: the game
+        :type record: GameRecord
+        """
+        self.file.write(record.to_bytes())
+
+    def flush(self):
+        """Write the buffered games in the file"""
+        self.file.flush()
+
+    def close(self):
+        """Close the archive"""
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+def read_records(path: str):
+    """Iterate over the games of an archive, reading one game at a time
+
+    :param path: the path of the archive
+    :type path: str
+    :raises ValueError: if the file is not an archive or is truncated
+    :return: the games
+    :rtype: Iterator[GameRecord]
+    """
+    with open(path, "rb") as file:
+        data = file.read(FILE_HEADER.size)
+        if len(data) < FILE_HEADER.size or FILE_HEADER.unpack(data) != (
+            MAGIC,
+            VERSION,
+        ):
+            raise ValueError(f"{path} is not a game archive")
+        while True:
+            data = file.read(RECORD_HEADER.size)
+            if not data:
+                return
+            if len(data) < RECORD_HEADER.size:
+                raise ValueError(f"{path} is truncated")
+            (
+                width,
+                height,
+                connect,
+                result,
+                engine1,
+                engine2,
+                count,
+                start,
+                duration,
+            ) = RECORD_HEADER.unpack(data)
+            size = (count + 1) // 2
+            data = file.read(size)
+            if len(data) < size:
+                raise ValueError(f"{path} is truncated")
+            yield GameRecord(
+                unpack_moves(data, count),
+                width,
+                height,
+                connect,
+                result,
+                (ENGINES[engine1], ENGINES[engine2]),
+                start,
+                duration,
+            )
+
+
+def append_game(
+    path: str,
+    game: Connect4,
+    engines: tuple = ("human", "human"),
+    start: Union[None, float] = None,
+):
+    """Append a game played with play to an archive
+
+    :param path: the path of the archive
+    :type path: str
+    :param game: the game
+    :type game: Connect4
+    :param engines: the engine of each player, in ENGINES
+    :type engines: tuple[str, str]
+    :param start: the start of the game, in seconds since the epoch,
+                  defaults to None means unknown
+    :type start: Union[None, float], optional
+    """
+    duration = 0.0 if start is None else time() - start
+    record = GameRecord.from_game(game, engines, start or 0.0, duration)
+    with RecordWriter(path) as writer:
+        writer.write(record)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Connect 4 game archives")
+    parser.add_argument("archive", help="The path of the archive")
+    parser.add_argument(
+        "--text",
+        action="store_true",
+        help="Prints each game: engines, result and moves as column digits",
+    )
+    parser.add_argument(
+        "--add",
+        nargs="+",
+        default=None,
+        metavar="MOVES",
+        help="Appends games given as column digits, such as 4453",
+    )
+    args = vars(parser.parse_args())
+    if args["add"]:
+        with RecordWriter(args["archive"]) as writer:
+            for text in args["add"]:
+                writer.write(GameRecord.from_text(text))
+    results = {0: 0, 1: 0, 2: 0, UNFINISHED: 0}
+    count = 0
+    for record in read_records(args["archive"]):
+        count += 1
+        results[record.result] += 1
+        if args["text"]:
+            moves = record.to_text() if record.width <= 9 else record.moves
+            print(f"{record.engines[0]} {record.engines[1]} {record.result}", moves)
+    print(
+        f"{count} games: {results[1]} won by player 1, {results[2]} by player 2, "
+        f"{results[0]} draws, {results[UNFINISHED]} unfinished"
+    )
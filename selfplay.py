@@ -0,0 +1,284 @@
+import argparse
+import json
+import os
+import random
+import sys
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from contextlib import nullcontext
+from time import perf_counter, time
+from game import Connect4
+from solver import Solver
+
+ENGINES = {"solver", "mcts", "random"}
+
+
+def play_game(
+    index: int,
+    seed: int,
+    opening: int,
+    engines: tuple,
+    max_time: float,
+    table_mb: float,
+    size: tuple = (7, 6, 4),
+):
+    """Play a whole game between two engines
+
+    :param index: the number of the game
+    :type index: int
+    :param seed: the seed of the random opening and of the random engine
+    :type seed: int
+    :param opening: the number of random moves at the beginning of the game
+    :type opening: int
+    :param engines: the engine of each player, 'solver', 'mcts' or 'random'
+    :type engines: tuple[str, str]
+    :param max_time: the time of the solver or mcts for each move, in seconds
+    :type max_time: float
+    :param table_mb: the memory of the solver transposition table, in MB
+    :type table_mb: float
+    :param size: the width and height of the grid, and the number of aligned
+                 tokens needed to win
+    :type size: tuple[int, int, int]
+    :return: the result of the game
+    :rtype: dict
+    """
+    rng = random.Random(seed)
+    game = Connect4(width=size[0], height=size[1], connect=size[2])
+    solvers = {}
+    for player, engine in enumerate(engines, 1):
+        if engine == "solver":
+            solvers[player] = Solver(
+                max_time=max_time, table_mb=table_mb, geometry=game.geometry
+            )
+        elif engine == "mcts":
+            from mcts import MCTS
+
+            solvers[player] = MCTS(
+                max_time=max_time, seed=seed + player, geometry=game.geometry
+            )
+    moves = []
+    winner = 0
+    started = time()
+    start = perf_counter()
+    while not winner:
+        columns = list(game.legal_moves())
+        if not columns:
+            break
+        player = game.get_player()
+        if len(moves) < opening or player not in solvers:
+            column = rng.choice(columns)
+        else:
+            column = solvers[player].solve(game)[1]
+        pos = game.add_token(column, player)
+        moves.append(column)
+        if game.is_win(pos):
+            winner = player
+        game.add_turn()
+    return {
+        "game": index,
+        "seed": seed,
+        "engines": list(engines),
+        "size": list(size),
+        "opening": moves[:opening],
+        "moves": moves,
+        "winner": winner,
+        "start": started,
+        "duration": perf_counter() - start,
+        "player1": sorted(game.player1),
+        "player2": sorted(game.player2),
+    }
+
+
+def print_game(result: dict):
+    """Print the final grid of a game with the text display
+
+    :param result: the result of the game
+    :type result: dict
+    """
+    from main import Game
+
+    width, height, connect = result.get("size", (7, 6, 4))
+    game = Game("text", width=width, height=height, connect=connect)
+    game.player1 = set(result["player1"])
+    game.player2 = set(result["player2"])
+    print(f"game {result['game']}, winner: {result['winner']}", end="")
+    print(game)
+
+
+def run(
+    output: str,
+    games: int,
+    engines: tuple,
+    max_time: float,
+    seed: int,
+    opening: int,
+    workers: int = None,
+    table_mb: float = 16,
+    spot_check: int = 0,
+    size: tuple = (7, 6, 4),
+    records: str = None,
+):
+    """Play games in parallel and write their results as they finish, one
+    JSON object per line
+
+    :param output: the path of the results file
+    :type output: str
+    :param games: the number of games
+    :type games: int
+    :param engines: the engine of each player, swapped every other game
+    :type engines: tuple[str, str]
+    :param max_time: the time of the solver for each move, in seconds
+    :type max_time: float
+    :param seed: the seed of the first game, game n uses seed + n
+    :type seed: int
+    :param opening: the number of random moves at the beginning of each game
+    :type opening: int
+    :param workers: the number of processes, defaults to None means one per
+                    core
+    :type workers: int, optional
+    :param table_mb: the memory of each transposition table, in MB
+    :type table_mb: float
+    :param spot_check: print the grid of every n-th game, defaults to 0
+                       means never
+    :type spot_check: int, optional
+    :param size: the width and height of the grid, and the number of aligned
+                 tokens needed to win, defaults to the standard grid
+    :type size: tuple[int, int, int], optional
+    :param records: also appends the games to this binary archive, see
+                    records.py, defaults to None
+    :type records: str, optional
+    :return: the number of wins of each engine and of draws
+    :rtype: dict
+    """
+    score = {engines[0]: 0, engines[1]: 0, "draw": 0}
+    if engines[0] == engines[1]:
+        score = {"player1": 0, "player2": 0, "draw": 0}
+    with ProcessPoolExecutor(max_workers=workers or os.cpu_count()) as pool:
+        futures = []
+        for index in range(games):
+            game_engines = engines if index % 2 == 0 else engines[::-1]
+            futures.append(
+                pool.submit(
+                    play_game,
+                    index,
+                    seed + index,
+                    opening,
+                    game_engines,
+                    max_time,
+                    table_mb,
+                    size,
+                )
+            )
+        if records is None:
+            archive = nullcontext()
+        else:
+            from records import GameRecord, RecordWriter
+
+            archive = RecordWriter(records)
+        with open(output, "a") as file, archive as writer:
+            for future in as_completed(futures):
+                result = future.result()
+                file.write(json.dumps(result) + "\n")
+                file.flush()
+                if writer is not None:
+                    writer.write(
+                        GameRecord(
+                            result["moves"],
+                            *size,
+                            result["winner"],
+                            result["engines"],
+                            result["start"],
+                            result["duration"],
+                        )
+                    )
+                if result["winner"] == 0:
+                    score["draw"] += 1
+                elif engines[0] == engines[1]:
+                    score[f"player{result['winner']}"] += 1
+                else:
+                    score[result["engines"][result["winner"] - 1]] += 1
+                if spot_check and result["game"] % spot_check == 0:
+                    print_game(result)
+    return score
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Connect 4 self-play")
+    parser.add_argument("output", help="The JSONL file where results are added")
+    parser.add_argument(
+        "--games", "-n", type=int, default=100, help="The number of games"
+    )
+    parser.add_argument(
+        "--engines",
+        nargs=2,
+        choices=ENGINES,
+        default=["solver", "solver"],
+        help="The two engines, they swap colors every other game",
+    )
+    parser.add_argument(
+        "--time",
+        type=float,
+        default=0.1,
+        help="The time in seconds the solver or mcts can think for each move",
+    )
+    parser.add_argument(
+        "--seed", type=int, default=0, help="The seed of the first game"
+    )
+    parser.add_argument(
+        "--opening",
+        type=int,
+        default=4,
+        help="The number of random moves at the beginning of each game",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=None,
+        help="The number of processes, one per core by default",
+    )
+    parser.add_argument(
+        "--table-mb",
+        type=float,
+        default=16,
+        help="The memory of each transposition table, in MB",
+    )
+    parser.add_argument(
+        "--size",
+        type=int,
+        nargs=3,
+        default=[7, 6, 4],
+        metavar=("WIDTH", "HEIGHT", "CONNECT"),
+        help="The grid and the number of aligned tokens needed to win",
+    )
+    parser.add_argument(
+        "--records",
+        default=None,
+        help="Also appends the games to this binary archive, see records.py",
+    )
+    parser.add_argument(
+        "--display",
+        "-d",
+        choices={"none", "text"},
+        default="none",
+        help="Prints some final grids with the text display",
+    )
+    parser.add_argument(
+        "--spot-check",
+        type=int,
+        default=10,
+        help="With --display text, prints the grid of every n-th game",
+    )
+    args = vars(parser.parse_args())
+    score = run(
+        args["output"],
+        args["games"],
+        tuple(args["engines"]),
+        args["time"],
+        args["seed"],
+        args["opening"],
+        args["workers"],
+        args["table_mb"],
+        args["spot_check"] if args["display"] == "text" else 0,
+        tuple(args["size"]),
+        args["records"],
+    )
+    print(json.dumps(score), file=sys.stderr)
@@ -0,0 +1,566 @@
+from time import perf_counter
+from typing import Callable, Union
+from bitboard import BitboardConnect4, canonical_key
+from game import Geometry, get_geometry
+from transposition import TranspositionTable, EXACT, LOWER, UPPER
+
+# The standard grid, and its tables used by the opening book and the
+# parallel search
+STANDARD = get_geometry()
+SIZE = STANDARD.size
+MOVE_ORDER = STANDARD.move_order
+BOTTOM = STANDARD.bottom
+TOP = STANDARD.top
+
+# Number of nodes between two checks of the time budget
+CHECK_INTERVAL = 4096
+
+# Remaining depth above which the moves are sorted by the threats they make
+ORDERING_DEPTH = 5
+
+
+class SearchTimeout(Exception):
+    pass
+
+
+def to_bitboards(game: object, geometry: Geometry = STANDARD):
+    """Get the bitboards of a position, from the point of view of the player
+    who has to play
+
+    :param game: the position
+    :type game: Connect4 or BitboardConnect4
+    :param geometry: the grid expected by the engine, defaults to STANDARD
+    :type geometry: Geometry, optional
+    :raises ValueError: if the position is not on this grid
+    :return: the tokens of the player who has to play, the tokens of both
+             players, and the number of tokens
+    :rtype: tuple[int, int, int]
+    """
+    grid = STANDARD if isinstance(game, BitboardConnect4) else game.geometry
+    if grid is not geometry:
+        raise ValueError(
+            f"the engine plays on the {geometry.width}x{geometry.height} grid"
+            f" with {geometry.connect} tokens to align"
+        )
+    if isinstance(game, BitboardConnect4):
+        current = game.get_player_bits(game.get_player())
+        mask = game.bits1 | game.bits2
+    else:
+        current = game.bits[game.get_player()]
+        mask = game.bits[1] | game.bits[2]
+    return current, mask, mask.bit_count()
+
+
+def is_winning_move(
+    current: int, mask: int, column: int, geometry: Geometry = STANDARD
+):
+    """Tells if playing in a column makes the player align enough tokens
+
+    :param current: the tokens of the player who has to play
+    :type current: int
+    :param mask: the tokens of both players
+    :type mask: int
+    :param column: the column to play
+    :type column: int
+    :param geometry: the grid, defaults to STANDARD
+    :type geometry: Geometry, optional
+    :return: True if the move wins, else False
+    :rtype: bool
+    """
+    bits = current | ((mask + geometry.bottom[column]) & geometry.column_mask[column])
+    for shifts in geometry.alignment_shifts:
+        runs = bits
+        for shift in shifts:
+            runs &= runs >> shift
+        if runs:
+            return True
+    return False
+
+
+def get_winning_cells(current: int, mask: int, geometry: Geometry = STANDARD):
+    """Get the empty cells where a token of the player would complete an
+    alignment, whether they can be played now or not
+
+    :param current: the tokens of the player
+    :type current: int
+    :param mask: the tokens of both players
+    :type mask: int
+    :param geometry: the grid, defaults to STANDARD
+    :type geometry: Geometry, optional
+    :return: the bitboard of the cells
+    :rtype: int
+    """
+    cells = 0
+    last = geometry.connect - 1
+    for shifts in geometry.line_shifts:
+        # the cells followed, or preceded, by count tokens of the player in
+        # the direction, for each count
+        after = [-1]
+        before = [-1]
+        for shift in shifts:
+            after.append(after[-1] & (current >> shift))
+            before.append(before[-1] & (current << shift))
+        for count in range(geometry.connect):
+            cells |= after[count] & before[last - count]
+    return cells & (geometry.board_mask ^ mask)
+
+
+def get_four_winning_cells(current: int, mask: int, geometry: Geometry = STANDARD):
+    """get_winning_cells for grids where four tokens are aligned, the
+    alignments through each cell are written out, which is faster
+
+    :param current: the tokens of the player
+    :type current: int
+    :param mask: the tokens of both players
+    :type mask: int
+    :param geometry: the grid, defaults to STANDARD
+    :type geometry: Geometry, optional
+    :return: the bitboard of the cells
+    :rtype: int
+    """
+    up = geometry.column_bits
+    # vertical, three tokens below the cell
+    cells = (current << 1) & (current << 2) & (current << 3)
+    for shift in (up, up - 1, up + 1):
+        pairs = (current << shift) & (current << (2 * shift))
+        cells |= pairs & (current << (3 * shift))
+        cells |= pairs & (current >> shift)
+        pairs = (current >> shift) & (current >> (2 * shift))
+        cells |= pairs & (current << shift)
+        cells |= pairs & (current >> (3 * shift))
+    return cells & (geometry.board_mask ^ mask)
+
+
+class Solver:
+    """Negamax solver with alpha-beta pruning and iterative deepening
+
+    A score is positive if the player who has to play wins, negative if he
+    loses and 0 for a draw (or an unknown result when the search was stopped
+    by its budget). A win with the n-th token of the player is worth
+    (size + 3) // 2 - n, where size is the number of cells of the grid (22 - n
+    on the 7x6 grid), so faster wins get higher scores.
+
+    An end game is solved at once, but a position of the 7x6 grid with 11 to
+    14 tokens can take from 1 to about 15 seconds and an earlier one much
+    longer, so interactive uses give a max_time and play the best move found
+    in time.
+    """
+
+    def __init__(
+        self,
+        max_time: Union[None, float] = None,
+        max_nodes: Union[None, int] = None,
+        table_mb: float = 16,
+        book: object = None,
+        table: Union[None, TranspositionTable] = None,
+        move_order: Union[None, list] = None,
+        stop: object = None,
+        geometry: Geometry = STANDARD,
+    ):
+        """Initialisation
+
+        :param max_time: the maximum time of a search in seconds, defaults to
+                         None means no limit
+        :type max_time: Union[None, float], optional
+        :param max_nodes: the maximum number of nodes of a search, defaults
+                          to None means no limit
+        :type max_nodes: Union[None, int], optional
+        :param table_mb: the memory of the transposition table, in MB
+        :type table_mb: float
+        :param book: the opening book, defaults to None
+        :type book: Union[None, OpeningBook], optional
+        :param table: the transposition table, which can be shared with
+                      other solvers, defaults to None means a new table of
+                      table_mb MB
+        :type table: Union[None, TranspositionTable], optional
+        :param move_order: the order of the columns tried by the search,
+                           defaults to None means the move order of the
+                           grid, from the center to the edges
+        :type move_order: Union[None, list], optional
+        :param stop: an event, from threading or multiprocessing, whose
+                     setting stops the searches, defaults to None
+        :type stop: Union[None, threading.Event], optional
+        :param geometry: the grid of the positions, defaults to STANDARD
+        :type geometry: Geometry, optional
+        :raises ValueError: if an opening book is given for another grid than
+                            the standard one
+        """
+        if book is not None and geometry is not STANDARD:
+            raise ValueError("the opening book only knows the 7x6 grid")
+        self.geometry = geometry
+        if geometry.connect == 4:
+            self.get_winning_cells = get_four_winning_cells
+        else:
+            self.get_winning_cells = get_winning_cells
+        # bottom cell of the column played in the mirror image, by column
+        self.mirror_bottom = geometry.bottom[::-1]
+        self.max_time = max_time
+        self.max_nodes = max_nodes
+        if table is None:
+            table = TranspositionTable(
+                table_mb, width=geometry.width, height=geometry.height
+            )
+        self.table = table
+        if move_order is None:
+            move_order = geometry.move_order
+        self.move_order = move_order
+        self.stop = stop
+        self.book = book
+        self.nodes = 0
+        self.depth = 0
+        self.exact = False
+        self.deadline = None
+        self.next_check = CHECK_INTERVAL
+        self.horizon = False
+        # set when a score comes from further than the depth of the search,
+        # from the book or from an entry of a deeper search
+        self.beyond = False
+        self.cancelled = False
+
+    def cancel(self):
+        """Stop the running search, it can be called from another thread.
+        The searches are stopped until cancelled is set back to False."""
+        self.cancelled = True
+
+    def check_budget(self):
+        """Stop the search if its budget is exhausted"""
+        self.next_check = self.nodes + CHECK_INTERVAL
+        if self.cancelled or (self.stop is not None and self.stop.is_set()):
+            raise SearchTimeout
+        if self.max_nodes is not None and self.nodes >= self.max_nodes:
+            raise SearchTimeout
+        if self.deadline is not None and perf_counter() >= self.deadline:
+            raise SearchTimeout
+
+    def negamax(
+        self,
+        current: int,
+        mask: int,
+        mirror_current: int,
+        mirror_mask: int,
+        moves: int,
+        alpha: int,
+        beta: int,
+        depth: int,
+    ):
+        """Evaluate a position
+
+        :param current: the tokens of the player who has to play
+        :type current: int
+        :param mask: the tokens of both players
+        :type mask: int
+        :param mirror_current: the mirror image of current
+        :type mirror_current: int
+        :param mirror_mask: the mirror image of mask
+        :type mirror_mask: int
+        :param moves: the number of tokens on the board
+        :type moves: int
+        :param alpha: the lower bound of the search window
+        :type alpha: int
+        :param beta: the upper bound of the search window
+        :type beta: int
+        :param depth: the remaining depth
+        :type depth: int
+        :return: the score of the position
+        :rtype: int
+        """
+        self.nodes += 1
+        if self.nodes >= self.next_check:
+            self.check_budget()
+        geometry = self.geometry
+        size = geometry.size
+        if moves == size:
+            return 0
+        # the cells where a token can be played
+        possible = (mask + geometry.bottom_row) & geometry.board_mask
+        get_winning_cells = self.get_winning_cells
+        if get_winning_cells(current, mask, geometry) & possible:
+            return (size + 1 - moves) // 2
+        if self.book is not None and moves <= self.book.depth:
+            score = self.book.get(current, mask, mirror_current, mirror_mask)
+            if score is not None:
+                # a win or a loss whose last token is played within the depth
+                # is the score the search would find, a draw or a later end
+                # is beyond its horizon
+                if score == 0 or size + 1 - 2 * abs(score) > moves + depth:
+                    self.beyond = True
+                return score
+        if depth == 0:
+            self.horizon = True
+            return 0
+        opponent = current ^ mask
+        threats = get_winning_cells(opponent, mask, geometry)
+        forced = possible & threats
+        if forced:
+            if forced & (forced - 1):
+                # the opponent wins with the threat that is not blocked
+                return -((size - moves) // 2)
+            possible = forced
+        # a token played below a threat lets the opponent win on it
+        possible &= ~(threats >> 1)
+        if not possible:
+            return -((size - moves) // 2)
+        # the opponent cannot win with his next token
+        lower = -((size - 2 - moves) // 2)
+        if alpha < lower:
+            alpha = lower
+            if alpha >= beta:
+                return alpha
+        upper = (size - 1 - moves) // 2
+        if beta > upper:
+            beta = upper
+            if alpha >= beta:
+                return beta
+        # a search deeper than the number of empty cells is a complete one
+        depth = min(depth, size - moves)
+        # a position and its mirror image have the same score, they share
+        # their entry
+        key = canonical_key(current, mask, mirror_current, mirror_mask)[0]
+        entry = self.table.get(key)
+        if entry is not None and entry[2] >= depth:
+            score, flag, entry_depth = entry
+            if entry_depth < size - moves:
+                # the stored search stopped before the end of the game too
+                self.horizon = True
+            if entry_depth > depth:
+                self.beyond = True
+            if flag == EXACT:
+                return score
+            if flag == LOWER and score > alpha:
+                alpha = score
+            elif flag == UPPER and score < beta:
+                beta = score
+            if alpha >= beta:
+                return score
+        alpha_init = alpha
+        mirror_opponent = mirror_current ^ mirror_mask
+        mirror_bottom = self.mirror_bottom
+        # the moves that make the most threats first, the ties in the order
+        # of move_order; close to the horizon counting the threats costs more
+        # than the nodes it saves
+        column_mask = geometry.column_mask
+        children = [
+            column for column in self.move_order if possible & column_mask[column]
+        ]
+        if depth > ORDERING_DEPTH:
+            threat_counts = {}
+            for column in children:
+                move = possible & column_mask[column]
+                threat_counts[column] = get_winning_cells(
+                    current | move, mask | move, geometry
+                ).bit_count()
+            children.sort(key=threat_counts.__getitem__, reverse=True)
+        for column in children:
+            move = possible & column_mask[column]
+            child_mask = mask | move
+            mirror_child = mirror_mask | (mirror_mask + mirror_bottom[column])
+            score = -self.negamax(
+                opponent,
+                child_mask,
+                mirror_opponent,
+                mirror_child,
+                moves + 1,
+                -beta,
+                -alpha,
+                depth - 1,
+            )
+            if score >= beta:
+                self.table.put(key, score, LOWER, depth)
+                return score
+            if score > alpha:
+                alpha = score
+        self.table.put(key, alpha, UPPER if alpha <= alpha_init else EXACT, depth)
+        return alpha
+
+    def search_root(
+        self,
+        current: int,
+        mask: int,
+        moves: int,
+        depth: int,
+        order: list,
+        alpha: Union[None, int] = None,
+        beta: Union[None, int] = None,
+    ):
+        """Evaluate every move of a position, the search stops at the first
+        move whose score reaches beta
+
+        :param current: the tokens of the player who has to play
+        :type current: int
+        :param mask: the tokens of both players
+        :type mask: int
+        :param moves: the number of tokens on the board
+        :type moves: int
+        :param depth: the search depth
+        :type depth: int
+        :param order: the columns in the order they are searched
+        :type order: list[int]
+        :param alpha: the lower bound of the search window, defaults to None
+                      means the lowest score
+        :type alpha: Union[None, int], optional
+        :param beta: the upper bound of the search window, defaults to None
+                     means the highest score
+        :type beta: Union[None, int], optional
+        :return: the score of the position and the best column, the score is
+                 a bound when it is out of the window
+        :rtype: tuple[int, int]
+        """
+        geometry = self.geometry
+        size = geometry.size
+        if alpha is None:
+            alpha = -size // 2
+        if beta is None:
+            beta = size // 2
+        best = None
+        opponent = current ^ mask
+        mirror_mask = geometry.mirror_bits(mask)
+        mirror_opponent = geometry.mirror_bits(opponent)
+        for column in order:
+            if mask & geometry.top[column]:
+                continue
+            if is_winning_move(current, mask, column, geometry):
+                return (size + 1 - moves) // 2, column
+            child_mask = mask | (mask + geometry.bottom[column])
+            mirror_child = mirror_mask | (mirror_mask + self.mirror_bottom[column])
+            score = -self.negamax(
+                opponent,
+                child_mask,
+                mirror_opponent,
+                mirror_child,
+                moves + 1,
+                -beta,
+                -alpha,
+                depth - 1,
+            )
+            if best is None or score > alpha:
+                alpha = score
+                best = column
+            if score >= beta:
+                break
+        return alpha, best
+
+    def solve(self, game: object):
+        """Search the best move of a position
+
+        :param game: the position, it is not modified
+        :type game: Connect4 or BitboardConnect4
+        :return: the score of the position and the best column, the column is
+                 None if the grid is full
+        :rtype: tuple[int, Union[int, None]]
+        """
+        return self.search(*to_bitboards(game, self.geometry))
+
+    def search(self, current: int, mask: int, moves: int):
+        """Search the best move of a position given by its bitboards
+
+        :param current: the tokens of the player who has to play
+        :type current: int
+        :param mask: the tokens of both players
+        :type mask: int
+        :param moves: the number of tokens on the board
+        :type moves: int
+        :return: the score of the position and the best column, the column is
+                 None if the grid is full
+        :rtype: tuple[int, Union[int, None]]
+        """
+        self.nodes = 0
+        self.next_check = CHECK_INTERVAL
+        self.depth = 0
+        self.exact = False
+        self.deadline = None
+        if self.max_time is not None:
+            self.deadline = perf_counter() + self.max_time
+        top = self.geometry.top
+        order = [column for column in self.move_order if not mask & top[column]]
+        if not order:
+            self.exact = True
+            return 0, None
+        result = 0, order[0]
+        for depth in range(1, self.geometry.size - moves + 1):
+            self.horizon = False
+            self.beyond = False
+            try:
+                # the scores beyond the horizon are 0, a window around 0
+                # tells quickly whether a win or a loss is found, its score
+                # is then searched with the whole window
+                score, column = self.search_root(
+                    current, mask, moves, depth, order, -1, 1
+                )
+                if score != 0:
+                    result = score, column
+                    score, column = self.search_root(current, mask, moves, depth, order)
+            except SearchTimeout:
+                break
+            result = score, column
+            self.depth = depth
+            # a win or a loss found within the depth is the fastest one, but
+            # a score found beyond it may hide a faster win past the horizon
+            if not self.horizon or (score != 0 and not self.beyond):
+                self.exact = True
+                break
+            order.remove(column)
+            order.insert(0, column)
+        return result
+
+    def analyse(self, game: object, report: Union[None, Callable] = None):
+        """Evaluate every move of a position, with iterative deepening
+
+        :param game: the position, it is not modified
+        :type game: Connect4 or BitboardConnect4
+        :param report: the function called after each depth with the depth,
+                       the scores and whether they are exact, defaults to
+                       None
+        :type report: Union[None, Callable], optional
+        :return: the score of each column that is not full, from the point of
+                 view of the player who has to play
+        :rtype: dict[int, int]
+        """
+        geometry = self.geometry
+        size = geometry.size
+        current, mask, moves = to_bitboards(game, geometry)
+        self.nodes = 0
+        self.next_check = CHECK_INTERVAL
+        self.depth = 0
+        self.exact = False
+        self.deadline = None
+        if self.max_time is not None:
+            self.deadline = perf_counter() + self.max_time
+        columns = [
+            column for column in geometry.move_order if not mask & geometry.top[column]
+        ]
+        scores = {}
+        opponent = current ^ mask
+        mirror_mask = geometry.mirror_bits(mask)
+        mirror_opponent = geometry.mirror_bits(opponent)
+        for depth in range(1, size - moves + 1):
+            self.horizon = False
+            depth_scores = {}
+            try:
+                for column in columns:
+                    if is_winning_move(current, mask, column, geometry):
+                        depth_scores[column] = (size + 1 - moves) // 2
+                        continue
+                    child_mask = mask | (mask + geometry.bottom[column])
+                    mirror_child = mirror_mask | (
+                        mirror_mask + self.mirror_bottom[column]
+                    )
+                    depth_scores[column] = -self.negamax(
+                        opponent,
+                        child_mask,
+                        mirror_opponent,
+                        mirror_child,
+                        moves + 1,
+                        -size // 2,
+                        size // 2,
+                        depth - 1,
+                    )
+            except SearchTimeout:
+                break
+            scores = depth_scores
+            self.depth = depth
+            self.exact = not self.horizon
+            if report is not None:
+                report(depth, scores, self.exact)
+            if self.exact:
+                break
+        return scores
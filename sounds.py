@@ -0,0 +1,49 @@
+import io
+import math
+import sys
+import wave
+from array import array
+
+# Sample rate of the synthesized sounds, in samples per second
+RATE = 22050
+
+# Notes of the sounds played by the game: (frequencies in Hz, duration of
+# each note in seconds)
+DROP_SOUND = ((140, 90), 0.05)
+WIN_SOUND = ((523, 659, 784, 1047), 0.12)
+
+
+def tone(frequencies: tuple, duration: float, volume: float = 0.5, rate: int = RATE):
+    """Synthesize notes played one after the other, each one fading out, so
+    the game does not need sound files
+
+    :param frequencies: the frequency of each note, in Hz
+    :type frequencies: tuple[float]
+    :param duration: the duration of each note, in seconds
+    :type duration: float
+    :param volume: the volume between 0 and 1, defaults to 0.5
+    :type volume: float, optional
+    :param rate: the number of samples per second, defaults to RATE
+    :type rate: int, optional
+    :return: a WAV file in memory
+    :rtype: io.BytesIO
+    """
+    length = int(duration * rate)
+    samples = array("h")
+    for frequency in frequencies:
+        step = 2 * math.pi * frequency / rate
+        samples.extend(
+            int(32767 * volume * (1 - i / length) * math.sin(step * i))
+            for i in range(length)
+        )
+    if sys.byteorder != "little":
+        # the samples of a WAV file are little endian
+        samples.byteswap()
+    file = io.BytesIO()
+    with wave.open(file, "wb") as output:
+        output.setnchannels(1)
+        output.setsampwidth(2)
+        output.setframerate(rate)
+        output.writeframes(samples.tobytes())
+    file.seek(0)
+    return file
@@ -0,0 +1,42 @@
+from game import Connect4, get_geometry
+from solver import Solver
+
+
+def get_position(moves: list, width: int = 7, height: int = 6, connect: int = 4):
+    """Play columns from the empty grid
+
+    :param moves: the columns played
+    :type moves: list[int]
+    :param width: the number of columns
+    :type width: int
+    :param height: the number of rows
+    :type height: int
+    :param connect: the number of aligned tokens needed to win
+    :type connect: int
+    :return: the position
+    :rtype: Connect4
+    """
+    game = Connect4(width=width, height=height, connect=connect)
+    for column in moves:
+        game.play(column)
+    return game
+
+
+def test_reused_solver_small_grid():
+    """The entries of a previous search do not stop a search too early"""
+    geometry = get_geometry(4, 4, 3)
+    solver = Solver(geometry=geometry)
+    solver.solve(get_position([0], 4, 4, 3))
+    position = get_position([2, 0], 4, 4, 3)
+    score = solver.solve(position)[0]
+    assert solver.exact
+    assert score == Solver(geometry=geometry).solve(position)[0] == 4
+
+
+def test_reused_solver_standard_grid():
+    """A solver reused along a game scores as a new one"""
+    moves = [1, 2, 4, 2, 4, 2, 6, 1, 2, 2, 2, 6, 6, 4, 0, 5, 3, 6, 5]
+    solver = Solver()
+    solver.solve(get_position(moves[:-1]))
+    position = get_position(moves)
+    assert solver.solve(position)[0] == Solver().solve(position)[0] == 10
@@ -0,0 +1,10 @@
+from transposition import TranspositionTable, EXACT
+
+
+def test_empty_slot_is_not_the_empty_board():
+    """The key 0 of the empty grid is not found in an empty slot"""
+    table = TranspositionTable(1)
+    assert table.get(0) is None
+    assert table.hits == 0
+    table.put(0, 3, EXACT, 5)
+    assert table.get(0) == (3, EXACT, 5)
@@ -0,0 +1,195 @@
+from array import array
+from typing import Union
+from bitboard import WIDTH, HEIGHT
+
+EXACT = 1
+LOWER = 2
+UPPER = 3
+
+# Layout of an entry in a 64 bits word, from the low bits: the score
+# (shifted to be positive), the flag on 2 bits, the depth and the key. The
+# score and the depth take the bits needed by the grid, on the 7x6 grid
+# bits 0-5 the score, bits 6-7 the flag, bits 8-14 the depth and bits 15-63
+# the key. An empty slot is 0.
+ENTRY_SIZE = 8
+
+# Keys of close positions share their low bits, they are mixed with a
+# multiplicative hash and the high bits of the product choose the bucket
+HASH_MULTIPLIER = 0x9E3779B97F4A7C15
+HASH_MASK = (1 << 64) - 1
+
+
+class TranspositionTable:
+    """Fixed size table of already evaluated positions
+
+    Each bucket has two slots: the first one keeps the deepest search, the
+    second one always keeps the latest search.
+
+    The entries can be kept in a given buffer, such as shared memory, so
+    that several processes use the same table. An entry is a single word
+    holding its key, so it is read and written at once and the processes
+    need no lock: a reader sees either the old or the new entry.
+    """
+
+    def __init__(
+        self,
+        size_mb: float = 16,
+        buffer: object = None,
+        width: int = WIDTH,
+        height: int = HEIGHT,
+    ):
+        """Initialisation
+
+        :param size_mb: the memory used by the table, in MB, ignored when a
+                        buffer is given
+        :type size_mb: float
+        :param buffer: the memory of the entries, filled with zeros, its
+                       size must be a multiple of 16 bytes, defaults to None
+                       means a new array
+        :type buffer: Union[None, memoryview, bytearray], optional
+        :param width: the number of columns of the positions
+        :type width: int
+        :param height: the number of rows of the positions
+        :type height: int
+        """
+        # the scores go from -cells // 2 to (cells + 1) // 2 and the depths up
+        # to cells
+        cells = width * height
+        score_bits = max(6, (cells + 1).bit_length())
+        self.score_offset = 1 << (score_bits - 1)
+        self.score_mask = (1 << score_bits) - 1
+        self.depth_shift = score_bits + 2
+        self.max_depth = (1 << max(7, cells.bit_length())) - 1
+        self.key_shift = self.depth_shift + self.max_depth.bit_length()
+        # the keys of larger grids do not fit in the rest of the word, they
+        # are replaced by a hash, see fold_key
+        self.key_bits = 64 - self.key_shift
+        if buffer is None:
+            self.buckets = max(1, int(size_mb * 1024 * 1024) // (2 * ENTRY_SIZE))
+            self.entries = array("Q", [0]) * (2 * self.buckets)
+        else:
+            self.entries = memoryview(buffer).cast("B").cast("Q")
+            self.buckets = len(self.entries) // 2
+        self.hits = 0
+        self.misses = 0
+        self.collisions = 0
+        self.stores = 0
+
+    def get_size(self):
+        """Get the memory used by the entries
+
+        :return: the size in bytes
+        :rtype: int
+        """
+        return len(self.entries) * ENTRY_SIZE
+
+    def clear(self):
+        """Remove all entries and reset the statistics"""
+        self.entries[:] = array("Q", [0]) * len(self.entries)
+        self.hits = 0
+        self.misses = 0
+        self.collisions = 0
+        self.stores = 0
+
+    def get_index(self, key: int):
+        """Get the index of the first slot of the bucket of a key
+
+        :param key: the key of the position
+        :type key: int
+        :return: the index
+        :rtype: int
+        """
+        return 2 * ((((key * HASH_MULTIPLIER) & HASH_MASK) >> 20) % self.buckets)
+
+    def fold_key(self, key: int):
+        """Reduce a key too large for an entry to a hash of key_bits bits.
+        Two positions can then share their entry, but it is as unlikely as
+        a collision of two random keys of key_bits bits.
+
+        :param key: the key of the position
+        :type key: int
+        :return: the reduced key
+        :rtype: int
+        """
+        folded = 0
+        while key:
+            folded = ((folded ^ key) * HASH_MULTIPLIER) & HASH_MASK
+            key >>= 64
+        return folded >> self.key_shift
+
+    def get(self, key: int):
+        """Search a position in the table
+
+        :param key: the key of the position
+        :type key: int
+        :return: the score, the flag and the depth, None if the position is
+                 not in the table
+        :rtype: Union[tuple[int, int, int], None]
+        """
+        if key >> self.key_bits:
+            key = self.fold_key(key)
+        key_shift = self.key_shift
+        index = self.get_index(key)
+        for entry in (self.entries[index], self.entries[index + 1]):
+            if entry and entry >> key_shift == key:
+                self.hits += 1
+                return (
+                    (entry & self.score_mask) - self.score_offset,
+                    (entry >> (self.depth_shift - 2)) & 3,
+                    (entry >> self.depth_shift) & self.max_depth,
+                )
+        if self.entries[index] or self.entries[index + 1]:
+            self.collisions += 1
+        self.misses += 1
+        return None
+
+    def put(self, key: int, score: int, flag: int, depth: int):
+        """Store the result of a search
+
+        :param key: the key of the position
+        :type key: int
+        :param score: the score of the position
+        :type score: int
+        :param flag: EXACT, LOWER or UPPER, whether the score is exact or a
+                     bound
+        :type flag: int
+        :param depth: the depth of the search
+        :type depth: int
+        """
+        if key >> self.key_bits:
+            key = self.fold_key(key)
+        key_shift = self.key_shift
+        depth_shift = self.depth_shift
+        depth = min(depth, self.max_depth)
+        entry = (
+            (key << key_shift)
+            | (depth << depth_shift)
+            | (flag << (depth_shift - 2))
+            | (score + self.score_offset)
+        )
+        index = self.get_index(key)
+        kept = self.entries[index]
+        if (
+            not kept
+            or kept >> key_shift == key
+            or (kept >> depth_shift) & self.max_depth <= depth
+        ):
+            self.entries[index] = entry
+        else:
+            self.entries[index + 1] = entry
+        self.stores += 1
+
+    def get_stats(self):
+        """Get the statistics of the table
+
+        :return: the number of hits, misses, collisions and stores, and the
+                 size of the table in bytes
+        :rtype: dict
+        """
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "collisions": self.collisions,
+            "stores": self.stores,
+            "size": self.get_size(),
+        }